@@ -0,0 +1,67 @@
+"""
+Per-request deadline for the agent pipeline.
+
+REQUEST_DEADLINE_SECONDS is split into budgets for the stages that can degrade instead of failing:
+routing (falls back to the 'retrieve' path), query analysis (the raw query is searched) and retrieval
+(retried once with a smaller k). The remaining stages get whatever is left of the deadline, and the conversational
+rewrite of the RAG answer is skipped (the RAG answer is returned as is) when less than REWRITE_MIN_SECONDS are left
+or it overruns. When the retrieval retry or the answer itself cannot finish in time, the fixed TIMEOUT_RESPONSE
+is returned. Each degradation is counted in agent_degradations_total
+and listed in the response.
+"""
+
+from typing import Awaitable, Dict, List, Optional, TypeVar
+from .metrics import DEGRADATIONS
+import asyncio
+import os
+import time
+
+T = TypeVar("T")
+
+# 0 = sin límite (por defecto). Debe quedar por debajo de LLM_TIMEOUT_SECONDS para que una llamada lenta degrade en vez de fallar
+REQUEST_DEADLINE_SECONDS = float(os.getenv("REQUEST_DEADLINE_SECONDS", "0"))
+REWRITE_MIN_SECONDS = float(os.getenv("REWRITE_MIN_SECONDS", "2"))
+DEGRADED_K = int(os.getenv("DEGRADED_K", "2"))
+
+def _parse_budgets(value: str) -> Dict[str, float]:
+    """'routing=0.15,query_analysis=0.15' -> {'routing': 0.15, 'query_analysis': 0.15}"""
+    budgets = {}
+    for item in value.split(","):
+        if item.strip():
+            stage, fraction = item.split("=")
+            budgets[stage.strip()] = float(fraction)
+    return budgets
+
+# Fraction of the deadline each degradable stage may use
+STAGE_BUDGETS = _parse_budgets(os.getenv("STAGE_BUDGETS", "routing=0.15,query_analysis=0.15,retrieval=0.15"))
+
+class Deadline:
+    """Time budget of one request, and the degradations applied to meet it."""
+
+    def __init__(self, seconds: float = REQUEST_DEADLINE_SECONDS, budgets: Dict[str, float] = None):
+        self.seconds = seconds if seconds > 0 else None
+        self.budgets = budgets if budgets is not None else STAGE_BUDGETS
+        self.expires_at = time.monotonic() + self.seconds if self.seconds else None
+        self.degradations: List[str] = []
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None without a deadline."""
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def budget(self, stage: str) -> Optional[float]:
+        """Timeout for a stage: its share of the deadline (if it has one) capped by the time left."""
+        remaining = self.remaining()
+        if remaining is None or stage not in self.budgets:
+            return remaining
+        return min(remaining, self.seconds * self.budgets[stage])
+
+    async def run(self, stage: str, awaitable: Awaitable[T]) -> T:
+        """Await within the stage budget; raises asyncio.TimeoutError when it is exceeded."""
+        return await asyncio.wait_for(awaitable, timeout=self.budget(stage))
+
+    def degrade(self, kind: str) -> None:
+        """Record a degradation: 'default_path', 'raw_query', 'reduced_k', 'no_context', 'rag_answer' or 'timeout_answer'."""
+        self.degradations.append(kind)
+        DEGRADATIONS.labels(kind).inc()
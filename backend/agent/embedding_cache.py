@@ -0,0 +1,177 @@
+from array import array
+from collections import OrderedDict
+from langchain_core.embeddings import Embeddings
+from typing import Dict, List, Optional
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+
+DEFAULT_SQLITE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data", "embedding_cache.db"
+)
+
+# Part of every key: bump it when normalize_text changes so persisted entries under the old keys are not reused
+KEY_VERSION = 2
+
+def normalize_text(text: str) -> str:
+    """
+    NFC-normalized text with collapsed whitespace: variants that embed the same share an entry.
+    Case is kept, since the embedding model tells "LLM" from "llm".
+    """
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+class SQLiteEmbeddingBackend:
+    """Persistent tier for CachedEmbeddings. WAL mode lets several uvicorn workers share the file."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS embeddings (
+                    key TEXT PRIMARY KEY,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({', '.join('?' * len(keys))})",
+                keys
+            ).fetchall()
+        return {key: array("f", vector).tolist() for key, vector in rows}
+
+    def put_many(self, entries: Dict[str, List[float]]) -> None:
+        # Los embeddings de OpenAI llegan en float32, así que guardarlos así no pierde precisión
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                [(key, array("f", vector).tobytes(), now) for key, vector in entries.items()]
+            )
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that caches vectors by model name and normalized text.
+
+    Lookups go to an in-memory LRU of 'max_entries' vectors, then to the optional persistent backend;
+    only the misses are sent to the wrapped model, in a single call. The latency of those calls is
+    tracked to estimate the time saved by the hits.
+    """
+
+    def __init__(self, embeddings: Embeddings, max_entries: int = 10000, backend: Optional[SQLiteEmbeddingBackend] = None):
+        self.embeddings = embeddings
+        self.model = getattr(embeddings, "model", "")
+        self.max_entries = max_entries
+        self.backend = backend
+        self._entries: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+        self._miss_seconds = 0.0
+        self._miss_calls = 0
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(f"{KEY_VERSION}\0{self.model}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = vector
+            self.memory_hits += len(found)
+
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self.backend:
+            from_backend = self.backend.get_many(missing)
+            with self._lock:
+                self.backend_hits += len(from_backend)
+                for key, vector in from_backend.items():
+                    self._put(key, vector)
+            found.update(from_backend)
+        return found
+
+    def _store(self, entries: Dict[str, List[float]], seconds: float) -> None:
+        with self._lock:
+            self.misses += len(entries)
+            self._miss_seconds += seconds
+            self._miss_calls += 1
+            for key, vector in entries.items():
+                self._put(key, vector)
+        if self.backend:
+            self.backend.put_many(entries)
+
+    def _put(self, key: str, vector: List[float]) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.key(text) for text in texts]
+        found = self._lookup(keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            start = time.perf_counter()
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            computed = dict(zip(missing, vectors))
+            self._store(computed, time.perf_counter() - start)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self.key(text) for text in texts]
+        found = await asyncio.to_thread(self._lookup, keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            start = time.perf_counter()
+            vectors = await self.embeddings.aembed_documents(list(missing.values()))
+            computed = dict(zip(missing, vectors))
+            await asyncio.to_thread(self._store, computed, time.perf_counter() - start)
+            found.update(computed)
+        return [found[key] for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.backend_hits
+            lookups = hits + self.misses
+            mean_miss_seconds = self._miss_seconds / self._miss_calls if self._miss_calls else 0.0
+            return {
+                "entries": len(self._entries),
+                "memory_hits": self.memory_hits,
+                "backend_hits": self.backend_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "mean_miss_seconds": mean_miss_seconds,
+                # Estimación: cada acierto ahorra una llamada de latencia media
+                "saved_seconds": hits * mean_miss_seconds
+            }
+
+def from_env(embeddings: Embeddings) -> Embeddings:
+    """Wrap the embeddings in the cache configured by the EMBEDDING_CACHE_* environment variables, if enabled."""
+    if os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() != "true":
+        return embeddings
+    sqlite_path = os.getenv("EMBEDDING_CACHE_SQLITE_PATH", DEFAULT_SQLITE_PATH)
+    return CachedEmbeddings(
+        embeddings,
+        max_entries=int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000")),
+        backend=SQLiteEmbeddingBackend(sqlite_path) if sqlite_path else None
+    )
@@ -0,0 +1,177 @@
+"""
+Hedged requests for idempotent structured LLM calls (router, query analysis).
+
+The call goes to the primary model; if it has not answered after a delay taken from the recent latency
+distribution of the primary (HEDGE_PERCENTILE), the same request is sent to the secondary model of the
+component's profile ("hedge" entry, e.g. a Groq model). The first valid result wins and the other call is
+cancelled. A primary that fails before the delay is hedged immediately. Only a few percent of the calls
+are duplicated, which trims the slow tail of the provider at a small extra cost.
+
+Opt-in with HEDGING_ENABLED; every component whose profile defines "hedge" is then wrapped.
+"""
+
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, Optional
+from langchain_core.runnables import Runnable, RunnableConfig
+from .metrics import HEDGED_REQUESTS, HEDGED_CALL_LATENCY
+import asyncio
+import contextvars
+import os
+import threading
+import time
+
+HEDGING_ENABLED = os.getenv("HEDGING_ENABLED", "false").lower() == "true"
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_INITIAL_DELAY_SECONDS = float(os.getenv("HEDGE_INITIAL_DELAY_SECONDS", "2"))
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("HEDGE_MIN_DELAY_SECONDS", "0.3"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "200"))
+
+# Synchronous calls wait on the primary in a worker thread; a losing thread call cannot be interrupted,
+# its result is discarded when it finishes
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="hedge")
+
+class LatencyTracker:
+    """Rolling window of primary latencies that gives the hedge delay."""
+
+    def __init__(
+        self,
+        percentile: float = HEDGE_PERCENTILE,
+        initial_delay: float = HEDGE_INITIAL_DELAY_SECONDS,
+        min_delay: float = HEDGE_MIN_DELAY_SECONDS,
+        min_samples: int = HEDGE_MIN_SAMPLES,
+        window: int = HEDGE_WINDOW
+    ):
+        self.percentile = percentile
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def delay(self) -> float:
+        """Percentile of the window, or the initial delay until there are enough samples."""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.initial_delay
+            ordered = sorted(self._latencies)
+        index = min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))
+        return max(self.min_delay, ordered[index])
+
+class HedgedRunnable(Runnable):
+    """Runs 'primary' and, if it is slow or fails, 'secondary' on the same input; the first valid result is returned."""
+
+    def __init__(self, component: str, primary: Runnable, secondary: Runnable, tracker: Optional[LatencyTracker] = None):
+        self.component = component
+        self.primary = primary
+        self.secondary = secondary
+        self.tracker = tracker or LatencyTracker()
+        self._counts = {"calls": 0, "hedged": 0, "hedge_wins": 0, "failed": 0}
+        # Synchronous calls finish in the callers' threads, so the counters are updated under a lock
+        self._lock = threading.Lock()
+        _instances[component] = self
+
+    def _finish(self, outcome: str, start: float) -> None:
+        """outcome: 'not_hedged', 'primary_won', 'hedge_won' or 'failed'."""
+        with self._lock:
+            self._counts["calls"] += 1
+            self._counts["hedged"] += outcome in ("primary_won", "hedge_won")
+            self._counts["hedge_wins"] += outcome == "hedge_won"
+            self._counts["failed"] += outcome == "failed"
+        HEDGED_REQUESTS.labels(self.component, outcome).inc()
+        HEDGED_CALL_LATENCY.labels(self.component).observe(time.perf_counter() - start)
+
+    def _record_primary(self, primary, start: float) -> None:
+        """
+        Add the primary latency to the window when the call ends: its completion time if it answered (hedged or not),
+        or a lower bound if it is still running, so hedged calls keep weighing on the tail. Failures are left out.
+        """
+        if primary.done() and (primary.exception() is not None or primary.result() is None):
+            return
+        self.tracker.record(time.perf_counter() - start)
+
+    async def ainvoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(self.primary.ainvoke(input, config, **kwargs))
+        names = {primary: "primary"}
+        errors: Dict[str, BaseException] = {}
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.tracker.delay())
+            if done and primary.exception() is None and primary.result() is not None:
+                self._finish("not_hedged", start)
+                return primary.result()
+
+            hedge = asyncio.ensure_future(self.secondary.ainvoke(input, config, **kwargs))
+            names[hedge] = "hedge"
+            pending = {hedge} | ({primary} - done)
+            if done:
+                errors["primary"] = primary.exception() or ValueError("Empty structured output")
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and task.result() is not None:
+                        self._finish(f"{names[task]}_won", start)
+                        return task.result()
+                    errors[names[task]] = task.exception() or ValueError("Empty structured output")
+        finally:
+            self._record_primary(primary, start)
+            for task in names:
+                task.cancel()
+
+        self._finish("failed", start)
+        raise errors.get("primary") or errors["hedge"]
+
+    def invoke(self, input: Any, config: Optional[RunnableConfig] = None, **kwargs: Any) -> Any:
+        start = time.perf_counter()
+        # The calls run in worker threads with the caller's context, so they stay inside its trace
+        primary = _executor.submit(contextvars.copy_context().run, self.primary.invoke, input, config, **kwargs)
+        names: Dict[Future, str] = {primary: "primary"}
+        errors: Dict[str, BaseException] = {}
+        try:
+            done, _ = wait({primary}, timeout=self.tracker.delay())
+            if done and primary.exception() is None and primary.result() is not None:
+                self._finish("not_hedged", start)
+                return primary.result()
+
+            hedge = _executor.submit(contextvars.copy_context().run, self.secondary.invoke, input, config, **kwargs)
+            names[hedge] = "hedge"
+            pending = {hedge} | ({primary} - done)
+            if done:
+                errors["primary"] = primary.exception() or ValueError("Empty structured output")
+
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None and future.result() is not None:
+                        self._finish(f"{names[future]}_won", start)
+                        return future.result()
+                    errors[names[future]] = future.exception() or ValueError("Empty structured output")
+        finally:
+            self._record_primary(primary, start)
+            for future in names:
+                future.cancel()
+
+        self._finish("failed", start)
+        raise errors.get("primary") or errors["hedge"]
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        calls = counts["calls"]
+        return {
+            **counts,
+            "hedge_rate": counts["hedged"] / calls if calls else 0.0,
+            "delay_seconds": self.tracker.delay()
+        }
+
+_instances: Dict[str, HedgedRunnable] = {}
+
+def stats() -> dict:
+    """Hedging stats per component, for register_stats."""
+    return {component: runnable.stats() for component, runnable in _instances.items()}
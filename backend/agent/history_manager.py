@@ -0,0 +1,108 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import List, Optional
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from .llms.history_summarizer import HistorySummarizer
+import hashlib
+import tiktoken
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    # Tokenizer used by the gpt-4o family; its vocabulary is downloaded on first use, so it is loaded lazily
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"No se pudo cargar el tokenizer, se estimarán los tokens por caracteres: {e}")
+        return None
+
+@lru_cache(maxsize=50000)
+def _count_tokens(content: str) -> int:
+    # Cached by content, so each message is tokenized once even if the client resends the whole history
+    encoding = _get_encoding()
+    tokens = len(encoding.encode(content)) if encoding else len(content) // 4  # ~4 caracteres por token
+    return tokens + 4  # Per-message overhead of the chat format
+
+def count_message_tokens(message: BaseMessage) -> int:
+    return _count_tokens(message.content)
+
+def _fingerprint(messages: List[BaseMessage]) -> str:
+    digest = hashlib.sha256()
+    for message in messages:
+        digest.update(message.type.encode("utf-8"))
+        digest.update(message.content.encode("utf-8"))
+    return digest.hexdigest()
+
+class _RollingSummary:
+    """Summary of the first 'summarized_count' messages of a thread."""
+
+    def __init__(self):
+        self.summarized_count = 0
+        self.prefix_fingerprint = _fingerprint([])
+        self.summary = ""
+
+class HistoryManager:
+    """
+    Keeps the conversation history sent to the LLMs within a token budget.
+
+    The newest messages that fit in 'max_tokens' are passed as they are. Older messages are folded
+    into a rolling summary that is cached per thread and updated incrementally, so each turn only
+    summarizes the messages that just fell out of the window.
+    """
+
+    def __init__(self, summarizer: HistorySummarizer, max_tokens: int = 3000, max_threads: int = 10000):
+        self.summarizer = summarizer
+        self.max_tokens = max_tokens
+        self.max_threads = max_threads
+        self._summaries: "OrderedDict[str, _RollingSummary]" = OrderedDict()
+
+    def _window_start(self, history: List[BaseMessage]) -> int:
+        """Index of the oldest message that still fits in the budget, aligned to the start of a user turn."""
+        used = 0
+        start = len(history)
+        for i in range(len(history) - 1, -1, -1):
+            used += count_message_tokens(history[i])
+            if used > self.max_tokens:
+                break
+            start = i
+        while start < len(history) and not isinstance(history[start], HumanMessage):
+            start += 1
+        return start
+
+    def _get_summary(self, thread_key: str) -> _RollingSummary:
+        summary = self._summaries.get(thread_key)
+        if summary is None:
+            summary = _RollingSummary()
+            self._summaries[thread_key] = summary
+            while len(self._summaries) > self.max_threads:
+                self._summaries.popitem(last=False)
+        self._summaries.move_to_end(thread_key)
+        return summary
+
+    async def awindow(self, history: List[BaseMessage], thread_key: Optional[str] = None) -> List[BaseMessage]:
+        """Return the history to send to the LLMs: a summary of older turns followed by the newest ones."""
+        if not history or sum(count_message_tokens(message) for message in history) <= self.max_tokens:
+            return history
+
+        thread_key = thread_key or _fingerprint(history[:1])
+        rolling = self._get_summary(thread_key)
+
+        # A client-edited history no longer matches what was summarized, so the summary starts over
+        if rolling.summarized_count > len(history) or _fingerprint(history[:rolling.summarized_count]) != rolling.prefix_fingerprint:
+            rolling = _RollingSummary()
+            self._summaries[thread_key] = rolling
+
+        start = max(self._window_start(history), rolling.summarized_count)
+        if start > rolling.summarized_count:
+            rolling.summary = await self.summarizer.agenerate_summary(
+                rolling.summary,
+                history[rolling.summarized_count:start]
+            )
+            rolling.summarized_count = start
+            rolling.prefix_fingerprint = _fingerprint(history[:start])
+
+        if not rolling.summary:
+            return history[start:]
+        return [SystemMessage(content=f"Resumen de la conversación anterior: {rolling.summary}")] + history[start:]
+
+    def stats(self) -> dict:
+        return {"summarized_threads": len(self._summaries)}
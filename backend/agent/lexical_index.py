@@ -0,0 +1,175 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+import json
+import os
+import re
+import unicodedata
+import numpy as np
+
+DEFAULT_INDEX_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data", "lexical_index"
+)
+
+# Palabras vacías frecuentes del corpus (español e inglés): no distinguen documentos y alargan las listas de postings
+STOPWORDS = frozenset("""
+    a al como con de del el en entre es esta este esto la las lo los mas o para pero por que se sin sobre su sus un una y
+    ya son ser han ha fue muy tambien cual cuales cuando donde ante hasta desde segun le les nos
+    an and are as at be by for from in is it of on or that the this to was were which with
+""".split())
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words without accents or stopwords. Acronyms such as "IAG" or "UNESCO" stay whole terms."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return [token for token in re.findall(r"\w+", text) if token not in STOPWORDS]
+
+class BM25Index:
+    """
+    Okapi BM25 over the indexed chunks, the lexical leg of hybrid retrieval (see RAG.search).
+
+    Built at ingestion together with the vector store (RAG.add_documents) and keyed by the same primary keys.
+    The postings are stored in CSR form: for term t, the chunks and term frequencies are
+    doc_ids[term_offsets[t]:term_offsets[t + 1]] and freqs[...]; the vocabulary is a JSON list of terms.
+    The arrays are saved as .npy files and opened memory-mapped. Scoring a query only touches the postings
+    of its terms, accumulated with NumPy into one score per chunk.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_INDEX_PATH, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._clear()
+        if path and os.path.exists(os.path.join(path, "vocabulary.json")):
+            self.load()
+
+    def _clear(self) -> None:
+        self.terms: List[str] = []
+        self.vocabulary: Dict[str, int] = {}
+        self.pks = np.zeros(0, dtype="<U1")
+        self.doc_lengths = np.zeros(0, dtype=np.int32)
+        self.term_offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.freqs = np.zeros(0, dtype=np.uint16)
+        self._prepare()
+
+    def _prepare(self) -> None:
+        """IDF per term and BM25 length normalization per chunk, derived from the stored arrays."""
+        self.vocabulary = {term: term_id for term_id, term in enumerate(self.terms)}
+        n = len(self.pks)
+        document_frequency = np.diff(self.term_offsets).astype(np.float32)
+        self.idf = np.log1p((n - document_frequency + 0.5) / (document_frequency + 0.5))
+        average_length = float(self.doc_lengths.mean()) if n else 1.0
+        self.length_norm = (self.k1 * (1 - self.b + self.b * self.doc_lengths / max(average_length, 1e-9))).astype(np.float32)
+
+    def __len__(self) -> int:
+        return len(self.pks)
+
+    # --- Persistencia ---
+
+    def load(self) -> None:
+        with open(os.path.join(self.path, "vocabulary.json"), encoding="utf-8") as f:
+            self.terms = json.load(f)
+        for name in ("pks", "doc_lengths", "term_offsets", "doc_ids", "freqs"):
+            setattr(self, name, np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="r").view(np.ndarray))
+        self._prepare()
+
+    def save(self) -> None:
+        """Arrays first and the vocabulary last, each swapped in from a temporary file."""
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        for name in ("pks", "doc_lengths", "term_offsets", "doc_ids", "freqs"):
+            tmp = os.path.join(self.path, f".{name}.npy.tmp")
+            with open(tmp, "wb") as f:
+                np.save(f, np.asarray(getattr(self, name)))
+            os.replace(tmp, os.path.join(self.path, f"{name}.npy"))
+        tmp = os.path.join(self.path, ".vocabulary.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.terms, f, ensure_ascii=False)
+        os.replace(tmp, os.path.join(self.path, "vocabulary.json"))
+
+    # --- Escritura ---
+
+    def _postings(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """The CSR postings as (term id, chunk, frequency) triples."""
+        term_ids = np.repeat(np.arange(len(self.terms), dtype=np.int32), np.diff(self.term_offsets))
+        return term_ids, np.asarray(self.doc_ids), np.asarray(self.freqs)
+
+    def _set_postings(self, term_ids: np.ndarray, doc_ids: np.ndarray, freqs: np.ndarray) -> None:
+        order = np.lexsort((doc_ids, term_ids))
+        self.doc_ids = doc_ids[order].astype(np.int32)
+        self.freqs = freqs[order].astype(np.uint16)
+        counts = np.bincount(term_ids, minlength=len(self.terms))
+        self.term_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+    def add(self, texts: List[str], ids: List[str]) -> None:
+        """Index new chunks under their vector store primary keys and save the index."""
+        if not texts:
+            return
+        term_ids, doc_ids, freqs = self._postings()
+        new_terms, new_docs, new_freqs, lengths = [], [], [], []
+        for offset, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            counts: Dict[int, int] = {}
+            for token in tokens:
+                if token not in self.vocabulary:
+                    self.vocabulary[token] = len(self.terms)
+                    self.terms.append(token)
+                counts[self.vocabulary[token]] = counts.get(self.vocabulary[token], 0) + 1
+            new_terms.extend(counts)
+            new_docs.extend([len(self) + offset] * len(counts))
+            new_freqs.extend(min(count, np.iinfo(np.uint16).max) for count in counts.values())
+
+        self.pks = np.concatenate([np.asarray(self.pks), np.asarray(ids)])
+        self.doc_lengths = np.concatenate([np.asarray(self.doc_lengths), np.asarray(lengths, dtype=np.int32)])
+        self._set_postings(
+            np.concatenate([term_ids, np.asarray(new_terms, dtype=np.int32)]),
+            np.concatenate([doc_ids, np.asarray(new_docs, dtype=np.int32)]),
+            np.concatenate([freqs, np.asarray(new_freqs, dtype=np.uint16)])
+        )
+        self._prepare()
+        self.save()
+
+    def delete(self, ids: Sequence[str]) -> None:
+        keep = ~np.isin(self.pks, list(ids))
+        if keep.all():
+            return
+        # Renumerar los chunks que quedan y descartar los postings de los borrados
+        new_ids = np.cumsum(keep) - 1
+        term_ids, doc_ids, freqs = self._postings()
+        kept = keep[doc_ids]
+        self.pks = np.asarray(self.pks)[keep]
+        self.doc_lengths = np.asarray(self.doc_lengths)[keep]
+        self._set_postings(term_ids[kept], new_ids[doc_ids[kept]], freqs[kept])
+        self._prepare()
+        self.save()
+
+    def delete_all(self) -> None:
+        self._clear()
+        self.save()
+
+    # --- Búsqueda ---
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Primary keys and BM25 scores of the best 'k' chunks containing at least one query term."""
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term in set(tokenize(query)):
+            term_id = self.vocabulary.get(term)
+            if term_id is None:
+                continue
+            start, end = self.term_offsets[term_id:term_id + 2]
+            docs, freqs = self.doc_ids[start:end], self.freqs[start:end].astype(np.float32)
+            scores[docs] += self.idf[term_id] * freqs * (self.k1 + 1) / (freqs + self.length_norm[docs])
+
+        matches = np.flatnonzero(scores)
+        if not len(matches) or k <= 0:
+            return []
+        if len(matches) > k:
+            matches = matches[np.argpartition(-scores[matches], k - 1)[:k]]
+        matches = matches[np.argsort(-scores[matches], kind="stable")]
+        return [(str(self.pks[row]), float(scores[row])) for row in matches.tolist()]
+
+def from_env(collection_name: str) -> BM25Index:
+    """BM25 index of the collection, in its own directory under LEXICAL_INDEX_PATH."""
+    return BM25Index(os.path.join(os.getenv("LEXICAL_INDEX_PATH", DEFAULT_INDEX_PATH), collection_name))
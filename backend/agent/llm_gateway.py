@@ -0,0 +1,163 @@
+"""
+Single factory for the LLM and embeddings clients used by the agent, the data loader and the evals.
+
+Every client handed out here shares the same bounded keep-alive connection pools, per-call timeout and
+retry policy (the OpenAI SDK retries connection errors, 408/409/429 and 5xx with exponential backoff and
+jitter), the token usage callback and, if configured, a process-wide rate limiter. New clients should be
+built with chat_model() / embeddings_model() instead of instantiating ChatOpenAI / OpenAIEmbeddings;
+agent components use chat_model_for() (structured_model_for() for structured outputs, which adds hedging),
+which takes the provider, model and call settings from their profile (see model_profiles.py) and labels their
+latency and token metrics with it.
+"""
+
+from functools import lru_cache
+from typing import Optional, Type
+from langchain_core.language_models import BaseChatModel
+from langchain_core.rate_limiters import InMemoryRateLimiter
+from langchain_core.runnables import Runnable
+from langchain_groq import ChatGroq
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+from pydantic import BaseModel
+from .metrics import token_usage_callback
+from .model_profiles import ModelProfile, get_profile
+from .hedging import HEDGING_ENABLED, HedgedRunnable
+import asyncio
+import httpx
+import os
+import weakref
+
+TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+CONNECT_TIMEOUT_SECONDS = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5"))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "20"))
+REQUESTS_PER_SECOND = float(os.getenv("LLM_REQUESTS_PER_SECOND", "0"))  # 0 = sin límite
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=MAX_CONNECTIONS,
+        max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=30
+    )
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS)
+
+class _PerLoopTransport(httpx.AsyncBaseTransport):
+    """
+    Async transport that keeps one connection pool per event loop. Pooled connections are bound to the loop
+    that opened them, and the synchronous wrappers (process_query, generate_answer) run a new loop per call.
+    """
+
+    def __init__(self):
+        self._transports: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncHTTPTransport]" = weakref.WeakKeyDictionary()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        loop = asyncio.get_running_loop()
+        transport = self._transports.get(loop)
+        if transport is None:
+            transport = httpx.AsyncHTTPTransport(limits=_limits())
+            self._transports[loop] = transport
+        return await transport.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        transport = self._transports.pop(asyncio.get_running_loop(), None)
+        if transport is not None:
+            await transport.aclose()
+
+@lru_cache(maxsize=1)
+def http_client() -> httpx.Client:
+    """Shared synchronous HTTP client for all LLM providers."""
+    return httpx.Client(limits=_limits(), timeout=_timeout())
+
+@lru_cache(maxsize=1)
+def http_async_client() -> httpx.AsyncClient:
+    """Shared asynchronous HTTP client for all LLM providers."""
+    return httpx.AsyncClient(transport=_PerLoopTransport(), timeout=_timeout())
+
+@lru_cache(maxsize=1)
+def rate_limiter() -> Optional[InMemoryRateLimiter]:
+    """Process-wide token bucket for chat model calls, or None if LLM_REQUESTS_PER_SECOND is not set."""
+    if REQUESTS_PER_SECOND <= 0:
+        return None
+    return InMemoryRateLimiter(requests_per_second=REQUESTS_PER_SECOND, max_bucket_size=max(1, int(REQUESTS_PER_SECOND)))
+
+def chat_model(
+    model: str = "gpt-4o",
+    temperature: float = 0,
+    track_usage: bool = True,
+    timeout: Optional[float] = None,
+    profile: Optional[str] = None,
+    **kwargs
+) -> ChatOpenAI:
+    """
+    OpenAI chat model backed by the shared connection pools and retry policy.
+    'track_usage' attaches the token usage callback; the eval judges turn it off so only the component under test is counted.
+    'profile' labels the metrics of the calls. Any other ChatOpenAI argument (max_tokens, stream_usage, ...) is passed through.
+    """
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        timeout=timeout or TIMEOUT_SECONDS,
+        max_retries=MAX_RETRIES,
+        http_client=http_client(),
+        http_async_client=http_async_client(),
+        rate_limiter=rate_limiter(),
+        callbacks=[token_usage_callback] if track_usage else None,
+        metadata={"model_profile": profile} if profile else None,
+        **kwargs
+    )
+
+def chat_model_for(component: str, **kwargs) -> BaseChatModel:
+    """Chat model configured by the component's profile in the model registry."""
+    return _chat_model_from_profile(get_profile(component), component, **kwargs)
+
+def structured_model_for(component: str, schema: Type[BaseModel], hedged: Optional[bool] = None) -> Runnable:
+    """
+    Chat model of the component's profile returning 'schema'. If hedged (default: HEDGING_ENABLED) and the profile
+    has a "hedge" model, slow calls are also sent to that model and the first valid result is used (see hedging.py).
+    """
+    profile = get_profile(component)
+    primary = _chat_model_from_profile(profile, component).with_structured_output(schema)
+    if hedged is None:
+        hedged = HEDGING_ENABLED
+    if not hedged or profile.hedge is None:
+        return primary
+    secondary = _chat_model_from_profile(profile.hedge, component).with_structured_output(schema)
+    return HedgedRunnable(component, primary, secondary)
+
+def _chat_model_from_profile(profile: ModelProfile, component: str, **kwargs) -> BaseChatModel:
+    if profile.provider == "groq":
+        kwargs.pop("stream_usage", None)  # Solo existe en el cliente de OpenAI
+        return ChatGroq(
+            model=profile.model,
+            temperature=profile.temperature,
+            max_tokens=profile.max_tokens,
+            timeout=profile.timeout or TIMEOUT_SECONDS,
+            max_retries=MAX_RETRIES,
+            http_client=http_client(),
+            http_async_client=http_async_client(),
+            rate_limiter=rate_limiter(),
+            callbacks=[token_usage_callback],
+            metadata={"model_profile": component},
+            **kwargs
+        )
+    return chat_model(
+        model=profile.model,
+        temperature=profile.temperature,
+        max_tokens=profile.max_tokens,
+        timeout=profile.timeout,
+        profile=component,
+        **kwargs
+    )
+
+def embeddings_model(model: str = "text-embedding-3-small", **kwargs) -> OpenAIEmbeddings:
+    """Embeddings client backed by the shared connection pools and retry policy."""
+    return OpenAIEmbeddings(
+        model=model,
+        timeout=TIMEOUT_SECONDS,
+        max_retries=MAX_RETRIES,
+        http_client=http_client(),
+        http_async_client=http_async_client(),
+        **kwargs
+    )
@@ -1,14 +1,14 @@
-from langchain_openai import ChatOpenAI
+from ..llm_gateway import chat_model_for
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import BaseMessage
-from typing import List
+from typing import List, AsyncIterator
 from langsmith import traceable
 
 class ConversationalResponseGenerator:
     def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4o",
-            temperature=0.6
+        self.llm = chat_model_for(
+            "conversational_response_generator",
+            stream_usage=True
         )
 
         system_prompt_text = """
@@ -49,4 +49,38 @@ class ConversationalResponseGenerator:
                 history=history
             )
         )
-        return response.content 
\ No newline at end of file
+        return response.content
+
+    @traceable
+    async def agenerate_response(
+        self,
+        query: str,
+        context: str,
+        history: List[BaseMessage]
+    ) -> str:
+        """Asynchronously generate a response based on the query, context, and conversation history."""
+        response = await self.llm.ainvoke(
+            self.prompt.format(
+                query=query,
+                context=context,
+                history=history
+            )
+        )
+        return response.content
+
+    async def astream_response(
+        self,
+        query: str,
+        context: str,
+        history: List[BaseMessage]
+    ) -> AsyncIterator[str]:
+        """Stream the response tokens as they are generated."""
+        async for chunk in self.llm.astream(
+            self.prompt.format(
+                query=query,
+                context=context,
+                history=history
+            )
+        ):
+            if chunk.content:
+                yield chunk.content
@@ -0,0 +1,95 @@
+from typing import List, Literal, Optional, Tuple
+from pydantic import BaseModel, Field
+from langchain_core.messages import BaseMessage
+from ..llm_gateway import structured_model_for
+from ..model_profiles import get_profile
+from .rag_query_analyzer import QueryAnalysis, QUERY_ANALYSIS_STEPS, QUERY_ANALYSIS_GUIDELINES, QUERY_ANALYSIS_EXAMPLE
+from .decision_paths import DECISION_PATHS_INTRO, DECISION_PATHS_INSTRUCTIONS
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langsmith import traceable
+
+class RoutingAnalysis(BaseModel):
+    """The decision path for a user's query and, for the 'retrieve' path, the search queries to run."""
+    decision_path: Literal["no-retrieval reply", "retrieve", "cross-question", "deny"] = Field(
+        description="Given a user question and the conversation history, choose which decision path would be most appropriate for answering their question."
+    )
+    updated_query: Optional[str] = Field(
+        default=None,
+        description="Only for 'retrieve': the original user query after processing references and context"
+    )
+    queries: Optional[List[str]] = Field(
+        default=None,
+        description="""Only for 'retrieve': list of independent search queries that together cover all aspects of the original question. \
+        When the user's question refers to information from previous conversation history, the search queries must incorporate relevant \
+        terms or context to resolve references or provide clarity."""
+    )
+
+    def query_analysis(self) -> Optional[QueryAnalysis]:
+        """The query analysis for the 'retrieve' path, or None if the model did not return one."""
+        if self.decision_path != "retrieve" or not self.queries:
+            return None
+        return QueryAnalysis(
+            updated_query=self.updated_query or self.queries[0],
+            queries=self.queries
+        )
+
+class RoutingAnalysisWithReasoning(RoutingAnalysis):
+    """The decision path for a user's query and, for the 'retrieve' path, the search queries to run."""
+    reasoning_steps: str = Field(..., description="List of reasoning steps explaining why this decision path was chosen and, for 'retrieve', how the query was processed.")
+
+class FusedRouterAnalyzer:
+    """Routes the query and, for the 'retrieve' path, analyzes it for search in the same structured call."""
+
+    def __init__(self, with_reasoning: bool = None):
+        if with_reasoning is None:
+            with_reasoning = get_profile("fused_router_analyzer").reasoning
+        self.llm = structured_model_for(
+            "fused_router_analyzer",
+            RoutingAnalysisWithReasoning if with_reasoning else RoutingAnalysis
+        )
+
+        system_prompt_text = f"""{DECISION_PATHS_INTRO}, and at converting the questions that need retrieval into optimal search queries.
+
+        First, choose one of the following decision paths:
+
+        {DECISION_PATHS_INSTRUCTIONS}
+
+        Then, only if you chose 'retrieve', fill in 'updated_query' and 'queries':
+        {QUERY_ANALYSIS_STEPS}
+
+        Guidelines:
+        {QUERY_ANALYSIS_GUIDELINES}
+        - Always return at least one query for 'retrieve', and leave both fields empty for any other decision path
+
+        Example, for a query routed to 'retrieve':
+        {QUERY_ANALYSIS_EXAMPLE}
+        """
+
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", system_prompt_text),
+            MessagesPlaceholder(variable_name="chat_history"),
+            ("human", "{query}")
+        ])
+
+    @traceable
+    def route_and_analyze(self, query: str, history: List[BaseMessage]) -> RoutingAnalysis:
+        """Choose the decision path and, for 'retrieve', the search queries."""
+        return self.llm.invoke(self.prompt.format(query=query, chat_history=history))
+
+    @traceable
+    async def aroute_and_analyze(self, query: str, history: List[BaseMessage]) -> RoutingAnalysis:
+        """Asynchronously choose the decision path and, for 'retrieve', the search queries."""
+        return await self.llm.ainvoke(self.prompt.format(query=query, chat_history=history))
+
+    def get_decision_path(self, query: str, history: List[BaseMessage]) -> Tuple[str, str]:
+        """Same interface as Router.get_decision_path, so the router eval can score the fused call."""
+        result = self.route_and_analyze(query, history)
+        return result.decision_path, getattr(result, "reasoning_steps", "")
+
+    def analyze(self, query: str, history: List[BaseMessage]) -> QueryAnalysis:
+        """
+        Same interface as RAGQueryAnalyzer.analyze, so the query analyzer eval can score the fused call.
+        If the query is not routed to 'retrieve', the raw query is used as the only search query.
+        """
+        result = self.route_and_analyze(query, history)
+        return result.query_analysis() or QueryAnalysis(updated_query=query, queries=[query])
@@ -0,0 +1,128 @@
+from ..llm_gateway import chat_model_for
+from .rag_response_generator import ContextResponse
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.messages import BaseMessage
+from langchain_core.utils.json import parse_partial_json
+from typing import List, AsyncIterator, Union
+from langsmith import traceable
+import json
+
+class GroundedConversationalGenerator:
+    """
+    Single-pass generator for the 'retrieve' path: writes the conversational reply directly from the retrieved
+    context and returns the context items it used, replacing the RAGResponseGenerator + ConversationalResponseGenerator pair.
+    """
+
+    def __init__(self):
+        self.llm = chat_model_for(
+            "grounded_conversational_generator",
+            stream_usage=True
+        )
+        self.structured_llm = self.llm.with_structured_output(ContextResponse)
+        # Same schema as a forced tool call, whose arguments are streamed and parsed incrementally
+        self.streaming_llm = self.llm.bind_tools([ContextResponse], tool_choice="ContextResponse")
+
+        system_prompt_text = """
+        You are a conversational assistant designed to help people who are curious about generative artificial intelligence. You should always follow the behaviors listed below.
+
+        - Grounded responses always: Information related to the context will be provided to you so that responses are factual and backed up by sources.
+        You should provide information only if it was obtained from the context. You should not provide any information that has not been obtained from the context, never, not even to correct the user if they are wrong. Do not add or infer information beyond what's in the context.
+        Never question the context's correctness since your knowledge might be wrong or outdated, assume its real and use it if what's being asked is addressed by it.
+        If information is provided by the context, incorporate it naturally into your response.
+        If no information is provided by the context and the user is expecting it, acknowledge it and say you cannot help with that question, suggest other resources and remind the user that you are available for any other question. In that case return an empty list of context items.
+
+        - Conversational responses with random bursts of expansion as the conversation develops: Your responses should feel like a natural conversation, avoid lists or bullet points.
+        You should avoid long responses that do not foster a back and forth dialog. From time to time, as the conversation develops and you see that the user is interested, expand a bit more.
+        A strategy that can be followed to foster the dialog is not to give all the information that was obtained, but to give it gradually, opening questions that the user may show interest in continuing by fostering curiosity and interest in related topics.
+
+        - Cited context: Return as context items only the pieces of context you actually used in your response.
+        Each context item should contain the exact source from the metadata, as well as the title, author, and year when available.
+        When handling author fields, if the metadata contains 'authors' (plural), use that as the 'author' field in your response.
+        For multiple authors, convert the list to a comma-separated string, or keep the existing comma-separated format.
+
+        ----------------------------------- Context Start -----------------------------------
+        {search_results}
+        ----------------------------------- Context End -----------------------------------
+        """
+
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", system_prompt_text),
+            MessagesPlaceholder(variable_name="history"),
+            ("human", "{query}")
+        ])
+
+    @traceable
+    def generate_response(
+        self,
+        query: str,
+        search_results: str,
+        history: List[BaseMessage] = None
+    ) -> ContextResponse:
+        """Generate the conversational answer and the context items it used."""
+        return self.structured_llm.invoke(
+            self.prompt.format(
+                query=query,
+                search_results=search_results,
+                history=history or []
+            )
+        )
+
+    @traceable
+    async def agenerate_response(
+        self,
+        query: str,
+        search_results: str,
+        history: List[BaseMessage] = None
+    ) -> ContextResponse:
+        """Asynchronously generate the conversational answer and the context items it used."""
+        return await self.structured_llm.ainvoke(
+            self.prompt.format(
+                query=query,
+                search_results=search_results,
+                history=history or []
+            )
+        )
+
+    async def astream_response(
+        self,
+        query: str,
+        search_results: str,
+        history: List[BaseMessage] = None
+    ) -> AsyncIterator[Union[str, ContextResponse]]:
+        """
+        Stream the answer tokens as they are generated, followed by the complete ContextResponse as the last item.
+        'answer' comes first in the schema, so it can be streamed before the context items are written.
+        If the model replies with plain text instead of the tool call (a refusal, or a provider that ignores
+        tool_choice), that text is streamed and returned as the answer without context items.
+        """
+        arguments = ""
+        streamed = ""
+        text = ""
+        async for chunk in self.streaming_llm.astream(
+            self.prompt.format(
+                query=query,
+                search_results=search_results,
+                history=history or []
+            )
+        ):
+            if not chunk.tool_call_chunks:
+                if isinstance(chunk.content, str) and chunk.content and not arguments:
+                    text += chunk.content
+                    yield chunk.content
+                continue
+            arguments += chunk.tool_call_chunks[0].get("args") or ""
+            partial = parse_partial_json(arguments)
+            answer = partial.get("answer") if isinstance(partial, dict) else None
+            if isinstance(answer, str) and len(answer) > len(streamed) and answer.startswith(streamed):
+                yield answer[len(streamed):]
+                streamed = answer
+
+        try:
+            response = ContextResponse.model_validate(json.loads(arguments))
+        except ValueError:
+            # No (or truncated) tool arguments: keep what was already shown to the user, without citations
+            yield ContextResponse(answer=text + streamed, context=[])
+            return
+        if len(response.answer) > len(streamed) and response.answer.startswith(streamed):
+            yield response.answer[len(streamed):]
+        yield response
@@ -0,0 +1,51 @@
+from ..llm_gateway import chat_model_for
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.messages import BaseMessage, HumanMessage
+from typing import List
+from langsmith import traceable
+
+class HistorySummarizer:
+    def __init__(self):
+        self.llm = chat_model_for("history_summarizer")
+
+        system_prompt_text = """
+        You maintain a running summary of a conversation between a user and an assistant about artificial intelligence and education.
+        You will receive the current summary (possibly empty) and the messages that come right after it.
+        Return an updated summary that incorporates the new messages.
+
+        Follow these guidelines:
+        - Keep the topics discussed, the questions the user asked, the key facts the assistant gave, and any personal details the user shared (e.g. name, role, level of experience).
+        - Keep pending questions, including reflective questions the assistant asked the user.
+        - Be concise, write in the language of the conversation, and do not add information that is not in the messages.
+        - Return only the summary.
+
+        ----------------------------------- Current Summary -----------------------------------
+        {summary}
+        ----------------------------------- New Messages -----------------------------------
+        {messages}
+        """
+
+        self.prompt = ChatPromptTemplate.from_messages([
+            ("system", system_prompt_text)
+        ])
+
+    def _format_messages(self, messages: List[BaseMessage]) -> str:
+        return "\n".join(
+            f"{'User' if isinstance(message, HumanMessage) else 'Assistant'}: {message.content}"
+            for message in messages
+        )
+
+    @traceable
+    async def agenerate_summary(
+        self,
+        summary: str,
+        messages: List[BaseMessage]
+    ) -> str:
+        """Fold the given messages into the running summary."""
+        response = await self.llm.ainvoke(
+            self.prompt.format(
+                summary=summary,
+                messages=self._format_messages(messages)
+            )
+        )
+        return response.content
@@ -0,0 +1,34 @@
+from langchain_core.messages import BaseMessage
+from typing import List, AsyncIterator
+import os
+
+NO_INFORMATION_RESPONSE = os.getenv(
+    "NO_INFORMATION_RESPONSE",
+    "Lo siento, no encontré información sobre ese tema en los documentos con los que trabajo, por lo que no puedo "
+    "ayudarle con esa pregunta. Le sugiero consultar otras fuentes especializadas. Quedo a su disposición para "
+    "cualquier otra consulta sobre inteligencia artificial y educación."
+)
+
+TIMEOUT_RESPONSE = os.getenv(
+    "TIMEOUT_RESPONSE",
+    "Lo siento, no pude preparar una respuesta a tiempo. Por favor, intente nuevamente en unos momentos."
+)
+
+class NoInformationResponseGenerator:
+    """
+    Reply for the 'retrieve' path when no retrieved document reaches the relevance threshold
+    (or, with TIMEOUT_RESPONSE, when retrieval or the answer could not finish within the request deadline).
+    It is a fixed text, so the RAG and conversational generators are not called for it.
+    """
+
+    def __init__(self, response: str = NO_INFORMATION_RESPONSE):
+        self.response = response
+
+    def generate_response(self, query: str, history: List[BaseMessage]) -> str:
+        return self.response
+
+    async def agenerate_response(self, query: str, history: List[BaseMessage]) -> str:
+        return self.response
+
+    async def astream_response(self, query: str, history: List[BaseMessage]) -> AsyncIterator[str]:
+        yield self.response
@@ -1,14 +1,14 @@
-from langchain_openai import ChatOpenAI
+from ..llm_gateway import chat_model_for
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import BaseMessage
-from typing import List
+from typing import List, AsyncIterator
 from langsmith import traceable
     
 class NoRetrievalResponseGenerator:
     def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4o",
-            temperature=0.6
+        self.llm = chat_model_for(
+            "no_retrieval_response_generator",
+            stream_usage=True
         )
 
         system_prompt_text = """
@@ -49,4 +49,34 @@ class NoRetrievalResponseGenerator:
                 history=history
             )
         )
-        return response.content 
+        return response.content
+
+    @traceable
+    async def agenerate_response(
+        self,
+        query: str,
+        history: List[BaseMessage]
+    ) -> str:
+        """Asynchronously generate a response based on the query, and conversation history."""
+        response = await self.llm.ainvoke(
+            self.prompt.format(
+                query=query,
+                history=history
+            )
+        )
+        return response.content
+
+    async def astream_response(
+        self,
+        query: str,
+        history: List[BaseMessage]
+    ) -> AsyncIterator[str]:
+        """Stream the response tokens as they are generated."""
+        async for chunk in self.llm.astream(
+            self.prompt.format(
+                query=query,
+                history=history
+            )
+        ):
+            if chunk.content:
+                yield chunk.content
@@ -1,10 +1,34 @@
 from typing import List
 from pydantic import BaseModel, Field
 from langchain_core.messages import BaseMessage
-from langchain_openai import ChatOpenAI
+from ..llm_gateway import structured_model_for
+from ..model_profiles import get_profile
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langsmith import traceable
 
+# Instructions shared with the fused router + query analyzer (fused_router_analyzer.py),
+# kept in one place so tuning the analysis prompt changes both
+QUERY_ANALYSIS_STEPS = """1. Use the conversation history to resolve any references in the query (e.g. "it", "that", "they")
+        2. Break down complex questions into simpler, independent search queries
+        3. Remove conversational language while preserving key search terms"""
+
+QUERY_ANALYSIS_GUIDELINES = """- If the question refers to previous context, include relevant terms from that context in the queries
+        - Each query should focus on a single specific aspect of the question to maximize the chances of finding relevant documents
+        - Remove filler words and conversational elements
+        - Generate queries with both the acronym and its expanded form if the acronym is familiar or its meaning can be inferred from the context (e.g., "AI" and "Artificial Intelligence")"""
+
+QUERY_ANALYSIS_EXAMPLE = '''------------------------------------------------------------------------------------------------
+        ... previous conversation history ...
+        AI: Los modelos de lenguaje de gran tamaño, también conocidos como LLMs, son capaces de comprender y generar texto en lenguaje natural..."
+        User: "¿Podrían llegar a tener sesgo de información? Estoy preocupado por las implicaciones éticas de esta tecnología."
+        ------------------------------------------------------------------------------------------------
+        Output queries:
+        - "Information bias in LLMs"
+        - "Ethical implications of Large Language Models"
+        - "Bias risks in LLM text generation"
+
+        Output updated query: "¿Los LLMs podrían llegar a tener sesgo de información? Estoy preocupado por las implicaciones éticas de esta tecnología."'''
+
 class QueryAnalysis(BaseModel):
     """A list of optimized search queries and the updated original query."""
     updated_query: str = Field(
@@ -16,42 +40,33 @@ class QueryAnalysis(BaseModel):
         context to resolve references or provide clarity. """,
         min_items=1  # Ensure at least one query is returned
     )
+
+class QueryAnalysisWithReasoning(QueryAnalysis):
+    """A list of optimized search queries and the updated original query."""
     reasoning_steps: str = Field(..., description="Step-by-step explanation of how the original query was processed, including reference \
                                  resolution, query decomposition, acronym expansion, context inclusion and optimization decisions.")
 
 class RAGQueryAnalyzer:
-    def __init__(self):
-        self.llm = ChatOpenAI(
-            model="gpt-4o", 
-            temperature=0
-        ).with_structured_output(QueryAnalysis)
+    def __init__(self, with_reasoning: bool = None):
+        # Without reasoning (the default in production) the model writes only the fields the pipeline uses
+        if with_reasoning is None:
+            with_reasoning = get_profile("query_analyzer").reasoning
+        self.llm = structured_model_for(
+            "query_analyzer",
+            QueryAnalysisWithReasoning if with_reasoning else QueryAnalysis
+        )
 
-        system_prompt_text = """You are an expert at analyzing questions and converting them into optimal search queries.
+        system_prompt_text = f"""You are an expert at analyzing questions and converting them into optimal search queries.
         Your task is to:
-        1. Use the conversation history to resolve any references in the query (e.g. "it", "that", "they")
-        2. Break down complex questions into simpler, independent search queries
-        3. Remove conversational language while preserving key search terms
+        {QUERY_ANALYSIS_STEPS}
 
         Guidelines:
-        - If the question refers to previous context, include relevant terms from that context in the queries
-        - Each query should focus on a single specific aspect of the question to maximize the chances of finding relevant documents
-        - Remove filler words and conversational elements
-        - Generate queries with both the acronym and its expanded form if the acronym is familiar or its meaning can be inferred from the context (e.g., "AI" and "Artificial Intelligence")  
+        {QUERY_ANALYSIS_GUIDELINES}
         - Always return at least one query
         - Ensure the response strictly follows the QueryAnalysis schema
         
         Example 1:
-        ------------------------------------------------------------------------------------------------
-        ... previous conversation history ...
-        AI: Los modelos de lenguaje de gran tamaño, también conocidos como LLMs, son capaces de comprender y generar texto en lenguaje natural..."
-        User: "¿Podrían llegar a tener sesgo de información? Estoy preocupado por las implicaciones éticas de esta tecnología."
-        ------------------------------------------------------------------------------------------------
-        Output queries: 
-        - "Information bias in LLMs"
-        - "Ethical implications of Large Language Models"
-        - "Bias risks in LLM text generation"
-
-        Output updated query: "¿Los LLMs podrían llegar a tener sesgo de información? Estoy preocupado por las implicaciones éticas de esta tecnología."
+        {QUERY_ANALYSIS_EXAMPLE}
         
         Example 2:
         ------------------------------------------------------------------------------------------------
@@ -84,3 +99,14 @@ class RAGQueryAnalyzer:
         return self.llm.invoke(
             self.prompt.format(query=query, history=history)
         )
+
+    @traceable
+    async def aanalyze(
+        self, 
+        query: str, 
+        history: List[BaseMessage]
+    ) -> QueryAnalysis:
+        """Asynchronously analyze a query and return a list of optimized search queries."""
+        return await self.llm.ainvoke(
+            self.prompt.format(query=query, history=history)
+        )
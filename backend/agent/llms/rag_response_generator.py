@@ -1,4 +1,4 @@
-from langchain_openai import ChatOpenAI
+from ..llm_gateway import chat_model_for
 from langchain_core.prompts import PromptTemplate
 from pydantic import BaseModel, Field
 from typing import List, Optional
@@ -98,10 +98,7 @@ class ContextResponse(BaseModel):
 class RAGResponseGenerator:
     def __init__(self, test_mode: bool = False):
         self.test_mode = test_mode
-        self.llm = ChatOpenAI(
-            model="gpt-4o",
-            temperature=0
-        ).with_structured_output(ContextResponse)
+        self.llm = chat_model_for("rag_response_generator").with_structured_output(ContextResponse)
 
         self.prompt_template = """You are an assistant for question-answering tasks.
         Below you will find information you can use to answer the question.
@@ -134,4 +131,14 @@ class RAGResponseGenerator:
                 query=query,
                 search_results=search_results
             )
-        ) 
\ No newline at end of file
+        )
+
+    @traceable
+    async def agenerate_response(self, query: str, search_results: str) -> ContextResponse:
+        """Asynchronously generate an answer based on the search results."""
+        return await self.llm.ainvoke(
+            self.prompt.format(
+                query=query,
+                search_results=search_results
+            )
+        )
@@ -0,0 +1,182 @@
+"""
+Prometheus metrics for the agent pipeline.
+
+Metric objects are module level singletons; instrumentation is a timer and a counter increment per
+stage, so it adds negligible overhead to the request path.
+"""
+
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Tuple
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+import time
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+STAGE_LATENCY = Histogram(
+    "agent_stage_latency_seconds",
+    "Latency of each stage of the agent pipeline",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+REQUEST_LATENCY = Histogram(
+    "agent_request_latency_seconds",
+    "End-to-end latency of Router.process_query per decision path",
+    ["decision_path"],
+    buckets=LATENCY_BUCKETS
+)
+STAGE_ERRORS = Counter(
+    "agent_stage_errors_total",
+    "Exceptions raised by each stage of the agent pipeline",
+    ["stage"]
+)
+RETRIES = Counter(
+    "agent_retries_total",
+    "Retries performed by a component",
+    ["component"]
+)
+RETRIEVED_DOCUMENTS = Histogram(
+    "agent_retrieved_documents",
+    "Documents returned per retrieval query ('per_query') and unique documents per request ('unique')",
+    ["kind"],
+    buckets=(0, 1, 2, 4, 8, 12, 16, 24, 32)
+)
+RETRIEVAL_RELEVANCE = Histogram(
+    "agent_retrieval_best_relevance",
+    "Cosine similarity of the most relevant retrieved document per request",
+    buckets=(0.1, 0.2, 0.25, 0.3, 0.35, 0.4, 0.45, 0.5, 0.6, 0.7, 0.8, 0.9, 1)
+)
+RETRIEVAL_LEG_LATENCY = Histogram(
+    "agent_retrieval_leg_latency_seconds",
+    "Latency of each retrieval leg per search of the analyzer queries: 'dense' (vector search + MMR) and 'lexical' (BM25 + lookup)",
+    ["leg"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+NO_RELEVANT_CONTEXT = Counter(
+    "agent_no_relevant_context_total",
+    "Requests whose retrieved documents were all below the relevance threshold, answered without generation"
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens reported by the LLM provider, by model profile (component) and model",
+    ["profile", "model", "kind"]
+)
+LLM_CALLS = Counter(
+    "llm_calls_total",
+    "LLM calls by model profile (component), model and outcome",
+    ["profile", "model", "outcome"]
+)
+LLM_LATENCY = Histogram(
+    "llm_call_latency_seconds",
+    "Latency of each LLM call (until the last streamed chunk), by model profile (component) and model",
+    ["profile", "model"],
+    buckets=LATENCY_BUCKETS
+)
+HEDGED_REQUESTS = Counter(
+    "llm_hedged_requests_total",
+    "Calls through the hedging wrapper, by component and outcome (not_hedged, primary_won, hedge_won, failed)",
+    ["profile", "outcome"]
+)
+HEDGED_CALL_LATENCY = Histogram(
+    "llm_hedged_call_latency_seconds",
+    "End-to-end latency of calls through the hedging wrapper, hedged or not, by component",
+    ["profile"],
+    buckets=LATENCY_BUCKETS
+)
+DEGRADATIONS = Counter(
+    "agent_degradations_total",
+    "Stages degraded to meet the request deadline, by kind (default_path, raw_query, reduced_k, no_context, rag_answer, timeout_answer)",
+    ["kind"]
+)
+SPECULATIONS = Counter(
+    "agent_speculations_total",
+    "Speculative query analysis/retrieval runs started alongside routing, by whether the result was used or wasted",
+    ["outcome"]
+)
+SPECULATION_SAVED_SECONDS = Histogram(
+    "agent_speculation_saved_seconds",
+    "Latency hidden behind routing by speculative work whose result was used",
+    buckets=LATENCY_BUCKETS
+)
+
+@contextmanager
+def observe_stage(stage: str) -> Iterator[None]:
+    """Time a pipeline stage and count it as an error if it raises."""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(stage).inc()
+        raise
+    finally:
+        STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+
+class TokenUsageCallback(BaseCallbackHandler):
+    """Counts prompt and completion tokens, call outcomes and latency for every chat model it is attached to."""
+
+    run_inline = True  # Plain counter updates, no need to hop to an executor in async runs
+
+    def __init__(self):
+        self._runs: Dict[UUID, Tuple[str, str, float]] = {}
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id: UUID, metadata: Dict[str, Any] = None, **kwargs: Any) -> None:
+        metadata = metadata or {}
+        self._runs[run_id] = (
+            metadata.get("model_profile", "unassigned"),
+            metadata.get("ls_model_name", "unknown"),
+            time.perf_counter()
+        )
+
+    def _finish(self, run_id: UUID, outcome: str) -> Tuple[str, str]:
+        profile, model, start = self._runs.pop(run_id, ("unassigned", "unknown", None))
+        LLM_CALLS.labels(profile, model, outcome).inc()
+        if start is not None:
+            LLM_LATENCY.labels(profile, model).observe(time.perf_counter() - start)
+        return profile, model
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        profile, model = self._finish(run_id, "success")
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    LLM_TOKENS.labels(profile, model, "prompt").inc(usage.get("input_tokens", 0))
+                    LLM_TOKENS.labels(profile, model, "completion").inc(usage.get("output_tokens", 0))
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._finish(run_id, "error")
+
+token_usage_callback = TokenUsageCallback()
+
+class _StatsCollector:
+    """Exposes the numeric values of components' stats() dicts as gauges."""
+
+    def __init__(self):
+        self._sources: Dict[str, Callable[[], dict]] = {}
+
+    def register(self, name: str, stats_fn: Callable[[], dict]) -> None:
+        self._sources[name] = stats_fn
+
+    def collect(self):
+        for name, stats_fn in self._sources.items():
+            for key, value in _flatten(stats_fn()).items():
+                yield GaugeMetricFamily(f"app_{name}_{key}", f"{name} {key}", value=value)
+
+def _flatten(stats: dict, prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}_"))
+        elif isinstance(value, (int, float)):
+            flat[f"{prefix}{key}"] = float(value)
+    return flat
+
+stats_collector = _StatsCollector()
+REGISTRY.register(stats_collector)
+
+def register_stats(name: str, stats_fn: Callable[[], dict]) -> None:
+    """Publish a component's stats() on /metrics as app_<name>_<key> gauges."""
+    stats_collector.register(name, stats_fn)
@@ -0,0 +1,57 @@
+"""
+Registry of the model used by each LLM component of the agent.
+
+Profiles live in agent/profiles/*.json, keyed by component. The decision paths map to components as
+'retrieve' -> query_analyzer + rag_response_generator + conversational_response_generator (or
+grounded_conversational_generator in single-pass mode), 'cross-question' -> pedagogical_response_generator,
+'no-retrieval reply' -> no_retrieval_response_generator and 'deny' -> deny_response_generator; routing uses
+router (or fused_router_analyzer) and history_summarizer folds long conversations.
+
+default.json defines every component. MODEL_PROFILES selects another file (by name in agent/profiles or by
+path) whose entries override the defaults, so each environment can switch models without code changes.
+"""
+
+from functools import lru_cache
+from typing import Dict, Literal, Optional
+from pydantic import BaseModel
+import json
+import os
+
+PROFILES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "profiles")
+
+class ModelProfile(BaseModel):
+    """Model and call settings for one component."""
+    provider: Literal["openai", "groq"] = "openai"
+    model: str
+    temperature: float = 0
+    max_tokens: Optional[int] = None
+    timeout: Optional[float] = None  # Segundos por llamada; None usa LLM_TIMEOUT_SECONDS
+    # Structured-output components only: ask for the reasoning_steps field. Production skips it (the serving path
+    # never reads it and it dominates their latency); the eval harness turns it on explicitly
+    reasoning: bool = False
+    # Secondary model for hedged requests (HEDGING_ENABLED, structured-output components only)
+    hedge: Optional["ModelProfile"] = None
+
+def _profiles_path(name_or_path: str) -> str:
+    if os.path.exists(name_or_path):
+        return name_or_path
+    return os.path.join(PROFILES_DIR, f"{name_or_path}.json")
+
+def _read_profiles(path: str) -> Dict[str, ModelProfile]:
+    with open(path, encoding="utf-8") as f:
+        return {component: ModelProfile(**settings) for component, settings in json.load(f).items()}
+
+@lru_cache(maxsize=None)
+def load_profiles(name_or_path: str = "default") -> Dict[str, ModelProfile]:
+    """The default profiles, overridden by the entries of the selected profile file."""
+    profiles = _read_profiles(_profiles_path("default"))
+    if name_or_path != "default":
+        profiles.update(_read_profiles(_profiles_path(name_or_path)))
+    return profiles
+
+def get_profile(component: str) -> ModelProfile:
+    """Profile of a component in the registry selected by MODEL_PROFILES."""
+    profiles = load_profiles(os.getenv("MODEL_PROFILES") or "default")
+    if component not in profiles:
+        raise KeyError(f"No model profile defined for component '{component}'")
+    return profiles[component]
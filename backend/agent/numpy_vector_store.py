@@ -0,0 +1,246 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from uuid import uuid4
+import json
+import os
+import numpy as np
+
+DEFAULT_INDEX_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data", "vector_index"
+)
+
+# (documento, similitud coseno con la consulta, vector del documento)
+Candidate = Tuple[Document, float, np.ndarray]
+
+class NumpyVectorStore:
+    """
+    In-process exact vector index for small corpora, an alternative to Milvus selected with VECTOR_STORE_BACKEND=numpy.
+
+    The chunk vectors are normalized and kept in one contiguous (n, d) float32 or float16 matrix, so a search is a
+    single matrix product (cosine similarity) and a partial sort. Metadata is stored by column: every field is an
+    int32 code per chunk into a table of its distinct values, which keeps repeated titles/sources small and turns
+    metadata filters into vectorized comparisons. Metadata values are stored and returned as strings (as
+    RAG.add_documents already flattens them for Milvus); filters compare against str(value). Chunk texts are one
+    UTF-8 blob with offsets.
+
+    Everything is saved under 'path' as .npy/.bin files that are opened memory-mapped, so loading is instant and
+    several workers share the same pages. float16 halves memory and disk, but NumPy scores it more slowly.
+    """
+
+    index_params = {"metric_type": "COSINE", "index_type": "FLAT"}
+
+    def __init__(self, embedding_function: Embeddings, path: Optional[str] = DEFAULT_INDEX_PATH, dtype: str = "float32"):
+        self.embedding_function = embedding_function
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self._clear()
+        if path and os.path.exists(os.path.join(path, "index.json")):
+            self.load()
+
+    def _clear(self) -> None:
+        self.vectors = np.zeros((0, 0), dtype=self.dtype)
+        self.pks = np.zeros(0, dtype="<U1")
+        self.text_offsets = np.zeros(1, dtype=np.int64)
+        self.texts = np.zeros(0, dtype=np.uint8)
+        self.fields: List[str] = []
+        self.values: Dict[str, List[str]] = {}
+        self.codes = np.zeros((0, 0), dtype=np.int32)
+
+    def __len__(self) -> int:
+        return len(self.pks)
+
+    # --- Persistencia ---
+
+    def load(self) -> None:
+        with open(os.path.join(self.path, "index.json"), encoding="utf-8") as f:
+            index = json.load(f)
+        self.fields = index["fields"]
+        self.values = index["values"]
+        self.dtype = np.dtype(index["dtype"])
+        # Vistas ndarray sobre los mapeos: mismas páginas compartidas, sin el costo de indexar un np.memmap
+        self.vectors = self._map("vectors.npy")
+        self.pks = self._map("pks.npy")
+        self.codes = self._map("metadata.npy")
+        self.text_offsets = self._map("text_offsets.npy")
+        texts_path = os.path.join(self.path, "texts.bin")
+        self.texts = np.memmap(texts_path, dtype=np.uint8, mode="r").view(np.ndarray) if os.path.getsize(texts_path) else np.zeros(0, dtype=np.uint8)
+
+    def _map(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.path, name), mmap_mode="r").view(np.ndarray)
+
+    def save(self) -> None:
+        """Write every file under a temporary name and swap it in; index.json goes last so readers never see a partial index."""
+        if not self.path:
+            return
+        os.makedirs(self.path, exist_ok=True)
+
+        def replace(name: str, write) -> None:
+            tmp = os.path.join(self.path, f".{name}.tmp")
+            with open(tmp, "wb") as f:
+                write(f)
+            os.replace(tmp, os.path.join(self.path, name))
+
+        replace("vectors.npy", lambda f: np.save(f, np.ascontiguousarray(self.vectors)))
+        replace("pks.npy", lambda f: np.save(f, np.asarray(self.pks)))
+        replace("metadata.npy", lambda f: np.save(f, np.asarray(self.codes)))
+        replace("text_offsets.npy", lambda f: np.save(f, np.asarray(self.text_offsets)))
+        replace("texts.bin", lambda f: f.write(np.asarray(self.texts).tobytes()))
+        replace("index.json", lambda f: f.write(json.dumps({
+            "fields": self.fields,
+            "values": self.values,
+            "dtype": self.dtype.name,
+            "count": len(self)
+        }, ensure_ascii=False).encode("utf-8")))
+
+    # --- Escritura ---
+
+    def add_documents(self, documents: List[Document], ids: Optional[List[str]] = None, save: bool = True) -> List[str]:
+        vectors = self.embedding_function.embed_documents([doc.page_content for doc in documents])
+        return self.add_embeddings(
+            [doc.page_content for doc in documents],
+            vectors,
+            [doc.metadata or {} for doc in documents],
+            ids,
+            save=save
+        )
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        vectors: Sequence[Sequence[float]],
+        metadatas: List[Dict],
+        ids: Optional[List[str]] = None,
+        save: bool = True
+    ) -> List[str]:
+        """
+        Append already embedded chunks (e.g. exported from Milvus) and save the index. Saving rewrites every file, so
+        batched ingestion passes save=False and calls save() once at the end.
+        """
+        if not texts:
+            return []
+        ids = ids or [str(uuid4()) for _ in texts]
+        vectors = np.asarray(vectors, dtype=np.float32)
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        # Columnas nuevas: los chunks anteriores quedan con el valor vacío
+        for metadata in metadatas:
+            for field in metadata:
+                if field not in self.values and field != "pk":
+                    self.fields.append(field)
+                    self.values[field] = [""]
+        codes = np.zeros((len(self), len(self.fields)), dtype=np.int32)
+        codes[:, :self.codes.shape[1]] = self.codes
+        lookups = {field: {value: code for code, value in enumerate(self.values[field])} for field in self.fields}
+        new_codes = np.zeros((len(texts), len(self.fields)), dtype=np.int32)
+        for row, metadata in enumerate(metadatas):
+            for column, field in enumerate(self.fields):
+                value = str(metadata.get(field, ""))
+                if value not in lookups[field]:
+                    lookups[field][value] = len(self.values[field])
+                    self.values[field].append(value)
+                new_codes[row, column] = lookups[field][value]
+
+        encoded = [text.encode("utf-8") for text in texts]
+        offsets = self.text_offsets[-1] + np.cumsum([len(text) for text in encoded], dtype=np.int64)
+
+        self.vectors = np.concatenate([self.vectors, vectors.astype(self.dtype)]) if len(self) else vectors.astype(self.dtype)
+        self.pks = np.concatenate([np.asarray(self.pks), np.asarray(ids)])
+        self.codes = np.concatenate([codes, new_codes])
+        self.text_offsets = np.concatenate([self.text_offsets, offsets])
+        self.texts = np.concatenate([self.texts, np.frombuffer(b"".join(encoded), dtype=np.uint8)])
+        if save:
+            self.save()
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None) -> None:
+        keep = ~np.isin(self.pks, ids or [])
+        if keep.all():
+            return
+        if not keep.any():
+            self.delete_all()
+            return
+        starts, ends = self.text_offsets[:-1][keep], self.text_offsets[1:][keep]
+        self.texts = np.concatenate([self.texts[start:end] for start, end in zip(starts, ends)])
+        self.text_offsets = np.concatenate([[0], np.cumsum(ends - starts)]).astype(np.int64)
+        self.vectors = self.vectors[keep]
+        self.pks = self.pks[keep]
+        self.codes = self.codes[keep]
+        self.save()
+
+    def delete_all(self) -> None:
+        self._clear()
+        self.save()
+
+    # --- Búsqueda ---
+
+    def document(self, row: int) -> Document:
+        start, end = self.text_offsets[row:row + 2].tolist()
+        metadata = {field: self.values[field][code] for field, code in zip(self.fields, self.codes[row].tolist())}
+        metadata["pk"] = str(self.pks[row])
+        return Document(page_content=self.texts[start:end].tobytes().decode("utf-8"), metadata=metadata)
+
+    def filter_mask(self, filter: Optional[Dict] = None) -> Optional[np.ndarray]:
+        """Boolean mask of the chunks whose metadata equals every filter value (a list means any of its values)."""
+        if not filter:
+            return None
+        mask = np.ones(len(self), dtype=bool)
+        for field, accepted in filter.items():
+            if field not in self.values:
+                return np.zeros(len(self), dtype=bool)
+            accepted = accepted if isinstance(accepted, (list, tuple, set)) else [accepted]
+            codes = [self.values[field].index(str(value)) for value in accepted if str(value) in self.values[field]]
+            mask &= np.isin(self.codes[:, self.fields.index(field)], codes)
+        return mask
+
+    def search_with_vectors(self, vectors: Sequence[Sequence[float]], limit: int, filter: Optional[Dict] = None) -> List[List[Candidate]]:
+        """Exact top-'limit' chunks by cosine similarity for every query vector, with the chunk vectors (for MMR)."""
+        if not len(self) or not len(vectors):
+            return [[] for _ in vectors]
+        queries = np.asarray(vectors, dtype=np.float32)
+        queries /= np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12)
+        # (n, d) @ (d, nq): recorre la matriz de vectores una sola vez para todas las consultas
+        scores = np.ascontiguousarray((self.vectors.astype(np.float32, copy=False) @ queries.T).T)
+
+        mask = self.filter_mask(filter)
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+            limit = min(limit, int(mask.sum()))
+        limit = min(limit, len(self))
+        if limit <= 0:
+            return [[] for _ in vectors]
+
+        top = np.argpartition(-scores, limit - 1, axis=1)[:, :limit]
+        results = []
+        for query_scores, rows in zip(scores, top):
+            rows = rows[np.argsort(-query_scores[rows])]
+            candidate_vectors = self.vectors[rows].astype(np.float32, copy=False)
+            results.append([
+                (self.document(row), float(query_scores[row]), vector)
+                for row, vector in zip(rows.tolist(), candidate_vectors)
+            ])
+        return results
+
+    def get_by_ids(self, ids: Sequence[str]) -> Dict[str, Tuple[Document, np.ndarray]]:
+        """Chunks (document and stored vector) by primary key; unknown ids are left out."""
+        rows = np.flatnonzero(np.isin(self.pks, list(ids)))
+        return {
+            str(self.pks[row]): (self.document(row), np.asarray(self.vectors[row], dtype=np.float32))
+            for row in rows.tolist()
+        }
+
+    def similarity_search(self, query: str, k: int = 4, filter: Optional[Dict] = None) -> List[Document]:
+        vector = self.embedding_function.embed_query(query)
+        return [doc for doc, _, _ in self.search_with_vectors([vector], k, filter)[0]]
+
+def from_env(embeddings: Embeddings, collection_name: str) -> NumpyVectorStore:
+    """
+    NumpyVectorStore for the collection, in its own directory under NUMPY_VECTOR_STORE_PATH,
+    storing vectors as NUMPY_VECTOR_STORE_DTYPE (float32 or float16).
+    """
+    return NumpyVectorStore(
+        embeddings,
+        path=os.path.join(os.getenv("NUMPY_VECTOR_STORE_PATH", DEFAULT_INDEX_PATH), collection_name),
+        dtype=os.getenv("NUMPY_VECTOR_STORE_DTYPE", "float32")
+    )
@@ -0,0 +1,161 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+from langchain_core.embeddings import Embeddings
+import hashlib
+import json
+import os
+import numpy as np
+
+DEFAULT_DATASET_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "eval", "components", "router", "datasets", "router_dataset.json"
+)
+DEFAULT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "data", "pre_router_embeddings.json"
+)
+
+# Paths that depend on the query alone; 'retrieve' vs 'cross-question' depends on the conversation, so it stays with the LLM
+LOCAL_PATHS = ("no-retrieval reply", "deny")
+
+def load_examples(dataset_path: str = DEFAULT_DATASET_PATH) -> List[Dict]:
+    """Labelled (query, chat_history, expected_paths) examples from the router eval dataset."""
+    with open(dataset_path, encoding="utf-8") as f:
+        dataset = json.load(f)
+    return [
+        {"query": sample["query"], "chat_history": sample.get("chat_history", []), "expected_paths": sample["expected_paths"]}
+        for sample in dataset
+    ]
+
+class PreRouter:
+    """
+    k-nearest-neighbours classifier over embeddings of labelled router examples.
+
+    Each of the 'k' most similar examples votes for its expected paths, weighted by cosine similarity.
+    A decision is made locally only when the winning path is one of 'local_paths', its share of the
+    votes reaches 'min_confidence' and the nearest example has a similarity of at least 'min_similarity'; otherwise
+    the query is left to the LLM router.
+
+    Only the query is embedded, so queries that arrive with conversation history always go to the LLM router:
+    a short follow-up such as "¿y en la evaluación?" reads as off-topic on its own but not within the conversation.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        examples: List[Dict],
+        k: int = 5,
+        min_confidence: float = 0.8,
+        min_similarity: float = 0.5,
+        local_paths: Sequence[str] = LOCAL_PATHS,
+        cache_path: Optional[str] = DEFAULT_CACHE_PATH
+    ):
+        self.embeddings = embeddings
+        self.examples = examples
+        self.k = k
+        self.min_confidence = min_confidence
+        self.min_similarity = min_similarity
+        self.local_paths = tuple(local_paths)
+        self.cache_path = cache_path
+        self.vectors = self._embed_examples([example["query"] for example in examples])
+        self._local = 0
+        self._fallback = 0
+
+    def _cache_key(self, text: str) -> str:
+        model = getattr(self.embeddings, "model", "")
+        return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+    def _embed_examples(self, texts: List[str]) -> np.ndarray:
+        """Embed the examples, reusing the vectors cached on disk so startup does not re-embed the whole dataset."""
+        cache = {}
+        if self.cache_path and os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, encoding="utf-8") as f:
+                    cache = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"No se pudo leer la caché de embeddings del pre-router: {e}")
+
+        keys = [self._cache_key(text) for text in texts]
+        missing = [i for i, key in enumerate(keys) if key not in cache]
+        if missing:
+            vectors = self.embeddings.embed_documents([texts[i] for i in missing])
+            for i, vector in zip(missing, vectors):
+                cache[keys[i]] = vector
+            if self.cache_path:
+                os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+                with open(self.cache_path, "w", encoding="utf-8") as f:
+                    json.dump({key: cache[key] for key in keys}, f)
+
+        return self._normalize(np.array([cache[key] for key in keys], dtype=np.float32))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def classify(self, vector: Sequence[float], exclude: Optional[int] = None) -> Tuple[str, float, float]:
+        """
+        Return (path, confidence, nearest similarity) for an embedded query.
+        'exclude' leaves one example out, for leave-one-out evaluation on the seed dataset.
+        """
+        similarities = self.vectors @ self._normalize(np.asarray(vector, dtype=np.float32))
+        if exclude is not None:
+            similarities[exclude] = -np.inf
+
+        k = min(self.k, len(similarities) - (exclude is not None))
+        nearest = np.argpartition(-similarities, k - 1)[:k]
+        nearest = nearest[np.argsort(-similarities[nearest])]
+
+        votes: Dict[str, float] = {}
+        for i in nearest:
+            weight = max(float(similarities[i]), 0.0)
+            for path in self.examples[i]["expected_paths"]:
+                votes[path] = votes.get(path, 0.0) + weight
+
+        total = sum(max(float(similarities[i]), 0.0) for i in nearest)
+        path = max(votes, key=votes.get)
+        confidence = votes[path] / total if total > 0 else 0.0
+        return path, confidence, float(similarities[nearest[0]])
+
+    def decide(self, vector: Sequence[float], exclude: Optional[int] = None) -> Optional[Tuple[str, str]]:
+        """Return (decision_path, reasoning) when the decision can be made locally, None to defer to the LLM router."""
+        path, confidence, similarity = self.classify(vector, exclude)
+        if path in self.local_paths and confidence >= self.min_confidence and similarity >= self.min_similarity:
+            self._local += 1
+            return path, f"Pre-router: {self.k} nearest labelled examples vote '{path}' (confidence {confidence:.2f}, similarity {similarity:.2f})."
+        return self._defer()
+
+    def _defer(self) -> None:
+        self._fallback += 1
+        return None
+
+    def route(self, query: str, history: Sequence = ()) -> Optional[Tuple[str, str]]:
+        if history:
+            return self._defer()
+        return self.decide(self.embeddings.embed_query(query))
+
+    async def aroute(self, query: str, history: Sequence = ()) -> Optional[Tuple[str, str]]:
+        if history:
+            return self._defer()
+        return self.decide(await self.embeddings.aembed_query(query))
+
+    def stats(self) -> dict:
+        decisions = self._local + self._fallback
+        return {
+            "examples": len(self.examples),
+            "local_decisions": self._local,
+            "llm_fallbacks": self._fallback,
+            "local_ratio": self._local / decisions if decisions else 0.0
+        }
+
+def from_env(embeddings: Embeddings) -> Optional[PreRouter]:
+    """Build the pre-router configured by the PRE_ROUTER_* environment variables, or None if it is disabled."""
+    if os.getenv("PRE_ROUTER_ENABLED", "false").lower() != "true":
+        return None
+    return PreRouter(
+        embeddings,
+        load_examples(os.getenv("PRE_ROUTER_DATASET_PATH") or DEFAULT_DATASET_PATH),
+        k=int(os.getenv("PRE_ROUTER_K", "5")),
+        min_confidence=float(os.getenv("PRE_ROUTER_MIN_CONFIDENCE", "0.8")),
+        min_similarity=float(os.getenv("PRE_ROUTER_MIN_SIMILARITY", "0.5")),
+        cache_path=os.getenv("PRE_ROUTER_CACHE_PATH") or DEFAULT_CACHE_PATH
+    )
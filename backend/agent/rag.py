@@ -1,17 +1,87 @@
-from langchain_openai import OpenAIEmbeddings
 from langchain_milvus import Milvus
 from uuid import uuid4
 from langchain_core.messages import BaseMessage
 import os
 from pydantic import BaseModel, Field
-from typing import List
+from typing import Dict, List, Tuple
+import numpy as np
 import time
-from .llms.rag_response_generator import RAGResponseGenerator, extract_year_from_creation_date
-from .llms.rag_query_analyzer import RAGQueryAnalyzer
+import asyncio
+from .llms.rag_response_generator import RAGResponseGenerator, ContextResponse, extract_year_from_creation_date
+from .llms.rag_query_analyzer import RAGQueryAnalyzer, QueryAnalysis
+from .metrics import observe_stage, RETRIES, RETRIEVED_DOCUMENTS, RETRIEVAL_RELEVANCE, NO_RELEVANT_CONTEXT, RETRIEVAL_LEG_LATENCY
+from .llm_gateway import embeddings_model
+from .deadline import Deadline, DEGRADED_K
+from . import embedding_cache
+from . import numpy_vector_store, lexical_index
+from .numpy_vector_store import NumpyVectorStore, Candidate
 from langchain_core.documents import Document
 from langsmith import traceable
 from tqdm import tqdm
 
+# Similitud coseno mínima del mejor documento recuperado para generar una respuesta; por debajo se responde
+# directamente que no hay información. 0 = desactivado. Calibrar con eval/components/rag_retriever/calibrate_relevance_threshold.py
+RELEVANCE_THRESHOLD = float(os.getenv("RELEVANCE_THRESHOLD", "0"))
+# milvus: colección en el servidor Milvus. numpy: índice exacto en proceso (agent/numpy_vector_store.py), sin contenedores
+VECTOR_STORE_BACKEND = os.getenv("VECTOR_STORE_BACKEND", "milvus")
+# Peso de la relevancia frente a la diversidad en MMR: 1 = solo similitud con la consulta, 0 = solo diversidad
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.5"))
+# Búsqueda híbrida: la selección densa (MMR) se fusiona con BM25 sobre los mismos chunks por reciprocal rank fusion
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "false").lower() == "true"
+RRF_K = int(os.getenv("RRF_K", "60"))
+NO_INFORMATION_ANSWER = "No information found"
+TIMEOUT_ANSWER = "No answer within the request deadline"
+
+def cosine_similarity_from_score(score: float, metric_type: str) -> float:
+    """Cosine similarity of a Milvus search score. The embeddings are normalized, so for the (squared) L2
+    distance d of the default index cos = 1 - d / 2; IP and COSINE scores already are the cosine."""
+    if metric_type == "L2":
+        return 1 - score / 2
+    return score
+
+def mmr_select(query: List[float], candidates: List[List[float]], k: int, lambda_mult: float = 0.5) -> List[int]:
+    """
+    Maximal marginal relevance, the same greedy selection as langchain_core's maximal_marginal_relevance.
+
+    The query-candidate and candidate-candidate cosine similarities are computed in one pass, and each step
+    only updates the running maximum similarity of every candidate to the selected ones instead of
+    recomputing it against all of them.
+    """
+    if min(k, len(candidates)) <= 0:
+        return []
+    vectors = np.asarray(candidates, dtype=np.float32)
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query, dtype=np.float32)
+    query_similarity = vectors @ (query / max(float(np.linalg.norm(query)), 1e-12))
+    similarity = vectors @ vectors.T
+
+    selected = [int(np.argmax(query_similarity))]
+    redundancy = similarity[selected[0]].copy()
+    relevance = lambda_mult * query_similarity
+    available = np.ones(len(vectors), dtype=bool)
+    available[selected[0]] = False
+    for _ in range(min(k, len(vectors)) - 1):
+        scores = np.where(available, relevance - (1 - lambda_mult) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int, rrf_k: int = 60) -> List[Document]:
+    """
+    Fuse rankings of the same chunks (matched by pk): each chunk scores the sum of 1 / (rrf_k + rank) over the
+    rankings it appears in, and the best 'k' are returned. Ties keep the order of the first ranking.
+    """
+    scores: Dict[str, float] = {}
+    documents: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            pk = doc.metadata["pk"]
+            scores[pk] = scores.get(pk, 0.0) + 1 / (rrf_k + rank)
+            documents.setdefault(pk, doc)
+    return [documents[pk] for pk in sorted(scores, key=scores.get, reverse=True)[:k]]
+
 class SearchResult(BaseModel):
     """Result from a single search query"""
     query: str = Field(description="The query that produced these results")
@@ -52,8 +122,30 @@ class SearchResult(BaseModel):
 
 class RAG():
     def __init__(self, collection_name: str = "knowledge_base_collection", k: int = 4):
-        self.embeddings = OpenAIEmbeddings(model="text-embedding-3-small")
+        base_embeddings = embeddings_model()
+        # Las consultas se embeben a través de la caché; los documentos que se indexan van directo al modelo
+        self.embeddings = embedding_cache.from_env(base_embeddings)
+        self.k = k  # número de resultados finales
+        self.fetch_k = 20  # número de resultados iniciales de donde MMR seleccionará
+        self.lambda_mult = MMR_LAMBDA
+        self.relevance_threshold = RELEVANCE_THRESHOLD
+        self.hybrid = HYBRID_RETRIEVAL
+        self.rrf_k = RRF_K
         
+        if VECTOR_STORE_BACKEND == "numpy":
+            self.vector_store = numpy_vector_store.from_env(base_embeddings, collection_name)
+        else:
+            self.vector_store = self._connect_milvus(base_embeddings, collection_name)
+        # Índice BM25 de la misma colección, construido al indexar (add_documents)
+        self.lexical_index = lexical_index.from_env(collection_name)
+        
+        self.rag_response_generator = RAGResponseGenerator()
+        self.rag_query_analyzer = RAGQueryAnalyzer()
+        
+        self.max_retries = 3
+
+    @staticmethod
+    def _connect_milvus(embeddings, collection_name: str) -> Milvus:
         # En Milvus/langchain-milvus actual no se pueden definir campos de metadatos explícitamente
         # a través del constructor, tendremos que asegurarnos de que los metadatos se guarden 
         # correctamente durante el proceso de add_documents
@@ -61,35 +153,19 @@ class RAG():
         retries = 3
         while retries > 0:
             try:
-                self.vector_store = Milvus(
-                    embedding_function=self.embeddings,
+                return Milvus(
+                    embedding_function=embeddings,
                     connection_args={"uri": os.getenv("MILVUS_STANDALONE_URL")},
                     collection_name=collection_name,
                     search_params={"ef": 40}
                 )
-                
-                # Configurar el retriever para usar MMR sin búsqueda por file_path
-                self.retriever = self.vector_store.as_retriever(
-                    search_type="mmr", 
-                    search_kwargs={
-                        "k": k,  # número de resultados finales
-                        "fetch_k": 20,  # número de resultados iniciales de donde MMR seleccionará
-                        # Usar 'source' en lugar de 'file_path'
-                        "filter_keys": ["source"]  # Especificar explícitamente que use 'source' para filtros
-                    }
-                )
-                break
             except Exception as e:
                 retries -= 1
                 if retries == 0:
                     raise e
+                RETRIES.labels("milvus_connect").inc()
                 print(f"Error al inicializar Milvus: {e}")
                 time.sleep(2) 
-        
-        self.rag_response_generator = RAGResponseGenerator()
-        self.rag_query_analyzer = RAGQueryAnalyzer()
-        
-        self.max_retries = 3
 
     def add_documents(self, documents: list, ids: list = None):
         if ids is None:
@@ -172,7 +248,9 @@ class RAG():
         # Calcular número de lotes
         num_batches = (len(documents) + batch_size - 1) // batch_size
         
-        print("\nGuardando documentos en Milvus...")
+        print(f"\nGuardando documentos en {VECTOR_STORE_BACKEND}...")
+        # El índice NumPy se reescribe entero al guardar: se guarda una sola vez, al final de todos los lotes
+        batch_kwargs = {"save": False} if isinstance(self.vector_store, NumpyVectorStore) else {}
         for i in tqdm(range(num_batches), desc="Añadiendo documentos", unit="batch"):
             # Calcular índices de inicio y fin para el lote actual
             start_idx = i * batch_size
@@ -184,12 +262,18 @@ class RAG():
             
             # Añadir el lote a la base de vectores
             try:
-                self.vector_store.add_documents(documents=docs_batch, ids=ids_batch)
+                self.vector_store.add_documents(documents=docs_batch, ids=ids_batch, **batch_kwargs)
             except Exception as e:
                 print(f"Error al añadir lote {i+1}/{num_batches}: {e}")
                 # Intentar imprimir los metadatos del primer documento del lote para diagnóstico
                 if docs_batch:
                     print(f"Metadatos del primer documento del lote: {docs_batch[0].metadata}")
+        if batch_kwargs:
+            self.vector_store.save()
+            
+        # Índice léxico con las mismas claves, para la búsqueda híbrida
+        print("\nConstruyendo el índice BM25...")
+        self.lexical_index.add([doc.page_content for doc in documents], ids)
             
         # Verificar si se guardó correctamente
         print("\nVerificando almacenamiento en Milvus...")
@@ -216,8 +300,13 @@ class RAG():
 
     def delete_documents(self, ids: list):
         self.vector_store.delete(ids=ids)
+        self.lexical_index.delete(ids)
 
     def delete_all_documents(self):
+        self.lexical_index.delete_all()
+        if isinstance(self.vector_store, NumpyVectorStore):
+            self.vector_store.delete_all()
+            return
         try:
             # Get the primary key field name
             pk_field = self.vector_store.col.schema.primary_field.name
@@ -245,19 +334,194 @@ class RAG():
         return results
 
     @traceable(run_type="retriever")
-    def retrieve(self, query):
-        return self.retriever.invoke(query)
+    def retrieve(self, query, k: int = None, timings: Dict[str, float] = None):
+        """Retrieve the documents for the query; 'timings', if given, receives the seconds spent in each leg."""
+        start = time.perf_counter()
+        vectors = self.embeddings.embed_documents([query])
+        if timings is not None:
+            timings["embedding"] = time.perf_counter() - start
+        return self.search([query], vectors, k, timings)[0]
+
+    async def aretrieve(self, query, k: int = None):
+        """Retrieve the MMR selection for the query, or a smaller one (k and fetch_k) when 'k' is given."""
+        return (await self.aretrieve_many([query], k))[0]
+
+    @traceable(run_type="retriever")
+    async def aretrieve_many(self, queries: List[str], k: int = None) -> List[List[Document]]:
+        """Retrieve the documents of every query with one embeddings call and one vector store search."""
+        vectors = await self.embeddings.aembed_documents(queries)
+        return await asyncio.to_thread(self.search, queries, vectors, k)
+
+    def search(self, queries: List[str], vectors: List[List[float]], k: int = None, timings: Dict[str, float] = None) -> List[List[Document]]:
+        """
+        Dense MMR selection for every query and, with hybrid retrieval on, the BM25 results over the same chunks,
+        fused by reciprocal rank. The latency of each leg is recorded in RETRIEVAL_LEG_LATENCY (and 'timings').
+        """
+        timings = {} if timings is None else timings
+        start = time.perf_counter()
+        dense = self.search_by_vectors(vectors, k)
+        timings["dense"] = time.perf_counter() - start
+        RETRIEVAL_LEG_LATENCY.labels("dense").observe(timings["dense"])
+        if not self.hybrid or not len(self.lexical_index):
+            return dense
+
+        start = time.perf_counter()
+        lexical = self.lexical_search(queries, vectors, k)
+        timings["lexical"] = time.perf_counter() - start
+        RETRIEVAL_LEG_LATENCY.labels("lexical").observe(timings["lexical"])
+        return [
+            reciprocal_rank_fusion([dense_docs, lexical_docs], k or self.k, self.rrf_k)
+            for dense_docs, lexical_docs in zip(dense, lexical)
+        ]
+
+    def lexical_search(self, queries: List[str], vectors: List[List[float]], k: int = None) -> List[List[Document]]:
+        """
+        BM25 top-k of every query, read back from the vector store in one lookup. The cosine similarity to the
+        query vector is kept in metadata['relevance'], as for the dense results.
+        """
+        hits = [self.lexical_index.search(query, k or self.k) for query in queries]
+        stored = self._documents_by_id(list(dict.fromkeys(pk for query_hits in hits for pk, _ in query_hits)))
+        results = []
+        for vector, query_hits in zip(vectors, hits):
+            query = np.asarray(vector, dtype=np.float32)
+            query /= max(float(np.linalg.norm(query)), 1e-12)
+            documents = []
+            for pk, _ in query_hits:
+                if pk not in stored:
+                    continue
+                doc, doc_vector = stored[pk]
+                doc_vector = np.asarray(doc_vector, dtype=np.float32)
+                similarity = float(query @ doc_vector / max(float(np.linalg.norm(doc_vector)), 1e-12))
+                # Copia por consulta: el mismo chunk puede aparecer con otra relevancia para otra consulta
+                documents.append(Document(page_content=doc.page_content, metadata={**doc.metadata, "relevance": similarity}))
+            results.append(documents)
+        return results
+
+    def _documents_by_id(self, ids: List[str]) -> Dict[str, Tuple[Document, List[float]]]:
+        """Documents and stored vectors of the given primary keys, from either vector store backend."""
+        if not ids:
+            return {}
+        store = self.vector_store
+        if isinstance(store, NumpyVectorStore):
+            return store.get_by_ids(ids)
+        if store.col is None:
+            return {}
+        primary_field, vector_field = store._primary_field, store._vector_field
+        output_fields = ["*"] if store.enable_dynamic_field else [field for field in store.fields if field != vector_field]
+        rows = store.col.query(expr=f"{primary_field} in {ids}", output_fields=output_fields + [vector_field], timeout=store.timeout)
+        documents = {}
+        for row in rows:
+            vector = row.pop(vector_field)
+            doc = store._parse_document(dict(row))
+            documents[str(doc.metadata[primary_field])] = (doc, vector)
+        return documents
+
+    def search_by_vector(self, vector: List[float], k: int = None) -> List[Document]:
+        return self.search_by_vectors([vector], k)[0]
+
+    def search_by_vectors(self, vectors: List[List[float]], k: int = None) -> List[List[Document]]:
+        """
+        MMR search for several query vectors at once, with a single search of the vector store for all of them.
+        Each query gets the same selection as the Milvus MMR retriever, with lambda_mult = MMR_LAMBDA, keeping the
+        cosine similarity of each document to its query in metadata['relevance'].
+        """
+        k, fetch_k = (self.k, self.fetch_k) if k is None else (k, 2 * k)
+        if isinstance(self.vector_store, NumpyVectorStore):
+            candidates = self.vector_store.search_with_vectors(vectors, fetch_k)
+        else:
+            candidates = self._milvus_search_with_vectors(vectors, fetch_k)
+
+        metric_type = self._metric_type()
+        selections = []
+        for vector, results in zip(vectors, candidates):
+            order = mmr_select(vector, [candidate_vector for _, _, candidate_vector in results], k, self.lambda_mult)
+            documents = []
+            for index in order:
+                doc, score, _ = results[index]
+                doc.metadata["relevance"] = cosine_similarity_from_score(score, metric_type)
+                documents.append(doc)
+            selections.append(documents)
+        return selections
+
+    def _milvus_search_with_vectors(self, vectors: List[List[float]], fetch_k: int) -> List[List[Candidate]]:
+        """One Milvus search with nq = len(vectors) that also returns the stored vector of every candidate, for MMR."""
+        store = self.vector_store
+        if store.col is None or not vectors:
+            return [[] for _ in vectors]
+
+        vector_field = store._vector_field
+        output_fields = ["*"] if store.enable_dynamic_field else [field for field in store.fields if field != vector_field]
+        hits_per_query = store.col.search(
+            data=vectors,
+            anns_field=vector_field,
+            param=store.search_params,
+            limit=fetch_k,
+            output_fields=output_fields + [vector_field],
+            timeout=store.timeout
+        )
+        candidates = []
+        for hits in hits_per_query:
+            results = []
+            for hit in hits:
+                data = {field: hit.entity.get(field) for field in hit.entity.fields}
+                # Vector guardado: MMR no necesita volver a pedirlo ni a calcular embeddings de los candidatos
+                vector = data.pop(vector_field)
+                results.append((store._parse_document(data), hit.score, vector))
+            candidates.append(results)
+        return candidates
+
+    def _metric_type(self) -> str:
+        index_params = self.vector_store.index_params or {}
+        if isinstance(index_params, list):
+            index_params = index_params[0]
+        return index_params.get("metric_type", "L2")
 
-    @traceable
     def generate_answer(self, question: str, history: List[BaseMessage] = None):
-        query_analysis = self.rag_query_analyzer.analyze(question, history)
+        """Synchronous wrapper around agenerate_answer."""
+        return asyncio.run(self.agenerate_answer(question, history))
+
+    async def aanalyze_query(self, question: str, history: List[BaseMessage] = None, deadline: Deadline = None) -> QueryAnalysis:
+        """Analyze the question; if it overruns its budget of the deadline, the raw question is searched instead."""
+        deadline = deadline or Deadline(0)
+        with observe_stage("query_analysis"):
+            try:
+                return await deadline.run("query_analysis", self.rag_query_analyzer.aanalyze(question, history))
+            except asyncio.TimeoutError:
+                deadline.degrade("raw_query")
+                return QueryAnalysis(updated_query=question, queries=[question])
+
+    async def aretrieve_context(self, query_analysis: QueryAnalysis, deadline: Deadline = None) -> str:
+        """
+        Retrieve the documents for every query of the analysis and format them as context for the response generator.
+        Returns an empty context when no document reaches the relevance threshold, or when retrieval overruns the deadline twice.
+        """
+        deadline = deadline or Deadline(0)
+        # Todas las consultas se recuperan en un solo lote; la deduplicación se hace después en orden
+        with observe_stage("retrieval"):
+            try:
+                retrieved = await deadline.run("retrieval", self.aretrieve_many(query_analysis.queries))
+            except asyncio.TimeoutError:
+                # Si la búsqueda completa no entra en el presupuesto se reintenta una vez con menos documentos
+                deadline.degrade("reduced_k")
+                try:
+                    retrieved = await deadline.run("retrieval", self.aretrieve_many(query_analysis.queries, k=DEGRADED_K))
+                except asyncio.TimeoutError:
+                    # Tampoco entra el reintento: se sigue sin contexto y el router responde TIMEOUT_RESPONSE
+                    deadline.degrade("no_context")
+                    return ""
+
+        relevances = [doc.metadata.get("relevance", 1.0) for docs in retrieved for doc in docs]
+        if relevances:
+            RETRIEVAL_RELEVANCE.observe(max(relevances))
+        if not relevances or max(relevances) < self.relevance_threshold:
+            NO_RELEVANT_CONTEXT.inc()
+            return ""
 
         search_results = []
         seen_pks = set()
 
-        for query in query_analysis.queries:
-            docs = self.retrieve(query)
-            
+        for query, docs in zip(query_analysis.queries, retrieved):
+            RETRIEVED_DOCUMENTS.labels("per_query").observe(len(docs))
             docs = [doc for doc in docs if doc.metadata['pk'] not in seen_pks]
             seen_pks.update(doc.metadata['pk'] for doc in docs)
 
@@ -268,9 +532,51 @@ class RAG():
         formatted_results = []
         for result in search_results:
             formatted_results.extend(result.formatted())
-        context_str = "\n\n".join(formatted_results)
+        RETRIEVED_DOCUMENTS.labels("unique").observe(len(seen_pks))
+        return "\n\n".join(formatted_results)
+
+    async def aprepare_context(
+        self,
+        question: str,
+        history: List[BaseMessage] = None,
+        query_analysis: QueryAnalysis = None,
+        context: str = None,
+        deadline: Deadline = None
+    ) -> Tuple[QueryAnalysis, str]:
+        """Analyze the question and retrieve its context, skipping whatever was already computed (e.g. speculatively)."""
+        if query_analysis is None:
+            query_analysis = await self.aanalyze_query(question, history, deadline)
+        if context is None:
+            context = await self.aretrieve_context(query_analysis, deadline)
+        return query_analysis, context
+
+    @traceable
+    async def agenerate_answer(
+        self,
+        question: str,
+        history: List[BaseMessage] = None,
+        query_analysis: QueryAnalysis = None,
+        context: str = None,
+        deadline: Deadline = None
+    ):
+        """
+        Analyze the question, retrieve context and generate a grounded answer.
+        A query analysis and/or retrieved context computed beforehand (e.g. speculatively) can be passed in to skip those steps.
+        With a deadline, analysis and retrieval degrade when they overrun their budgets and generation gets the time left;
+        if it overruns too, TIMEOUT_ANSWER is returned without context.
+        """
+        deadline = deadline or Deadline(0)
+        query_analysis, context = await self.aprepare_context(question, history, query_analysis, context, deadline)
+        if not context:
+            # Nada relevante: no hace falta gastar una llamada al modelo para responder que no hay información
+            return ContextResponse(answer=NO_INFORMATION_ANSWER, context=[])
         
-        return self.rag_response_generator.generate_response(
-            query=query_analysis.updated_query,
-            search_results=context_str
-        )
+        with observe_stage("rag_generation"):
+            try:
+                return await deadline.run("rag_generation", self.rag_response_generator.agenerate_response(
+                    query=query_analysis.updated_query,
+                    search_results=context
+                ))
+            except asyncio.TimeoutError:
+                deadline.degrade("timeout_answer")
+                return ContextResponse(answer=TIMEOUT_ANSWER, context=[])
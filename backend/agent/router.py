@@ -1,52 +1,99 @@
-from typing import List, Tuple, Literal
+from typing import List, Tuple, Literal, AsyncIterator
 from langchain_core.messages import BaseMessage
 from dotenv import load_dotenv
-from .rag import RAG
+from .rag import RAG, TIMEOUT_ANSWER
 from .llms.pedagogical_response_generator import PedagogicalResponseGenerator
 from .llms.conversational_response_generator import ConversationalResponseGenerator
 from .llms.no_retrieval_response_generator import NoRetrievalResponseGenerator
 from .llms.deny_response_generator import DenyResponseGenerator
+from .llms.no_information_response_generator import NoInformationResponseGenerator, TIMEOUT_RESPONSE
+from .llms.history_summarizer import HistorySummarizer
+from .llms.fused_router_analyzer import FusedRouterAnalyzer
+from .llms.decision_paths import DECISION_PATHS_INTRO, DECISION_PATHS_INSTRUCTIONS
+from .llms.grounded_conversational_generator import GroundedConversationalGenerator
+from .llms.rag_response_generator import ContextResponse
+from .llms.rag_query_analyzer import QueryAnalysis
+from .history_manager import HistoryManager
+from .deadline import Deadline, REWRITE_MIN_SECONDS
+from . import pre_router
+from .metrics import observe_stage, REQUEST_LATENCY, STAGE_LATENCY, SPECULATIONS, SPECULATION_SAVED_SECONDS
 from langsmith import traceable
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
+from .llm_gateway import structured_model_for
+from .model_profiles import get_profile
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 import os
+import asyncio
+import time
 
 class RouterResponse(BaseModel):
     """The decision path for handling a user's query."""
     decision_path: Literal["no-retrieval reply", "retrieve", "cross-question", "deny"] = Field(
         description="Given a user question and the conversation history, choose which decision path would be most appropriate for answering their question."
     )
+
+class RouterResponseWithReasoning(RouterResponse):
+    """The decision path for handling a user's query."""
     reasoning_steps: str = Field(..., description="List of reasoning steps explaining why this decision path was chosen.")
+
+class Speculation:
+    """RAG work (query analysis, and optionally retrieval) started at the same time as routing, before the decision path is known."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.routing_seconds = 0.0
+
+    def discard(self):
+        """Cancel the speculative work because the router chose another path (or failed)."""
+        self.task.cancel()
+        # Si ya había terminado con error, consumir la excepción para que asyncio no la reporte
+        self.task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        SPECULATIONS.labels("wasted").inc()
+
+    async def result(self):
+        """Wait for the speculative work and return (query_analysis, context); context is None in 'analysis' mode."""
+        query_analysis, context, speculation_seconds = await self.task
+        SPECULATIONS.labels("used").inc()
+        # Ambas tareas arrancan a la vez: lo que se solapa con el routing es latencia ahorrada
+        SPECULATION_SAVED_SECONDS.observe(min(self.routing_seconds, speculation_seconds))
+        return query_analysis, context
     
 class Router:
-    def __init__(self):
-        self.rag = RAG()
+    def __init__(self, rag: RAG = None, with_reasoning: bool = None):
+        # The RAG can be built beforehand (e.g. in parallel with other startup work) and passed in
+        self.rag = rag if rag is not None else RAG()
         self.conversational_response_llm = ConversationalResponseGenerator()
         self.pedagogical_response_llm = PedagogicalResponseGenerator()
         self.no_retrieval_response_llm = NoRetrievalResponseGenerator()
         self.deny_response_llm = DenyResponseGenerator()
+        self.no_information_response = NoInformationResponseGenerator()
+        self.timeout_response = NoInformationResponseGenerator(TIMEOUT_RESPONSE)
+        # 'two-pass' (RAG answer rewritten by the conversational generator) or 'single-pass' (one grounded conversational call)
+        self.retrieve_generation_mode = os.getenv("RETRIEVE_GENERATION_MODE", "two-pass")
+        self.grounded_response_llm = GroundedConversationalGenerator() if self.retrieve_generation_mode == "single-pass" else None
+        self.history_manager = HistoryManager(
+            HistorySummarizer(),
+            max_tokens=int(os.getenv("HISTORY_TOKEN_BUDGET", "3000"))
+        )
+        # Local kNN classifier that answers obvious greetings / off-topic queries without the LLM router (None if disabled)
+        self.pre_router = pre_router.from_env(self.rag.embeddings)
+        # 'separate' (router and query analyzer are two LLM calls) or 'fused' (one call returns the path and the search queries)
+        self.routing_mode = os.getenv("ROUTING_MODE", "separate")
+        self.fused_router_analyzer = FusedRouterAnalyzer(with_reasoning) if self.routing_mode == "fused" else None
+        # 'off', 'analysis' (query analysis runs alongside routing) or 'retrieval' (analysis and retrieval)
+        self.speculative_mode = os.getenv("SPECULATIVE_MODE", "off")
 
-        self.llm = ChatOpenAI(
-            model="gpt-4o", 
-            temperature=0
-        ).with_structured_output(RouterResponse)
-
-        system_prompt_text = """You are an expert at routing user questions to the most appropriate decision path based on the user's query and conversation history. Choose one of the following decision paths:
-
-        - 'no-retrieval reply': Use this when the user engages in casual conversation, greetings, or simple inquiries that do not require any retrieval of information. Additionally, use this path when the user asks for clarification or rephrasing of something the assistant has just said, as these do not require retrieving new information.
-
-        - 'retrieve': Use this when the user's query involves AI or education, requiring retrieval of information from a vector store containing documents on these topics.
-
-        - 'cross-question': Use this path when asking a reflective question would help the user gain a deeper understanding. This approach should encourage the user to think critically rather than providing a direct answer immediately.
-        Important Constraints for 'cross-question':
-        - Do not choose this path if the conversation has just started (i.e., if there is little or no chat history).
-        - Before choosing this path, explicitly check the last AI message. If it contains a thought-provoking or reflective question rather than providing retrieved information, do not choose 'cross-question'. Consecutive cross-questions may frustrate the user. Instead, select 'retrieve' or another appropriate path.
-        - If the user does not respond to a previous cross-question or explicitly states they don't know the answer, do not choose 'cross-question' again. Instead, retrieve relevant information to provide them with a direct response.
+        # Without reasoning (the default in production) the router only writes the decision path
+        if with_reasoning is None:
+            with_reasoning = get_profile("router").reasoning
+        self.llm = structured_model_for(
+            "router",
+            RouterResponseWithReasoning if with_reasoning else RouterResponse
+        )
 
-        - 'deny': Choose this path when the user's query is not related to AI in any way. This includes questions that seek personal advice, general knowledge, or topics outside the chatbot's focus. The chatbot's purpose is strictly limited to discussions related to AI and should not attempt to serve as a general AI assistant.
+        system_prompt_text = f"""{DECISION_PATHS_INTRO}. Choose one of the following decision paths:
 
-        Always choose one and only one decision path based on the user's query and context.
+        {DECISION_PATHS_INSTRUCTIONS}
         """
 
         self.prompt = ChatPromptTemplate.from_messages([
@@ -57,78 +104,258 @@ class Router:
 
     def get_decision_path(self, query: str, history: List[BaseMessage]) -> Tuple[str, str]:
         """Determine the decision path for a given query and history."""
+        if self.pre_router is not None:
+            local_decision = self.pre_router.route(query, history)
+            if local_decision is not None:
+                return local_decision
         router_response = self.llm.invoke(self.prompt.format(query=query, chat_history=history))
-        return router_response.decision_path, router_response.reasoning_steps
+        return router_response.decision_path, getattr(router_response, "reasoning_steps", "")
+
+    async def aget_decision_path(self, query: str, history: List[BaseMessage]) -> Tuple[str, str]:
+        """Asynchronously determine the decision path for a given query and history."""
+        if self.pre_router is not None:
+            local_decision = await self.pre_router.aroute(query, history)
+            if local_decision is not None:
+                return local_decision
+        router_response = await self.llm.ainvoke(self.prompt.format(query=query, chat_history=history))
+        return router_response.decision_path, getattr(router_response, "reasoning_steps", "")
+
+    def process_query(self, query: str, history: List[BaseMessage], langsmith_extra: dict = None, thread_id: str = None) -> Tuple[str, list[dict]]:
+        """Synchronous wrapper around aprocess_query, returning the response and its citations."""
+        response, citations, _ = asyncio.run(self.aprocess_query(query, history, langsmith_extra=langsmith_extra, thread_id=thread_id))
+        return response, citations
 
     @traceable
-    def process_query(self, query: str, history: List[BaseMessage], langsmith_extra: dict = None) -> Tuple[str, list[dict]]:
-        """Processes a user query by selecting the appropriate response generation path."""
-    
+    async def aprocess_query(self, query: str, history: List[BaseMessage], langsmith_extra: dict = None, thread_id: str = None) -> Tuple[str, list[dict], list[str]]:
+        """
+        Processes a user query by selecting the appropriate response generation path.
+        Returns the response, its citations and the degradations applied to meet the request deadline (see deadline.py).
+        """
+        start = time.perf_counter()
+        deadline = Deadline()
+        with observe_stage("history_window"):
+            history = await self.history_manager.awindow(history, thread_id)
+        decision_path, speculation, query_analysis = await self._aroute(query, history, deadline)
+        generator, generator_kwargs, citations = await self._aprepare_generation(decision_path, query, history, speculation, query_analysis, deadline)
+        with observe_stage("final_generation"):
+            if self._skip_rewrite(generator_kwargs, deadline):
+                final_response = generator_kwargs["context"]
+            elif isinstance(generator, NoInformationResponseGenerator):
+                # Fixed replies make no model call, so they are not bound by the deadline
+                final_response = await generator.agenerate_response(**generator_kwargs)
+            else:
+                try:
+                    final_response = await deadline.run("final_generation", generator.agenerate_response(**generator_kwargs))
+                except asyncio.TimeoutError:
+                    if "context" in generator_kwargs:
+                        # The conversational rewrite overran: the RAG answer is returned as is
+                        deadline.degrade("rag_answer")
+                        final_response = generator_kwargs["context"]
+                    else:
+                        deadline.degrade("timeout_answer")
+                        final_response = await self.timeout_response.agenerate_response(query, history)
+                        citations = []
+        if isinstance(final_response, ContextResponse):
+            # Single-pass generation returns the cited context along with the answer
+            citations = self._format_citations(final_response)
+            final_response = final_response.answer
+        REQUEST_LATENCY.labels(decision_path).observe(time.perf_counter() - start)
+        return final_response, citations, deadline.degradations
+
+    @traceable
+    async def astream_query(self, query: str, history: List[BaseMessage], langsmith_extra: dict = None, thread_id: str = None) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Processes a user query like aprocess_query, but yields (event, data) tuples as the pipeline advances.
+        Emits 'routed', 'retrieved' (retrieve path only) and 'generating' stage events, then one 'token' event
+        per streamed chunk of the final response, a trailing 'citations' event and a 'done' event with the full response
+        and the degradations applied to meet the request deadline.
+        In single-pass mode the cited sources are only known after generation, so 'retrieved' carries no source count.
+        Once tokens are flowing the stream is not cut by the deadline; the rewrite is only skipped before it starts.
+        """
+        start = time.perf_counter()
+        deadline = Deadline()
+        with observe_stage("history_window"):
+            history = await self.history_manager.awindow(history, thread_id)
+        decision_path, speculation, query_analysis = await self._aroute(query, history, deadline)
+        yield "routed", {"decision_path": decision_path}
+
+        generator, generator_kwargs, citations = await self._aprepare_generation(decision_path, query, history, speculation, query_analysis, deadline)
+        if decision_path == "retrieve":
+            yield "retrieved", {"sources": len(citations)} if citations is not None else {}
+
+        yield "generating", {}
+        chunks = []
+        with observe_stage("final_generation"):
+            if self._skip_rewrite(generator_kwargs, deadline):
+                tokens = self._aiter_text(generator_kwargs["context"])
+            else:
+                tokens = generator.astream_response(**generator_kwargs)
+            async for token in tokens:
+                if isinstance(token, ContextResponse):
+                    citations = self._format_citations(token)
+                    continue
+                if not chunks:
+                    STAGE_LATENCY.labels("time_to_first_token").observe(time.perf_counter() - start)
+                chunks.append(token)
+                yield "token", {"text": token}
+        REQUEST_LATENCY.labels(decision_path).observe(time.perf_counter() - start)
+
+        yield "citations", {"citations": citations}
+        yield "done", {"response": "".join(chunks), "degradations": deadline.degradations}
+
+    @staticmethod
+    def _skip_rewrite(generator_kwargs: dict, deadline: Deadline) -> bool:
+        """Whether the conversational rewrite of the RAG answer ('context') would overrun the deadline."""
+        if "context" not in generator_kwargs:
+            return False
+        remaining = deadline.remaining()
+        if remaining is None or remaining >= REWRITE_MIN_SECONDS:
+            return False
+        deadline.degrade("rag_answer")
+        return True
+
+    @staticmethod
+    async def _aiter_text(text: str) -> AsyncIterator[str]:
+        yield text
+
+    async def _aroute(self, query: str, history: List[BaseMessage], deadline: Deadline = None) -> Tuple[str, Speculation, QueryAnalysis]:
+        """
+        Choose the decision path. In speculative mode the RAG work for the 'retrieve' path starts at the same
+        time as routing and is discarded if another path is chosen; in fused mode the routing call also returns
+        the query analysis. If routing overruns its budget of the deadline, the 'retrieve' path is used.
+        Returns the path, the speculation and the query analysis (None when not available).
+        """
+        deadline = deadline or Deadline(0)
+        speculation = None
+        if self.speculative_mode in ("analysis", "retrieval") and self.fused_router_analyzer is None:
+            speculation = Speculation(asyncio.create_task(self._aspeculate(query, history, deadline)))
+
+        start = time.perf_counter()
+        query_analysis = None
+        try:
+            with observe_stage("routing"):
+                try:
+                    if self.fused_router_analyzer is not None:
+                        decision_path, query_analysis = await deadline.run("routing", self._aroute_fused(query, history))
+                    else:
+                        decision_path, _ = await deadline.run("routing", self.aget_decision_path(query, history))
+                except asyncio.TimeoutError:
+                    deadline.degrade("default_path")
+                    decision_path = "retrieve"
+        except BaseException:
+            if speculation is not None:
+                speculation.discard()
+            raise
+
+        if speculation is not None:
+            speculation.routing_seconds = time.perf_counter() - start
+            if decision_path != "retrieve":
+                speculation.discard()
+                speculation = None
+        return decision_path, speculation, query_analysis
+
+    async def _aroute_fused(self, query: str, history: List[BaseMessage]) -> Tuple[str, QueryAnalysis]:
+        """Route and analyze the query in a single LLM call (after the local pre-router, if enabled)."""
+        if self.pre_router is not None:
+            local_decision = await self.pre_router.aroute(query, history)
+            if local_decision is not None:
+                return local_decision[0], None
+        routing_analysis = await self.fused_router_analyzer.aroute_and_analyze(query, history)
+        return routing_analysis.decision_path, routing_analysis.query_analysis()
+
+    async def _aspeculate(self, query: str, history: List[BaseMessage], deadline: Deadline = None):
+        """Run the query analysis (and retrieval, in 'retrieval' mode) ahead of the routing decision."""
+        start = time.perf_counter()
+        query_analysis = await self.rag.aanalyze_query(query, history, deadline)
+        context = None
+        if self.speculative_mode == "retrieval":
+            context = await self.rag.aretrieve_context(query_analysis, deadline)
+        return query_analysis, context, time.perf_counter() - start
+
+    async def _aprepare_generation(
+        self,
+        decision_path: str,
+        query: str,
+        history: List[BaseMessage],
+        speculation: Speculation = None,
+        query_analysis: QueryAnalysis = None,
+        deadline: Deadline = None
+    ) -> Tuple[object, dict, list[dict]]:
+        """Run everything that precedes the final generation for the chosen decision path.
+        Returns the final response generator, the kwargs to call it with, and the citations
+        (None when the generator returns them itself, as in single-pass mode)."""
         citations = []
-        decision_path, _ = self.get_decision_path(query, history)
+        generator_kwargs = {"query": query, "history": history}
 
         match decision_path:
             case "no-retrieval reply":
-                final_response = self.no_retrieval_response_llm.generate_response(
-                                    query=query,
-                                    history=history
-                                )
+                generator = self.no_retrieval_response_llm
             
             case "retrieve":
-                # Format RAG call properly
-                rag_kwargs = {}
-                if langsmith_extra:
-                    rag_kwargs["extra_kwargs"] = langsmith_extra
-                
-                rag_response = self.rag.generate_answer(
-                    question=query, 
-                    history=history,
-                    **rag_kwargs
-                )
-
-                context = rag_response.answer
-                # Create APA formatted citations with all available metadata and deduplicate using a set
-                citations_set = set()
-                all_citations = []
-                
-                for context_item in rag_response.context:
-                    # Usar el método mejorado que devuelve todos los componentes procesados
-                    citation_data = context_item.format_apa_citation()
-                    
-                    citation = {
-                        "text": citation_data["text"],
-                        "source": context_item.source,
-                        "title": citation_data["processed_title"],
-                        "author": citation_data["processed_author"],
-                        "year": citation_data["processed_year"]
-                    }
-                    
-                    # Use the citation text as key for deduplication
-                    if citation["text"] not in citations_set:
-                        citations_set.add(citation["text"])
-                        all_citations.append(citation)
-                
-                citations = all_citations
-
-                final_response = self.conversational_response_llm.generate_response(
-                    query=query,
-                    context=context,
-                    history=history
-                )
+                context = None
+                if speculation is not None:
+                    query_analysis, context = await speculation.result()
+                query_analysis, context = await self.rag.aprepare_context(query, history, query_analysis, context, deadline)
+
+                if not context and deadline is not None and "no_context" in deadline.degradations:
+                    # Retrieval overran the deadline: saying the documents have nothing on the topic would be wrong
+                    generator = self.timeout_response
+                elif not context:
+                    # Nothing reached the relevance threshold: fixed reply, no RAG or conversational generation
+                    generator = self.no_information_response
+                elif self.grounded_response_llm is not None:
+                    generator = self.grounded_response_llm
+                    generator_kwargs["search_results"] = context
+                    citations = None
+                else:
+                    rag_response = await self.rag.agenerate_answer(
+                        question=query, 
+                        history=history,
+                        query_analysis=query_analysis,
+                        context=context,
+                        deadline=deadline
+                    )
+
+                    if rag_response.answer == TIMEOUT_ANSWER:
+                        # The RAG answer overran the deadline: fixed reply, nothing to rewrite
+                        generator = self.timeout_response
+                    else:
+                        generator = self.conversational_response_llm
+                        generator_kwargs["context"] = rag_response.answer
+                        citations = self._format_citations(rag_response)
             
             case "cross-question":
-                final_response = self.pedagogical_response_llm.generate_response(
-                    query=query,
-                    history=history
-                )
+                generator = self.pedagogical_response_llm
             
             case "deny":
-                final_response = self.deny_response_llm.generate_response(
-                                    query=query,
-                                    history=history
-                                )
+                generator = self.deny_response_llm
+
+        return generator, generator_kwargs, citations
 
-        return final_response, citations
+    @staticmethod
+    def _format_citations(rag_response) -> list[dict]:
+        """Create APA formatted citations with all available metadata, deduplicated by citation text."""
+        citations_set = set()
+        all_citations = []
+        
+        for context_item in rag_response.context:
+            # Usar el método mejorado que devuelve todos los componentes procesados
+            citation_data = context_item.format_apa_citation()
+            
+            citation = {
+                "text": citation_data["text"],
+                "source": context_item.source,
+                "title": citation_data["processed_title"],
+                "author": citation_data["processed_author"],
+                "year": citation_data["processed_year"]
+            }
+            
+            # Use the citation text as key for deduplication
+            if citation["text"] not in citations_set:
+                citations_set.add(citation["text"])
+                all_citations.append(citation)
+        
+        return all_citations
 
 if __name__ == "__main__":
     load_dotenv()
@@ -0,0 +1,55 @@
+from typing import List, Optional
+from langchain_core.documents import Document
+from datetime import datetime, timezone
+import hashlib
+import json
+import os
+import time
+
+CORPUS_VERSION_PATH = os.path.join(os.path.dirname(__file__), "corpus_version.json")
+
+def write_corpus_version(chunks: List[Document], path: str = CORPUS_VERSION_PATH) -> str:
+    """Record a fingerprint of the indexed chunks; written by load_data after every (re)indexing."""
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(str(chunk.metadata.get("source", "")).encode("utf-8"))
+        digest.update(chunk.page_content.encode("utf-8"))
+    version = digest.hexdigest()[:16]
+
+    # Swapped in from a temporary file so a running server never reads a partial file (which would disable its cache)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({
+            "version": version,
+            "chunks": len(chunks),
+            "indexed_at": datetime.now(timezone.utc).isoformat()
+        }, f, indent=2)
+    os.replace(tmp, path)
+    return version
+
+class CorpusVersion:
+    """
+    Current version of the indexed corpus, for caches that must be invalidated on reindexing.
+
+    The CORPUS_VERSION environment variable takes precedence; otherwise the file written by load_data
+    is re-read at most every 'refresh_seconds'. Returns None when neither is available: without a version
+    a reindexing cannot be detected, so callers must not cache (AnswerCache is disabled).
+    """
+
+    def __init__(self, path: str = CORPUS_VERSION_PATH, refresh_seconds: float = 30):
+        self.path = path
+        self.refresh_seconds = refresh_seconds
+        self._version = None
+        self._checked_at = None
+
+    def __call__(self) -> Optional[str]:
+        if os.getenv("CORPUS_VERSION"):
+            return os.getenv("CORPUS_VERSION")
+        if self._checked_at is None or time.monotonic() - self._checked_at > self.refresh_seconds:
+            self._checked_at = time.monotonic()
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._version = json.load(f)["version"]
+            except (OSError, ValueError, KeyError):
+                self._version = None
+        return self._version
@@ -0,0 +1,47 @@
+"""
+Copy the Milvus collection into the in-process NumPy index (agent/numpy_vector_store.py) without re-embedding the corpus,
+and rebuild the BM25 index of hybrid retrieval (agent/lexical_index.py) from the same chunks.
+After running it, set VECTOR_STORE_BACKEND=numpy and the backend no longer needs the Milvus containers.
+Run from the backend directory: python -m data.export_vector_index
+"""
+
+from agent.numpy_vector_store import NumpyVectorStore
+from agent.lexical_index import BM25Index
+from agent.rag import RAG
+from agent.llm_gateway import embeddings_model
+from agent import numpy_vector_store, lexical_index
+from typing import Optional
+from dotenv import load_dotenv
+from langchain_milvus import Milvus
+
+def export_milvus_collection(milvus: Milvus, store: NumpyVectorStore, lexical: Optional[BM25Index] = None, batch_size: int = 1000) -> int:
+    """
+    Append every chunk of the Milvus collection (text, vector and metadata) to 'store', saving it once at the end,
+    and its text to the 'lexical' index if given; returns how many were copied.
+    """
+    primary_field, text_field, vector_field = milvus._primary_field, milvus._text_field, milvus._vector_field
+    rows = milvus.col.query(expr=f"{primary_field} != ''", output_fields=["*"])
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        store.add_embeddings(
+            [row[text_field] for row in batch],
+            [row[vector_field] for row in batch],
+            [{field: value for field, value in row.items() if field not in (primary_field, text_field, vector_field)} for row in batch],
+            [str(row[primary_field]) for row in batch],
+            save=False
+        )
+    store.save()
+    if lexical is not None:
+        lexical.add([row[text_field] for row in rows], [str(row[primary_field]) for row in rows])
+    return len(rows)
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    collection_name = "knowledge_base_collection"
+    store = numpy_vector_store.from_env(embeddings_model(), collection_name)
+    store.delete_all()
+    lexical = lexical_index.from_env(collection_name)
+    lexical.delete_all()
+    copied = export_milvus_collection(RAG._connect_milvus(embeddings_model(), collection_name), store, lexical)
+    print(f"{copied} chunks copiados a {store.path} ({store.vectors.dtype}, {store.vectors.nbytes / 1e6:.1f} MB de vectores)")
@@ -3,10 +3,11 @@ from dotenv import load_dotenv
 from agent.rag import RAG
 from langchain_community.document_loaders import PyMuPDFLoader
 from data.splitters.semantic_splitter import semantic_split
+from data.corpus_version import write_corpus_version
 import re
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from langchain_openai import ChatOpenAI
+from agent.llm_gateway import chat_model
 from langchain.prompts import ChatPromptTemplate
 import concurrent.futures
 from tqdm import tqdm
@@ -58,8 +59,8 @@ def extract_document_metadata(pages, document_path: str) -> tuple[DocumentMetada
     {document_text}
     """)
     
-    # Usar ChatOpenAI con la versión más reciente
-    model = ChatOpenAI(temperature=0, model="gpt-4o-mini")
+    # Cliente compartido del gateway de LLMs (pool de conexiones, timeouts y reintentos)
+    model = chat_model(model="gpt-4o-mini", temperature=0)
     
     # Crear la cadena con salida estructurada
     extraction_chain = prompt | model.with_structured_output(DocumentMetadata)
@@ -165,6 +166,8 @@ def load_data(rag: RAG):
     print(f"Añadiendo {len(splits)} chunks a la colección...")
     # Añadir documentos a la colección
     rag.add_documents(splits)
+    # Registrar la versión del corpus indexado para invalidar las respuestas cacheadas
+    print(f"\nVersión del corpus: {write_corpus_version(splits)}")
     print("\nProceso completado con éxito!")
     print(f"{'='*80}\n")
 
@@ -1,5 +1,5 @@
 from langchain_experimental.text_splitter import SemanticChunker
-from langchain_openai import OpenAIEmbeddings
+from agent.llm_gateway import embeddings_model
 from tqdm import tqdm
 
 def semantic_split(documents):
@@ -9,7 +9,7 @@ def semantic_split(documents):
     Preserva todos los metadatos del documento original en cada chunk.
     """
     text_splitter = SemanticChunker(
-        embeddings=OpenAIEmbeddings(model="text-embedding-3-small"),
+        embeddings=embeddings_model(),
         breakpoint_threshold_type="standard_deviation",
         breakpoint_threshold_amount=1.0
     )
@@ -0,0 +1,79 @@
+"""
+Benchmark of hedged structured calls (see agent/hedging.py) against the primary model alone.
+
+Sends the router dataset queries through the query analyzer and the router, alternating the plain and the
+hedged client on every query so both see the same provider conditions, and reports the latency percentiles
+of each, the hedge rate and how often the hedge won. The tail only shows with enough calls, so repeat the
+dataset several times. Needs GROQ_API_KEY for the default hedge models.
+Run from the backend directory: python -m eval.components.benchmark_hedging [repeats]
+"""
+
+from agent.router import Router, RouterResponse
+from agent.llms.rag_query_analyzer import RAGQueryAnalyzer, QueryAnalysis
+from agent.llm_gateway import structured_model_for
+from eval.helpers.eval_helper import create_chat_history
+from dotenv import load_dotenv
+from typing import Any, Callable, Dict, List
+import json
+import os
+import sys
+import time
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def benchmark_hedging(component: str, schema, target: Any, call: Callable, samples: List[Dict[str, Any]], repeats: int) -> Dict[str, Dict[str, float]]:
+    """
+    Latency of 'call(query, history)' with target.llm set to the plain and to the hedged client.
+    Returns the latency percentiles per variant and the hedging stats of the hedged one.
+    """
+    plain = structured_model_for(component, schema, hedged=False)
+    hedged = structured_model_for(component, schema, hedged=True)
+    latencies = {"plain": [], "hedged": []}
+
+    for _ in range(repeats):
+        for sample in samples:
+            history = create_chat_history(sample["chat_history"])
+            for name, llm in (("plain", plain), ("hedged", hedged)):
+                target.llm = llm
+                start = time.perf_counter()
+                call(sample["query"], history)
+                latencies[name].append(time.perf_counter() - start)
+
+    results = {
+        name: {
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+            "max": max(values)
+        }
+        for name, values in latencies.items()
+    }
+    results["hedged"].update(hedged.stats())
+    return results
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    dataset_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "router", "datasets", "router_dataset.json")
+    with open(dataset_path, encoding="utf-8") as f:
+        samples = json.load(f)
+
+    analyzer = RAGQueryAnalyzer(with_reasoning=False)
+    router = Router(with_reasoning=False)
+    router.pre_router = None  # Only the LLM call is measured
+
+    results = {
+        "query_analyzer": benchmark_hedging("query_analyzer", QueryAnalysis, analyzer, analyzer.analyze, samples, repeats),
+        "router": benchmark_hedging("router", RouterResponse, router, router.get_decision_path, samples, repeats)
+    }
+
+    print(f"Hedged vs plain structured calls, {len(samples) * repeats} calls per component and variant")
+    print(f"{'component':>15} {'variant':>8} {'p50':>7} {'p95':>7} {'p99':>7} {'max':>7} {'hedge rate':>11} {'hedge wins':>11}")
+    for component, variants in results.items():
+        for name, result in variants.items():
+            hedge_columns = f"{result['hedge_rate']:>11.2f} {result['hedge_wins']:>11}" if name == "hedged" else ""
+            print(f"{component:>15} {name:>8} {result['p50']:>6.2f}s {result['p95']:>6.2f}s {result['p99']:>6.2f}s {result['max']:>6.2f}s {hedge_columns}")
+        print(f"{component:>15} {'p99 gain':>8} {variants['plain']['p99'] - variants['hedged']['p99']:>30.2f}s")
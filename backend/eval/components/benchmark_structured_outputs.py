@@ -0,0 +1,82 @@
+"""
+Benchmark of the lean (production) vs verbose (with reasoning_steps) structured output schemas.
+
+Runs the router dataset queries sequentially through the router, the query analyzer and the fused routing +
+query analysis call, once per schema variant, and reports per call the mean and median latency and the mean
+completion tokens. Quality is not scored here; use evaluate_router / evaluate_query_analyzer with
+with_reasoning=False for that.
+Run from the backend directory: python -m eval.components.benchmark_structured_outputs [n_samples]
+"""
+
+from agent.router import Router
+from agent.llms.rag_query_analyzer import RAGQueryAnalyzer
+from agent.llms.fused_router_analyzer import FusedRouterAnalyzer
+from eval.helpers.eval_helper import create_chat_history, llm_tokens_used
+from dotenv import load_dotenv
+from statistics import mean, median
+from typing import Any, Callable, Dict, List
+import json
+import os
+import sys
+import time
+
+def benchmark_component(call: Callable, profile: str, samples: List[Dict[str, Any]]) -> Dict[str, float]:
+    """Latency and completion tokens per call of 'call(query, history)' over the samples."""
+    latencies = []
+    tokens_before = llm_tokens_used(kind="completion", profile=profile)
+    for sample in samples:
+        history = create_chat_history(sample["chat_history"])
+        start = time.perf_counter()
+        call(sample["query"], history)
+        latencies.append(time.perf_counter() - start)
+    completion_tokens = llm_tokens_used(kind="completion", profile=profile) - tokens_before
+    return {
+        "mean_latency": mean(latencies),
+        "median_latency": median(latencies),
+        "completion_tokens": completion_tokens / len(samples)
+    }
+
+def benchmark_structured_outputs(n_samples: int = 20) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Results per component and schema variant ('lean' / 'verbose')."""
+    dataset_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "router", "datasets", "router_dataset.json")
+    with open(dataset_path, encoding="utf-8") as f:
+        samples = json.load(f)[:n_samples]
+
+    lean_router = Router(with_reasoning=False)
+    lean_router.pre_router = None  # Only the LLM call is measured
+    verbose_router = Router(rag=lean_router.rag, with_reasoning=True)
+    verbose_router.pre_router = None
+
+    variants = {
+        "router": {
+            "lean": lean_router.get_decision_path,
+            "verbose": verbose_router.get_decision_path
+        },
+        "query_analyzer": {
+            "lean": RAGQueryAnalyzer(with_reasoning=False).analyze,
+            "verbose": RAGQueryAnalyzer(with_reasoning=True).analyze
+        },
+        "fused_router_analyzer": {
+            "lean": FusedRouterAnalyzer(with_reasoning=False).route_and_analyze,
+            "verbose": FusedRouterAnalyzer(with_reasoning=True).route_and_analyze
+        }
+    }
+
+    return {
+        component: {name: benchmark_component(call, component, samples) for name, call in calls.items()}
+        for component, calls in variants.items()
+    }
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    n_samples = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    results = benchmark_structured_outputs(n_samples)
+    print(f"Structured output schemas, {n_samples} samples per component and variant")
+    print(f"{'component':>22} {'variant':>8} {'mean latency':>13} {'p50 latency':>12} {'completion tokens':>18}")
+    for component, variants in results.items():
+        for name, result in variants.items():
+            print(f"{component:>22} {name:>8} {result['mean_latency']:>12.2f}s {result['median_latency']:>11.2f}s {result['completion_tokens']:>18.1f}")
+        lean, verbose = variants["lean"], variants["verbose"]
+        print(f"{component:>22} {'saved':>8} {verbose['mean_latency'] - lean['mean_latency']:>12.2f}s "
+              f"{verbose['median_latency'] - lean['median_latency']:>11.2f}s {verbose['completion_tokens'] - lean['completion_tokens']:>18.1f}")
@@ -2,15 +2,16 @@ from .metrics.resolves_references import evaluate_resolves_references
 from .metrics.expands_acronyms import evaluate_expands_acronyms
 from .metrics.includes_context import evaluate_includes_context
 from agent.llms.rag_query_analyzer import RAGQueryAnalyzer
+from agent.llms.fused_router_analyzer import FusedRouterAnalyzer
 import json
 import os
 from dotenv import load_dotenv
 from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Tuple
-from eval.helpers.eval_helper import create_chat_history, format_chat_history_from_dict
+from eval.helpers.eval_helper import create_chat_history, format_chat_history_from_dict, llm_tokens_used
 
 def evaluate_references_samples(
-    analyzer: RAGQueryAnalyzer,
+    analyzer: RAGQueryAnalyzer | FusedRouterAnalyzer,
     samples: List[Dict[str, Any]],
     verbose: bool = False
 ) -> Tuple[List[float], List[Dict[str, Any]]]:
@@ -66,7 +67,7 @@ def evaluate_references_samples(
     return scores, details
 
 def evaluate_acronyms_samples(
-    analyzer: RAGQueryAnalyzer,
+    analyzer: RAGQueryAnalyzer | FusedRouterAnalyzer,
     samples: List[Dict[str, Any]],
     verbose: bool = False
 ) -> Tuple[List[float], List[Dict[str, Any]]]:
@@ -118,7 +119,7 @@ def evaluate_acronyms_samples(
     return scores, details
 
 def evaluate_context_samples(
-    analyzer: RAGQueryAnalyzer,
+    analyzer: RAGQueryAnalyzer | FusedRouterAnalyzer,
     samples: List[Dict[str, Any]],
     verbose: bool = False
 ) -> Tuple[List[float], List[Dict[str, Any]]]:
@@ -178,12 +179,14 @@ def evaluate_context_samples(
             
     return scores, details
 
-def evaluate_query_analyzer(verbose: bool = False) -> Tuple[Dict[str, float], List[Dict[str, Any]]]:
+def evaluate_query_analyzer(verbose: bool = False, fused: bool = False, with_reasoning: bool = True) -> Tuple[Dict[str, float], List[Dict[str, Any]]]:
     """
     Run all evaluations for the RAG Query Analyzer component.
     
     Args:
         verbose: Whether to print detailed evaluation information
+        fused: Whether to score the query analysis returned by the fused routing + query analysis call
+        with_reasoning: Whether to ask for the reasoning steps (verbose schema) or use the lean production schema
         
     Returns:
         Tuple[Dict[str, float], List[Dict[str, Any]]]: Dictionary mapping metric names to their scores,
@@ -191,7 +194,7 @@ def evaluate_query_analyzer(verbose: bool = False) -> Tuple[Dict[str, float], Li
     """
     load_dotenv()
     
-    analyzer = RAGQueryAnalyzer()
+    analyzer = FusedRouterAnalyzer(with_reasoning) if fused else RAGQueryAnalyzer(with_reasoning)
     
     # Load test dataset
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -202,6 +205,7 @@ def evaluate_query_analyzer(verbose: bool = False) -> Tuple[Dict[str, float], Li
     
     scores = {}
     all_details = []
+    tokens_before = llm_tokens_used()
     
     # Process each test set in parallel
     with ThreadPoolExecutor() as executor:
@@ -276,6 +280,8 @@ def evaluate_query_analyzer(verbose: bool = False) -> Tuple[Dict[str, float], Li
     
     overall_score = sum(all_scores) / len(all_scores)
     scores["Overall"] = overall_score
+    # Tokens spent by the analyzer itself (the judges are not counted), to compare against the fused call
+    scores["Tokens per Sample"] = (llm_tokens_used() - tokens_before) / len(all_scores)
     
     if verbose:
         print(f"\nOverall Score: {overall_score:.2f} ({len(all_scores)} total samples)")
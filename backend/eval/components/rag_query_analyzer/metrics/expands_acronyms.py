@@ -1,7 +1,7 @@
 # expands_acronyms: evaluates if acronyms in the query are expanded in at least one generated query
 
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
+from agent.llm_gateway import chat_model
 from dotenv import load_dotenv
 from typing import List, Tuple
 from ..prompts.expands_acronyms_prompt import PROMPT
@@ -35,7 +35,7 @@ def evaluate_expands_acronyms(
     )
     
     # Get structured output from LLM
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.0, max_tokens=5000)
+    llm = chat_model(model="gpt-4o", temperature=0.0, max_tokens=5000, track_usage=False)
     llm_structured = llm.with_structured_output(ExpandsAcronyms)
     result = llm_structured.invoke(prompt)
     
@@ -1,7 +1,7 @@
 # includes_context: evaluates if the query analyzer considers conversation context
 
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
+from agent.llm_gateway import chat_model
 from dotenv import load_dotenv
 from typing import List, Tuple
 from ..prompts.includes_context_prompt import PROMPT
@@ -48,7 +48,7 @@ def evaluate_includes_context(
     )
     
     # Get structured output from LLM
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.0, max_tokens=5000)
+    llm = chat_model(model="gpt-4o", temperature=0.0, max_tokens=5000, track_usage=False)
     llm_structured = llm.with_structured_output(IncludesContext)
     result = llm_structured.invoke(prompt)
     
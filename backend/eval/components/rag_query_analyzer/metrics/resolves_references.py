@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
+from agent.llm_gateway import chat_model
 from dotenv import load_dotenv
 from typing import List, Tuple
 from langchain_core.messages import AIMessage, HumanMessage
@@ -39,7 +39,7 @@ def evaluate_resolves_references(
         chat_history=format_chat_history_from_messages(chat_history)
     )
     
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.0, max_tokens=5000)
+    llm = chat_model(model="gpt-4o", temperature=0.0, max_tokens=5000, track_usage=False)
     llm_structured = llm.with_structured_output(ResolvesReferences)
     
     result = llm_structured.invoke(prompt)
@@ -4,6 +4,7 @@ from .metrics.faithfulness import evaluate_faithfulness
 from .metrics.acknowledge_contradiction import evaluate_acknowledge_contradiction
 from .metrics.citations_real_and_used import evaluate_citations_real_and_used
 from agent.llms.rag_response_generator import RAGResponseGenerator
+from agent.llms.grounded_conversational_generator import GroundedConversationalGenerator
 from agent.rag import SearchResult
 import json
 import os
@@ -13,7 +14,7 @@ from typing import List, Dict, Any, Tuple
 from langchain.schema import Document
 
 def evaluate_faithfulness_samples(
-    generator: RAGResponseGenerator,
+    generator: RAGResponseGenerator | GroundedConversationalGenerator,
     samples: List[Dict[str, Any]],
     verbose: bool = False
 ) -> Tuple[List[float], List[Dict[str, Any]]]:
@@ -65,7 +66,7 @@ def evaluate_faithfulness_samples(
     return scores, details
 
 def evaluate_correctness_samples(
-    generator: RAGResponseGenerator,
+    generator: RAGResponseGenerator | GroundedConversationalGenerator,
     samples: List[Dict[str, Any]],
     verbose: bool = False
 ) -> Tuple[List[float], List[Dict[str, Any]]]:
@@ -119,7 +120,7 @@ def evaluate_correctness_samples(
     return scores, details
 
 def evaluate_relevancy_samples(
-    generator: RAGResponseGenerator,
+    generator: RAGResponseGenerator | GroundedConversationalGenerator,
     samples: List[Dict[str, Any]],
     verbose: bool = False
 ) -> Tuple[List[float], List[Dict[str, Any]]]:
@@ -170,7 +171,7 @@ def evaluate_relevancy_samples(
     return scores, details
 
 def evaluate_contradictions_samples(
-    generator: RAGResponseGenerator,
+    generator: RAGResponseGenerator | GroundedConversationalGenerator,
     samples: List[Dict[str, Any]],
     verbose: bool = False
 ) -> Tuple[List[float], List[Dict[str, Any]]]:
@@ -226,7 +227,7 @@ def evaluate_contradictions_samples(
     return scores, details
 
 def evaluate_citations_samples(
-    generator: RAGResponseGenerator,
+    generator: RAGResponseGenerator | GroundedConversationalGenerator,
     samples: List[Dict[str, Any]],
     verbose: bool = False
 ) -> Tuple[List[float], List[Dict[str, Any]]]:
@@ -302,12 +303,13 @@ def evaluate_citations_samples(
             
     return scores, details
 
-def evaluate_response_generator(verbose: bool = False) -> Tuple[Dict[str, float], List[Dict[str, Any]]]:
+def evaluate_response_generator(verbose: bool = False, single_pass: bool = False) -> Tuple[Dict[str, float], List[Dict[str, Any]]]:
     """
     Run all evaluations for the RAG Response Generator component.
     
     Args:
         verbose: Whether to print detailed evaluation information
+        single_pass: Whether to score the single-pass grounded conversational generator (RETRIEVE_GENERATION_MODE=single-pass)
         
     Returns:
         Tuple[Dict[str, float], List[Dict[str, Any]]]: Dictionary mapping metric names to their scores,
@@ -315,7 +317,7 @@ def evaluate_response_generator(verbose: bool = False) -> Tuple[Dict[str, float]
     """
     load_dotenv()
     
-    generator = RAGResponseGenerator()
+    generator = GroundedConversationalGenerator() if single_pass else RAGResponseGenerator()
     
     # Load test dataset
     current_dir = os.path.dirname(os.path.abspath(__file__))
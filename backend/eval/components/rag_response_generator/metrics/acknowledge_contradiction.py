@@ -1,7 +1,7 @@
 # acknowledge_contradiction: evaluates if the generated answer acknowledges contradictions in the context
 
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
+from agent.llm_gateway import chat_model
 from dotenv import load_dotenv
 from typing import List, Tuple
 from ..prompts.acknowledge_contradiction_prompt import PROMPT
@@ -41,7 +41,7 @@ def evaluate_acknowledge_contradiction(
     )
     
     # Get structured output from LLM
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.0, max_tokens=5000)
+    llm = chat_model(model="gpt-4o", temperature=0.0, max_tokens=5000, track_usage=False)
     llm_structured = llm.with_structured_output(AcknowledgeContradiction)
     result = llm_structured.invoke(prompt)
     
@@ -1,7 +1,7 @@
 # answer relevancy: evaluates if the generated answer addresses the question asked
 
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
+from agent.llm_gateway import chat_model
 from dotenv import load_dotenv
 from typing import List, Tuple
 from ..prompts.answer_relevancy_prompt import PROMPT
@@ -35,7 +35,7 @@ def evaluate_answer_relevancy(
     )
     
     # Get structured output from LLM
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.0, max_tokens=5000)
+    llm = chat_model(model="gpt-4o", temperature=0.0, max_tokens=5000, track_usage=False)
     llm_structured = llm.with_structured_output(AnswerRelevancy)
     result = llm_structured.invoke(prompt)
     
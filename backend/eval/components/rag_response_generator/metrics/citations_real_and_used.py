@@ -1,7 +1,7 @@
 # citations_real_and_used: evaluates if citations in the answer are real and properly used
 
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
+from agent.llm_gateway import chat_model
 from dotenv import load_dotenv
 from typing import List, Tuple
 from ..prompts.citations_real_and_used_prompt import PROMPT
@@ -43,7 +43,7 @@ def evaluate_citations_real_and_used(
     )
     
     # Get structured output from LLM
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.0, max_tokens=5000)
+    llm = chat_model(model="gpt-4o", temperature=0.0, max_tokens=5000, track_usage=False)
     llm_structured = llm.with_structured_output(ContextPiecesUsedValid)
     result = llm_structured.invoke(prompt)
     
@@ -0,0 +1,65 @@
+"""
+Search latency of the in-process NumPy index (agent/numpy_vector_store.py) for corpus sizes around ours.
+
+Builds synthetic indexes of random normalized vectors with the dimension of text-embedding-3-small and times
+search_with_vectors (top fetch_k with documents and vectors, what RAG.search_by_vectors asks for) with one query
+and with a batch of four, as the query analyzer produces. No API calls. With --milvus the same batched search is
+also timed against the Milvus collection, to compare with the network hop it replaces.
+Run from the backend directory: python -m eval.components.rag_retriever.benchmark_vector_store [--milvus]
+"""
+
+from agent.numpy_vector_store import NumpyVectorStore
+from dotenv import load_dotenv
+from typing import Callable, Dict, List
+import numpy as np
+import sys
+import tempfile
+import time
+
+DIMENSION = 1536
+FETCH_K = 20
+
+def percentile(values: List[float], p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+def time_calls(call: Callable, repeats: int = 200) -> Dict[str, float]:
+    call()
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        call()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {"p50_ms": percentile(latencies, 50), "p95_ms": percentile(latencies, 95)}
+
+def synthetic_store(path: str, chunks: int, dtype: str) -> NumpyVectorStore:
+    store = NumpyVectorStore(None, path=path, dtype=dtype)
+    rng = np.random.default_rng(0)
+    store.add_embeddings(
+        [f"chunk {i}" for i in range(chunks)],
+        rng.standard_normal((chunks, DIMENSION), dtype=np.float32),
+        [{"source": f"doc_{i % 40}.pdf", "title": f"Documento {i % 40}"} for i in range(chunks)]
+    )
+    # Recargar para medir sobre los archivos mapeados en memoria, como en el servidor
+    return NumpyVectorStore(None, path=path)
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    queries = np.random.default_rng(1).standard_normal((4, DIMENSION), dtype=np.float32).tolist()
+    print(f"{'chunks':>7} {'dtype':>8} {'queries':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    for chunks in [1000, 3000, 10000]:
+        for dtype in ["float32", "float16"]:
+            with tempfile.TemporaryDirectory() as tmp:
+                store = synthetic_store(tmp, chunks, dtype)
+                for batch in [queries[:1], queries]:
+                    result = time_calls(lambda: store.search_with_vectors(batch, FETCH_K))
+                    print(f"{chunks:>7} {dtype:>8} {len(batch):>8} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f}")
+
+    if "--milvus" in sys.argv:
+        from agent.rag import RAG
+        rag = RAG.__new__(RAG)
+        rag.vector_store = RAG._connect_milvus(None, "knowledge_base_collection")
+        for batch in [queries[:1], queries]:
+            result = time_calls(lambda: rag._milvus_search_with_vectors(batch, FETCH_K), repeats=50)
+            print(f"Milvus, {len(batch)} queries: p50 {result['p50_ms']:.2f} ms, p95 {result['p95_ms']:.2f} ms")
@@ -0,0 +1,71 @@
+"""
+Offline calibration of RELEVANCE_THRESHOLD, the similarity below which retrieval is treated as "nothing relevant"
+and the no-information reply is returned without generation.
+
+Questions that should be answered from the knowledge base (the retriever dataset plus the router samples expected
+on the 'retrieve' path) are positives; the router samples expected to be denied (off-topic) are negatives. For
+each question the cosine similarity of the best retrieved document is computed against the real collection, and
+the recommended threshold is the highest one that still keeps MIN_POSITIVE_RECALL of the positives.
+Only embeddings and vector searches are run (no LLM calls).
+Run from the backend directory: python -m eval.components.rag_retriever.calibrate_relevance_threshold
+"""
+
+from agent.rag import RAG
+from dotenv import load_dotenv
+from typing import Dict, List, Tuple
+import json
+import os
+
+MIN_POSITIVE_RECALL = 0.98
+
+def load_calibration_queries() -> Tuple[List[str], List[str]]:
+    """Positive (answerable from the knowledge base) and negative (off-topic) questions."""
+    components_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with open(os.path.join(components_dir, "rag_retriever", "datasets", "real_retrieval_dataset.json"), encoding="utf-8") as f:
+        positives = [sample["query"] for sample in json.load(f)["test_queries"]]
+    with open(os.path.join(components_dir, "router", "datasets", "router_dataset.json"), encoding="utf-8") as f:
+        router_samples = json.load(f)
+    positives += [sample["query"] for sample in router_samples if "retrieve" in sample["expected_paths"]]
+    negatives = [sample["query"] for sample in router_samples if sample["expected_paths"] == ["deny"]]
+    return positives, negatives
+
+def best_relevances(rag: RAG, queries: List[str]) -> List[float]:
+    """Cosine similarity of the best document retrieved for each query."""
+    vectors = rag.embeddings.embed_documents(queries)
+    return [
+        max((doc.metadata["relevance"] for doc in documents), default=0.0)
+        for documents in rag.search_by_vectors(vectors)
+    ]
+
+def calibrate_threshold(positives: List[float], negatives: List[float], min_positive_recall: float = MIN_POSITIVE_RECALL) -> Dict[str, float]:
+    """Highest threshold keeping 'min_positive_recall' of the positives, with the share of negatives it rejects."""
+    candidates = sorted(set(positives), reverse=True)
+    threshold = 0.0
+    for candidate in candidates:
+        if sum(relevance >= candidate for relevance in positives) / len(positives) >= min_positive_recall:
+            threshold = candidate
+            break
+    return {
+        "threshold": threshold,
+        "positive_recall": sum(relevance >= threshold for relevance in positives) / len(positives),
+        "negatives_rejected": sum(relevance < threshold for relevance in negatives) / len(negatives) if negatives else 0.0
+    }
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    rag = RAG()
+    positive_queries, negative_queries = load_calibration_queries()
+    positives = best_relevances(rag, positive_queries)
+    negatives = best_relevances(rag, negative_queries)
+
+    print(f"Best document similarity ({len(positives)} positive / {len(negatives)} negative questions)")
+    print(f"{'threshold':>10} {'positives kept':>15} {'negatives rejected':>19}")
+    for threshold in [0.2, 0.25, 0.3, 0.35, 0.4, 0.45, 0.5]:
+        kept = sum(relevance >= threshold for relevance in positives) / len(positives)
+        rejected = sum(relevance < threshold for relevance in negatives) / len(negatives)
+        print(f"{threshold:>10.2f} {kept:>15.2f} {rejected:>19.2f}")
+
+    result = calibrate_threshold(positives, negatives)
+    print(f"\nRecommended RELEVANCE_THRESHOLD={result['threshold']:.3f} "
+          f"(keeps {result['positive_recall']:.0%} of the positives, rejects {result['negatives_rejected']:.0%} of the negatives)")
@@ -5,6 +5,7 @@ from .metrics.context_relevancy import evaluate_context_relevancy
 from .metrics.context_recall import evaluate_context_recall
 import json
 import os
+import sys
 from dotenv import load_dotenv
 from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Tuple
@@ -109,13 +110,27 @@ def evaluate_retrieval_samples(
             
     return scores, details
 
-def evaluate_rag_retriever(verbose: bool = False, test_mode: bool = False) -> Tuple[Dict[str, float], List[Dict[str, Any]]]:
+def measure_retrieval_latency(rag: RAG, samples: List[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    Mean per-query latency in milliseconds of each retrieval leg (embedding, dense and, with hybrid retrieval,
+    lexical). The queries run one at a time, after the evaluation, so the scoring threads do not skew it.
+    """
+    totals = {}
+    for sample in samples:
+        timings = {}
+        rag.retrieve(sample["query"], timings=timings)
+        for leg, seconds in timings.items():
+            totals[leg] = totals.get(leg, 0.0) + seconds
+    return {leg: 1000 * seconds / len(samples) for leg, seconds in totals.items()}
+
+def evaluate_rag_retriever(verbose: bool = False, test_mode: bool = False, hybrid: bool = None) -> Tuple[Dict[str, float], List[Dict[str, Any]]]:
     """
     Run evaluations for the RAG Retriever component.
     
     Args:
         verbose: Whether to print detailed evaluation information
         test_mode: Whether to use test documents (True) or real collection (False)
+        hybrid: Fuse BM25 with the dense results (True) or use dense retrieval only (False); None keeps HYBRID_RETRIEVAL
         
     Returns:
         Tuple[Dict[str, float], List[Dict[str, Any]]]: Dictionary mapping metric names to their scores,
@@ -125,6 +140,10 @@ def evaluate_rag_retriever(verbose: bool = False, test_mode: bool = False) -> Tu
     
     # Initialize RAG with appropriate collection
     rag = RAG(collection_name="test_collection", k=1) if test_mode else RAG()
+    if hybrid is not None:
+        rag.hybrid = hybrid
+    if rag.hybrid and not len(rag.lexical_index):
+        print("El índice BM25 está vacío (python -m data.load_data lo construye): se evalúa solo la búsqueda densa")
     
     # Load appropriate dataset
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -165,6 +184,8 @@ def evaluate_rag_retriever(verbose: bool = False, test_mode: bool = False) -> Tu
         "Weighted Context Recall": avg_weighted_recall,
         "Overall": avg_score
     }
+    for leg, milliseconds in measure_retrieval_latency(rag, dataset["test_queries"]).items():
+        scores_dict[f"Latency {leg.capitalize()} Leg (ms)"] = milliseconds
     
     if verbose:
         print("\nFinal Scores:")
@@ -173,8 +194,14 @@ def evaluate_rag_retriever(verbose: bool = False, test_mode: bool = False) -> Tu
         print(f"Context Recall: {avg_recall:.2f}")
         print(f"Weighted Context Recall: {avg_weighted_recall:.2f}")
         print(f"Overall Score: {avg_score:.2f}")
+        for name, value in scores_dict.items():
+            if name.startswith("Latency"):
+                print(f"{name}: {value:.2f}")
     
     return scores_dict, details
 
 if __name__ == "__main__":
-    evaluate_rag_retriever(verbose=True, test_mode=False) 
+    # --hybrid / --dense-only to compare both retrieval modes; without a flag HYBRID_RETRIEVAL decides
+    hybrid = True if "--hybrid" in sys.argv else False if "--dense-only" in sys.argv else None
+    evaluate_rag_retriever(verbose=True, test_mode=False, hybrid=hybrid)
+
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
+from agent.llm_gateway import chat_model
 from dotenv import load_dotenv
 from typing import List, Tuple, Dict, Any, Literal
 from concurrent.futures import ThreadPoolExecutor, as_completed
@@ -47,7 +47,7 @@ def extract_statements(
     )
     
     # Get structured output from LLM
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.0, max_tokens=5000)
+    llm = chat_model(model="gpt-4o", temperature=0.0, max_tokens=5000, track_usage=False)
     llm_structured = llm.with_structured_output(StatementExtraction)
     result = llm_structured.invoke(prompt)
     
@@ -90,7 +90,7 @@ def evaluate_context_coverage(
     )
     
     # Get structured output from LLM
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.0, max_tokens=5000)
+    llm = chat_model(model="gpt-4o", temperature=0.0, max_tokens=5000, track_usage=False)
     llm_structured = llm.with_structured_output(ContextCoverage)
     result = llm_structured.invoke(prompt)
     
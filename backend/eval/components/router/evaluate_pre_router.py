@@ -0,0 +1,50 @@
+"""
+Offline evaluation of the kNN pre-router on the router dataset.
+
+Every sample is classified leaving itself out of the seed examples; samples with chat history are
+deferred to the LLM router, as in production. Only embeddings are computed (no
+LLM calls), so thresholds can be tuned cheaply before running the full evaluate_router with the pre-router.
+Run from the backend directory: python -m eval.components.router.evaluate_pre_router
+"""
+
+from agent.pre_router import PreRouter, load_examples, DEFAULT_DATASET_PATH
+from agent.llm_gateway import embeddings_model
+from dotenv import load_dotenv
+from typing import Dict, List
+
+def evaluate_pre_router(pre_router: PreRouter, thresholds: List[float]) -> List[Dict[str, float]]:
+    """
+    Leave-one-out evaluation of the pre-router for several confidence thresholds.
+
+    Returns, per threshold, the fraction of samples decided locally (LLM routing calls avoided) and
+    the accuracy of those local decisions against the expected paths.
+    """
+    query_vectors = pre_router.embeddings.embed_documents([example["query"] for example in pre_router.examples])
+    base_confidence = pre_router.min_confidence
+    results = []
+
+    for threshold in thresholds:
+        pre_router.min_confidence = threshold
+        local, correct = 0, 0
+        for index, (example, vector) in enumerate(zip(pre_router.examples, query_vectors)):
+            decision = None if example.get("chat_history") else pre_router.decide(vector, exclude=index)
+            if decision is not None:
+                local += 1
+                correct += decision[0] in example["expected_paths"]
+        results.append({
+            "min_confidence": threshold,
+            "llm_calls_avoided": local / len(pre_router.examples),
+            "local_accuracy": correct / local if local else 1.0
+        })
+
+    pre_router.min_confidence = base_confidence
+    return results
+
+if __name__ == "__main__":
+    load_dotenv()
+
+    pre_router = PreRouter(embeddings_model(), load_examples(DEFAULT_DATASET_PATH))
+    print(f"Pre-router leave-one-out evaluation ({len(pre_router.examples)} samples, k={pre_router.k}, min_similarity={pre_router.min_similarity})")
+    print(f"{'min_confidence':>15} {'LLM calls avoided':>18} {'local accuracy':>15}")
+    for result in evaluate_pre_router(pre_router, [0.6, 0.7, 0.8, 0.9, 1.0]):
+        print(f"{result['min_confidence']:>15.2f} {result['llm_calls_avoided']:>18.2f} {result['local_accuracy']:>15.2f}")
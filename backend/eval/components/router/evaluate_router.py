@@ -1,11 +1,15 @@
 from .metrics.routing_accuracy import evaluate_routing_accuracy
 from agent.router import Router
+from agent.pre_router import PreRouter, load_examples
+from agent.llms.fused_router_analyzer import FusedRouterAnalyzer
+from agent.llm_gateway import embeddings_model
 import json
 import os
 from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Tuple
-from eval.helpers.eval_helper import create_chat_history, format_chat_history_from_dict
+from eval.helpers.eval_helper import create_chat_history, format_chat_history_from_dict, llm_tokens_used
 from collections import defaultdict
+import time
 
 def calculate_weighted_routing_accuracy(dataset, details):
     # Count the number of samples of each path in the dataset
@@ -40,15 +44,18 @@ def calculate_weighted_routing_accuracy(dataset, details):
     return weighted_accuracy
 
 def evaluate_routing_accuracy_samples(
-    router: Router,
+    router: Router | FusedRouterAnalyzer,
     samples: List[Dict[str, Any]],
-    verbose: bool = False
+    verbose: bool = False,
+    pre_router: PreRouter = None
 ) -> Tuple[List[float], List[Dict[str, Any]]]:
     """
     Evaluate whether the router correctly classifies multiple samples.
+    If a pre-router seeded from the same samples is given, each sample is first classified by it
+    leaving that sample out, and only the samples it defers (always those with chat history) are sent to the LLM router.
     """
     
-    def evaluate_single_sample(sample: Dict[str, Any]) -> Tuple[float, Dict[str, Any]]:
+    def evaluate_single_sample(index: int, sample: Dict[str, Any]) -> Tuple[float, Dict[str, Any]]:
         """
         Evaluate whether the router correctly classifies a single sample.
         """
@@ -57,7 +64,15 @@ def evaluate_routing_accuracy_samples(
         chat_history = create_chat_history(sample["chat_history"])
 
         # Obtain router decision path
-        decision_path, reasoning_steps = router.get_decision_path(sample["query"], chat_history)
+        start = time.perf_counter()
+        local_decision = None
+        if pre_router is not None and not chat_history:
+            local_decision = pre_router.decide(pre_router.embeddings.embed_query(sample["query"]), exclude=index)
+        if local_decision is not None:
+            decision_path, reasoning_steps = local_decision
+        else:
+            decision_path, reasoning_steps = router.get_decision_path(sample["query"], chat_history)
+        latency = time.perf_counter() - start
         
         # Evaluate whether the router correctly classifies the query into the correct decision path
         score = evaluate_routing_accuracy(
@@ -77,6 +92,8 @@ def evaluate_routing_accuracy_samples(
             "decision_path": decision_path,
             "expected_paths": sample["expected_paths"],
             "reasoning_steps": reasoning_steps,
+            "routed_by": "pre-router" if local_decision is not None else "llm",
+            "latency_seconds": latency,
             "score": score
         }
             
@@ -87,7 +104,7 @@ def evaluate_routing_accuracy_samples(
 
     # Process samples in parallel
     with ThreadPoolExecutor(max_workers=len(samples)) as executor:
-        futures = [executor.submit(evaluate_single_sample, sample) for sample in samples]
+        futures = [executor.submit(evaluate_single_sample, index, sample) for index, sample in enumerate(samples)]
 
     for future in futures:
         score, test_details = future.result()
@@ -96,18 +113,26 @@ def evaluate_routing_accuracy_samples(
             
     return scores, details
 
-def evaluate_router(verbose: bool = False) -> Tuple[Dict[str, float], List[Dict[str, Any]]]:
+def evaluate_router(verbose: bool = False, use_pre_router: bool = False, fused: bool = False, with_reasoning: bool = True) -> Tuple[Dict[str, float], List[Dict[str, Any]]]:
     """
     Run all evaluations for the Router.
     
     Args:
         verbose: Whether to print detailed evaluation information
+        use_pre_router: Whether to put the kNN pre-router (seeded from this dataset, leave-one-out) in front of the LLM router
+        fused: Whether to score the fused routing + query analysis call instead of the router alone
+        with_reasoning: Whether to ask for the reasoning steps (verbose schema) or use the lean production schema
         
     Returns:
         Tuple[Dict[str, float], List[Dict[str, Any]]]: Dictionary mapping metric name to their score, and list of detailed test results for each sample.
     """
     
-    router = Router()
+    if fused:
+        router = FusedRouterAnalyzer(with_reasoning=with_reasoning)
+    else:
+        router = Router(with_reasoning=with_reasoning)
+        # The pre-router configured for production would see every sample among its own seeds
+        router.pre_router = None
     
     # Load test dataset
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -117,9 +142,14 @@ def evaluate_router(verbose: bool = False) -> Tuple[Dict[str, float], List[Dict[
         dataset = json.load(f)
     
     scores = {}
+
+    pre_router = PreRouter(embeddings_model(), load_examples(dataset_path)) if use_pre_router else None
     
     # Evaluate the router's classification performance on all test samples
-    ra_scores, ra_details = evaluate_routing_accuracy_samples(router, dataset, verbose)
+    tokens_before = llm_tokens_used()
+    ra_scores, ra_details = evaluate_routing_accuracy_samples(router, dataset, verbose, pre_router)
+    tokens_per_sample = (llm_tokens_used() - tokens_before) / len(ra_details)
+    mean_latency = sum(detail["latency_seconds"] for detail in ra_details) / len(ra_details)
     
     # Calculate weighted routing accuracy
     routing_accuracy = calculate_weighted_routing_accuracy(dataset, ra_details)
@@ -127,6 +157,17 @@ def evaluate_router(verbose: bool = False) -> Tuple[Dict[str, float], List[Dict[
         print(f"Routing Accuracy: {routing_accuracy:.2f} ({len(ra_scores)} samples)")    
 
     scores["Routing Accuracy"] = routing_accuracy
+    # Cost of the routing calls, to compare the separate, fused and pre-routed setups
+    scores["Mean Latency (seconds)"] = mean_latency
+    scores["Tokens per Sample"] = tokens_per_sample
+    if verbose:
+        print(f"Mean Latency: {mean_latency:.2f}s, Tokens per Sample: {tokens_per_sample:.0f}")
+
+    if pre_router is not None:
+        llm_calls_avoided = sum(1 for detail in ra_details if detail["routed_by"] == "pre-router") / len(ra_details)
+        if verbose:
+            print(f"LLM Routing Calls Avoided: {llm_calls_avoided:.2f}")
+        scores["LLM Routing Calls Avoided"] = llm_calls_avoided
 
     return scores, ra_details
 
@@ -54,7 +54,7 @@ if __name__ == "__main__":
 
     chat_history = create_chat_history(sample["chat_history"])
 
-    router = Router()
+    router = Router(with_reasoning=True)
     decision_path, reasoning_steps = router.get_decision_path(sample["query"], chat_history)
 
     print(evaluate_routing_accuracy(sample["query"], chat_history, decision_path, sample["expected_paths"],reasoning_steps, verbose=True)) 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from langchain_openai import ChatOpenAI
+from agent.llm_gateway import chat_model
 from langchain.prompts import ChatPromptTemplate
 from langchain.output_parsers import JsonOutputParser
 from langchain.pydantic_v1 import BaseModel, Field
@@ -34,9 +34,10 @@ class EvaluationResult(BaseModel):
 
 class O1Judge:
     def __init__(self):
-        self.llm = ChatOpenAI(
+        self.llm = chat_model(
             model="o1",  # o1-mini cuando esté disponible
-            temperature=0
+            temperature=0,
+            track_usage=False
         )
         self.prompt = ChatPromptTemplate.from_template(EVALUATION_TEMPLATE)
         self.parser = JsonOutputParser(pydantic_object=EvaluationResult)
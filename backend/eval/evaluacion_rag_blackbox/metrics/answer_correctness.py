@@ -1,6 +1,6 @@
 # answer correctness: evaluates if the generated answer is correct against the ground truth
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
+from agent.llm_gateway import chat_model
 from dotenv import load_dotenv
 from typing import List
 from prompts.answer_correctness_prompt import PROMPT
@@ -25,7 +25,7 @@ def evaluate_answer_correctness(question: str, answer: str, ground_truth: str, v
         float: 1.0 if correct, 0.0 if not
     """
     prompt = PROMPT.format(question=question, answer=answer, ground_truth=ground_truth)
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.0, max_tokens=5000)
+    llm = chat_model(model="gpt-4o", temperature=0.0, max_tokens=5000, track_usage=False)
     llm_structured = llm.with_structured_output(AnswerCorrectness)
     
     result = llm_structured.invoke(prompt)
@@ -1,7 +1,7 @@
 # answer relevancy: evaluates if the generated answer addresses the question asked
 
 from pydantic.v1 import BaseModel, Field
-from langchain_openai import ChatOpenAI
+from agent.llm_gateway import chat_model
 from dotenv import load_dotenv
 from typing import List
 from prompts.answer_relevancy_prompt import PROMPT
@@ -25,7 +25,7 @@ def evaluate_answer_relevancy(question: str, answer: str, verbose: bool = False)
         float: 1.0 if relevant, 0.0 if not
     """
     prompt = PROMPT.format(question=question, answer=answer)
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.0, max_tokens=5000)
+    llm = chat_model(model="gpt-4o", temperature=0.0, max_tokens=5000, track_usage=False)
     llm_structured = llm.with_structured_output(AnswerRelevancy)
     
     result = llm_structured.invoke(prompt)
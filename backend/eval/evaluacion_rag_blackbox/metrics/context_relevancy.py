@@ -1,7 +1,7 @@
 # context relevancy: evaluates if the context is relevant for answering the user's question
 
 from pydantic import BaseModel, Field
-from langchain_openai import ChatOpenAI
+from agent.llm_gateway import chat_model
 from dotenv import load_dotenv
 from langchain_core.documents import Document
 from typing import List, Tuple
@@ -19,7 +19,7 @@ def evaluate_single_context(question: str, excerpt: str) -> Tuple[str, bool, Lis
     Evalúa un único contexto y retorna una tupla con el contexto, si es relevante y los pasos de razonamiento
     """
     prompt = PROMPT.format(question=question, excerpt=excerpt)
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.0, max_tokens=5000)
+    llm = chat_model(model="gpt-4o", temperature=0.0, max_tokens=5000, track_usage=False)
     llm_structured = llm.with_structured_output(ContextRelevancy)
     result = llm_structured.invoke(prompt)
     return excerpt, result.is_relevant, result.reasoning_steps
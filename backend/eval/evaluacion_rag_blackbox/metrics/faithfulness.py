@@ -2,7 +2,7 @@
 
 from pydantic import BaseModel, Field
 from typing import List
-from langchain_openai import ChatOpenAI
+from agent.llm_gateway import chat_model
 from dotenv import load_dotenv
 from prompts.faithfulness_prompt import PROMPT
 
@@ -26,7 +26,7 @@ def evaluate_faithfulness(question: str, facts: List[str], answer: str, verbose:
         float: 1.0 if faithful, 0.0 if not
     """
     prompt = PROMPT.format(question=question, facts=facts, answer=answer)
-    llm = ChatOpenAI(model="gpt-4o", temperature=0.0, max_tokens=5000)
+    llm = chat_model(model="gpt-4o", temperature=0.0, max_tokens=5000, track_usage=False)
     llm_structured = llm.with_structured_output(Faithfulness)
     
     result = llm_structured.invoke(prompt)
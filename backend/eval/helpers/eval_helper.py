@@ -1,5 +1,6 @@
 from langchain.schema import AIMessage, HumanMessage
 from typing import List, Dict
+from prometheus_client import REGISTRY
 
 def create_chat_history(chat_history: List[Dict[str, str]]) -> List[AIMessage | HumanMessage]:
     """Convert chat history data to message objects."""
@@ -42,4 +43,21 @@ def format_chat_history_from_dict(chat_history: List[Dict[str, str]]) -> str:
         role = "User" if message["role"] == "human" else "Assistant"
         formatted_history.append(f"  {role}: {message['content']}")
     
-    return "\n".join(formatted_history)
\ No newline at end of file
+    return "\n".join(formatted_history)
+
+def llm_tokens_used(kind: str = None, profile: str = None) -> float:
+    """
+    Total tokens counted so far by the agent's LLM clients (the judge models are not counted), optionally only
+    one kind ('prompt' or 'completion') and/or one profile (component).
+    Take the difference before and after an evaluation to get the tokens spent by the component under test.
+    """
+    total = 0.0
+    for metric in REGISTRY.collect():
+        if metric.name == "llm_tokens":
+            total += sum(
+                sample.value for sample in metric.samples
+                if sample.name == "llm_tokens_total"
+                and (kind is None or sample.labels.get("kind") == kind)
+                and (profile is None or sample.labels.get("profile") == profile)
+            )
+    return total
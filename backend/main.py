@@ -1,17 +1,30 @@
 from fastapi import FastAPI, HTTPException, Depends, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.security import HTTPBearer
 from pydantic import BaseModel
 import uvicorn
-from firebase_admin import auth, credentials, initialize_app, get_app
 from fastapi.middleware.cors import CORSMiddleware
 import os
 from dotenv import load_dotenv
-from agent.router import Router
+from server.token_cache import TokenCache, start_certificate_refresh
+from server.coalescing import SingleFlight, request_fingerprint
+from server.admission import AdmissionController, AdmissionRejected
+from server.thread_store import ThreadStore, SQLiteThreadBackend
+from server.answer_cache import AnswerCache, SQLiteAnswerBackend
+from data.corpus_version import CorpusVersion
+from starlette.concurrency import run_in_threadpool
+from agent.metrics import register_stats
+from prometheus_client import make_asgi_app
 from langchain_core.messages import HumanMessage, BaseMessage, AIMessage
-from typing import List, Optional
+from typing import List, Optional, TYPE_CHECKING
 from datetime import datetime, timezone
+from contextlib import asynccontextmanager
+import asyncio
 import uuid
+import json
+
+if TYPE_CHECKING:
+    from agent.router import Router
 
 load_dotenv()  # Load environment variables
 
@@ -23,15 +36,131 @@ else:
     os.environ["LANGCHAIN_PROJECT"] = f"ProyGrad2024 ({environment} - {os.getenv('DEVELOPER', 'Anonymous')})"
 os.environ["LANGCHAIN_TRACING_V2"] = "true"
 
-# Initialize Firebase Admin
-try: # Try to get existing app
-    firebase_app = get_app()
-except ValueError: # If no app exists, initialize with credentials
-    cred = credentials.Certificate("firebase-credentials.json")
-    firebase_app = initialize_app(cred)
+# Heavy services (Firebase, Milvus, LLM clients) are initialized in the background once the server
+# is up; until then /readyz and the agent endpoints answer 503
+firebase_auth = None
+router: Optional["Router"] = None
+readiness = {"firebase": False, "router": False, "warmup": False}
+startup_errors = {}
+
+def _initialize_firebase():
+    global firebase_auth
+    from firebase_admin import auth, credentials, initialize_app, get_app
+
+    # Initialize Firebase Admin
+    try: # Try to get existing app
+        firebase_app = get_app()
+    except ValueError: # If no app exists, initialize with credentials
+        cred = credentials.Certificate("firebase-credentials.json")
+        firebase_app = initialize_app(cred)
+
+    start_certificate_refresh(firebase_app, interval_seconds=int(os.getenv("FIREBASE_CERT_REFRESH_SECONDS", "1800")))
+    firebase_auth = auth
+    readiness["firebase"] = True
+
+def _create_rag():
+    from agent.rag import RAG
+    return RAG()
+
+def _import_router():
+    # Importing the agent modules (LangChain, OpenAI and Milvus clients) is a large part of the cold start
+    from agent.router import Router
+    return Router
+
+async def _initialize_services():
+    """Initialize Firebase, Milvus and the LLM clients concurrently, retrying whatever fails."""
+    global router
+    retry_delay = 2
+    rag = None
+    while not (readiness["firebase"] and readiness["router"]):
+        tasks = {}
+        if not readiness["firebase"]:
+            tasks["firebase"] = asyncio.to_thread(_initialize_firebase)
+        # Once the router is up only Firebase is retried: rebuilding it would re-embed the pre-router examples and open new clients
+        if not readiness["router"]:
+            if rag is None:
+                tasks["rag"] = asyncio.to_thread(_create_rag)
+            tasks["router_class"] = asyncio.to_thread(_import_router)
+
+        results = dict(zip(tasks, await asyncio.gather(*tasks.values(), return_exceptions=True)))
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                startup_errors[name] = str(result)
+                print(f"Error al inicializar {name}: {result}")
+            else:
+                startup_errors.pop(name, None)
+
+        if rag is None and not isinstance(results.get("rag"), Exception):
+            rag = results["rag"]
+        router_class = results.get("router_class")
+        if not readiness["router"] and rag is not None and router_class is not None and not isinstance(router_class, Exception):
+            try:
+                # Building the router may embed the pre-router examples, so it runs off the event loop
+                new_router = await asyncio.to_thread(router_class, rag=rag)
+            except Exception as e:
+                startup_errors["router"] = str(e)
+                print(f"Error al inicializar router: {e}")
+            else:
+                startup_errors.pop("router", None)
+                router = new_router
+                register_stats("history_manager", router.history_manager.stats)
+                if router.pre_router is not None:
+                    register_stats("pre_router", router.pre_router.stats)
+                from agent import hedging
+                register_stats("hedging", hedging.stats)
+                if hasattr(router.rag.embeddings, "stats"):
+                    register_stats("embedding_cache", router.rag.embeddings.stats)
+                readiness["router"] = True
+
+        if not (readiness["firebase"] and readiness["router"]):
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 60)
+
+    if os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true":
+        await _warmup()
+    readiness["warmup"] = True
 
-app = FastAPI()
-router = Router()
+async def _warmup():
+    """Run one query end to end so the first user request does not pay for cold connections."""
+    try:
+        await router.aprocess_query(os.getenv("WARMUP_QUERY", "¿Qué es la inteligencia artificial?"), [])
+    except Exception as e:
+        print(f"Error en la consulta de calentamiento: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    initialization = asyncio.create_task(_initialize_services())
+    yield
+    initialization.cancel()
+
+app = FastAPI(lifespan=lifespan)
+token_cache = TokenCache(max_size=int(os.getenv("FIREBASE_TOKEN_CACHE_SIZE", "10000")))
+single_flight = SingleFlight(result_ttl_seconds=float(os.getenv("IDEMPOTENCY_RESULT_TTL_SECONDS", "300")))
+thread_store = ThreadStore(
+    max_threads=int(os.getenv("THREAD_STORE_MAX_THREADS", "10000")),
+    ttl_seconds=float(os.getenv("THREAD_STORE_TTL_SECONDS", "86400")),
+    backend=SQLiteThreadBackend(os.getenv("THREAD_STORE_SQLITE_PATH")) if os.getenv("THREAD_STORE_SQLITE_PATH") else None
+)
+answer_cache = AnswerCache(
+    corpus_version=CorpusVersion(),
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "86400")),
+    history_messages=int(os.getenv("ANSWER_CACHE_HISTORY_MESSAGES", "6")),
+    backend=SQLiteAnswerBackend(os.getenv("ANSWER_CACHE_SQLITE_PATH")) if os.getenv("ANSWER_CACHE_SQLITE_PATH") else None
+)
+admission = AdmissionController(
+    max_in_flight=int(os.getenv("MAX_IN_FLIGHT_REQUESTS", "32")),
+    max_queue=int(os.getenv("MAX_QUEUED_REQUESTS", "64")),
+    max_per_user=int(os.getenv("MAX_REQUESTS_PER_USER", "2")),
+    queue_timeout_seconds=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "10"))
+)
+
+app.mount("/metrics", make_asgi_app())
+register_stats("auth_token_cache", token_cache.stats)
+register_stats("single_flight", single_flight.stats)
+register_stats("admission", admission.stats)
+register_stats("thread_store", thread_store.stats)
+register_stats("answer_cache", answer_cache.stats)
 
 # Split the CORS_ORIGINS string into a list
 origins = os.getenv("CORS_ORIGINS").split(",")
@@ -47,11 +176,16 @@ app.add_middleware(
 security = HTTPBearer()
 
 async def verify_firebase_token(request: Request, token: HTTPBearer = Depends(security)):
+    if firebase_auth is None:
+        raise HTTPException(status_code=503, detail="El servicio se está iniciando, intente nuevamente en unos segundos.")
     try:
-        decoded_token = auth.verify_id_token(token.credentials)
+        decoded_token = token_cache.get(token.credentials)
+        if decoded_token is None:
+            decoded_token = await run_in_threadpool(firebase_auth.verify_id_token, token.credentials)
+            token_cache.put(token.credentials, decoded_token)
         request.state.user_id = decoded_token['uid']
         return decoded_token
-    except auth.InvalidIdTokenError:
+    except firebase_auth.InvalidIdTokenError:
         raise HTTPException(
             status_code=401,
             detail="Token is invalid or expired"
@@ -62,6 +196,36 @@ async def verify_firebase_token(request: Request, token: HTTPBearer = Depends(se
             detail=f"Authentication failed: {str(e)}"
         )
 
+@app.get("/healthz")
+async def healthz():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/readyz")
+async def readyz():
+    """Readiness: Firebase, Milvus and the LLM clients are initialized (and the warmup query ran, if enabled)."""
+    ready = all(readiness.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "components": readiness, "errors": startup_errors}
+    )
+
+def require_router():
+    if router is None:
+        raise HTTPException(status_code=503, detail="El servicio se está iniciando, intente nuevamente en unos segundos.")
+    return router
+
+@app.get("/stats")
+async def stats():
+    """In-process counters for the serving path."""
+    return {
+        "auth_token_cache": token_cache.stats(),
+        "single_flight": single_flight.stats(),
+        "admission": admission.stats(),
+        "thread_store": thread_store.stats(),
+        "answer_cache": answer_cache.stats()
+    }
+
 # @app.get("/public/reload_data")
 # async def public_reload_data():
 #     try:
@@ -74,8 +238,10 @@ async def verify_firebase_token(request: Request, token: HTTPBearer = Depends(se
 
 class MessageRequest(BaseModel):
     message: str
-    history: list[dict] = []
+    # Legacy clients send the full history on every turn; when omitted, the server-side thread is used
+    history: Optional[list[dict]] = None
     threadId: str
+    messageId: Optional[str] = None  # Client generated id, used as idempotency key for retries
 
 class Citation(BaseModel):
     """APA-formatted citation for a document"""
@@ -90,41 +256,173 @@ class MessageResponse(BaseModel):
     timestamp: str
     response: str
     citations: list[Citation] = []
+    degradations: list[str] = []  # Stages degraded to meet the request deadline (e.g. 'raw_query', 'rag_answer')
 
 @app.post("/invoke_agent", response_model=MessageResponse)
 async def invoke_agent(
     request: MessageRequest,
-    user = Depends(verify_firebase_token)
+    user = Depends(verify_firebase_token),
+    router = Depends(require_router)
 ):
     try:
-        id = str(uuid.uuid4())
-        response, citations = router.process_query(
-            request.message,
-            _format_history_messages(request.history),
-            langsmith_extra={
-                "metadata": {
-                    "email": user["email"],
-                    "thread_id": request.threadId,
-                    "message_id": id,
-                    "app_version": os.getenv("APP_VERSION") if os.getenv("APP_VERSION") else "unknown"
-                }
-            }
+        id = request.messageId or str(uuid.uuid4())
+
+        async def run_pipeline():
+            history = await _thread_history(user, request)
+            cache_key = answer_cache.key(request.message, history)
+            cached = await answer_cache.aget(cache_key)
+            if cached is not None:
+                response, citations = cached
+                degradations = []
+            else:
+                # Only actual pipeline executions take an admission slot, coalesced duplicates just wait for them
+                async with admission.admit(user["uid"]):
+                    response, citations, degradations = await router.aprocess_query(
+                        request.message,
+                        history,
+                        langsmith_extra=_langsmith_extra(user, request, id),
+                        thread_id=_thread_key(user, request)
+                    )
+                # Degraded answers are not cached, the next identical question gets the full pipeline
+                if not degradations:
+                    await answer_cache.aput(cache_key, [response, citations])
+            await thread_store.aappend(_thread_key(user, request), HumanMessage(content=request.message), AIMessage(content=response))
+            return response, citations, degradations
+
+        # Concurrent identical requests (retries, double submits) share a single pipeline execution
+        response, citations, degradations = await single_flight.run(
+            key=request_fingerprint(user["uid"], request.threadId, request.message, request.history),
+            fn=run_pipeline,
+            idempotency_key=f"{user['uid']}:{request.messageId}" if request.messageId else None
         )
         
         return MessageResponse(
             id=id,
             timestamp=datetime.now(timezone.utc).isoformat(),
             response=response,
-            citations=citations
+            citations=citations,
+            degradations=degradations
         )
+    except AdmissionRejected as e:
+        raise _too_many_requests(e)
     except Exception as e:
-        if is_production:
-            raise HTTPException(status_code=500, detail=f"Ha ocurrido un error al procesar su solicitud.")
-        else:
-            if "request" in e.__dict__:
-                raise HTTPException(status_code=500, detail=f"{e.__dict__['request']} {str(e)}")
-            else:
-                raise HTTPException(status_code=500, detail=str(e))
+        raise HTTPException(status_code=500, detail=_error_detail(e))
+
+@app.post("/invoke_agent/stream")
+async def invoke_agent_stream(
+    request: MessageRequest,
+    user = Depends(verify_firebase_token),
+    router = Depends(require_router)
+):
+    """Server-sent events version of /invoke_agent: stage events, response tokens, then citations."""
+    id = str(uuid.uuid4())
+    history = await _thread_history(user, request)
+    cache_key = answer_cache.key(request.message, history)
+    cached = await answer_cache.aget(cache_key)
+
+    release = None
+    if cached is not None:
+        events = _cached_answer_events(*cached)
+    else:
+        try:
+            admitted_at = await admission.acquire(user["uid"])
+        except AdmissionRejected as e:
+            raise _too_many_requests(e)
+        release = lambda: admission.release(user["uid"], admitted_at)
+        events = router.astream_query(
+            request.message,
+            history,
+            langsmith_extra=_langsmith_extra(user, request, id),
+            thread_id=_thread_key(user, request)
+        )
+
+    async def event_stream():
+        try:
+            citations = []
+            async for event, data in events:
+                if event == "citations":
+                    citations = data["citations"]
+                if event == "done":
+                    await thread_store.aappend(_thread_key(user, request), HumanMessage(content=request.message), AIMessage(content=data["response"]))
+                    if cached is None and not data["degradations"]:
+                        await answer_cache.aput(cache_key, [data["response"], citations])
+                    data = {"id": id, "timestamp": datetime.now(timezone.utc).isoformat(), **data}
+                yield _format_sse_event(event, data)
+        except Exception as e:
+            yield _format_sse_event("error", {"detail": _error_detail(e)})
+
+    return _AdmittedStreamingResponse(
+        event_stream(),
+        release=release,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+class _AdmittedStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that frees its admission slot once the response is over. Releasing it here rather than in the
+    body generator also covers a body that never starts (client gone, failed send), where the generator's finally never runs.
+    """
+
+    def __init__(self, *args, release=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.release = release
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            if self.release is not None:
+                self.release()
+
+async def _cached_answer_events(response: str, citations: list[dict]):
+    """Replay a cached answer with the same events as Router.astream_query."""
+    yield "generating", {}
+    yield "token", {"text": response}
+    yield "citations", {"citations": citations}
+    yield "done", {"response": response, "degradations": []}
+
+def _thread_key(user: dict, request: MessageRequest) -> str:
+    # Threads are scoped to their owner so a threadId cannot be used to read someone else's conversation
+    return f"{user['uid']}:{request.threadId}"
+
+async def _thread_history(user: dict, request: MessageRequest) -> List[BaseMessage]:
+    """History for the request: the one sent by the client if any (which then replaces the stored thread), otherwise the stored thread."""
+    if request.history is not None:
+        history = _format_history_messages(request.history)
+        await thread_store.areplace(_thread_key(user, request), history)
+        return history
+    return await thread_store.aget(_thread_key(user, request))
+
+def _too_many_requests(e: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Hay demasiadas solicitudes en curso, por favor intente nuevamente en unos segundos.",
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+def _langsmith_extra(user: dict, request: MessageRequest, message_id: str) -> dict:
+    """Tracing metadata attached to every agent run."""
+    return {
+        "metadata": {
+            "email": user["email"],
+            "thread_id": request.threadId,
+            "message_id": message_id,
+            "app_version": os.getenv("APP_VERSION") if os.getenv("APP_VERSION") else "unknown"
+        }
+    }
+
+def _format_sse_event(event: str, data: dict) -> str:
+    """Serialize an event in the server-sent events wire format."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _error_detail(e: Exception) -> str:
+    """Error message exposed to the client; details are only shown outside production."""
+    if is_production:
+        return "Ha ocurrido un error al procesar su solicitud."
+    if "request" in e.__dict__:
+        return f"{e.__dict__['request']} {str(e)}"
+    return str(e)
         
 def _format_history_messages(history: List[dict]) -> List[BaseMessage]:
     """Convert chat history into a list of messages."""
@@ -0,0 +1,142 @@
+from collections import defaultdict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Deque, Dict
+import asyncio
+import math
+import time
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted; 'retry_after' is a hint in seconds for the client."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """
+    Bounded admission queue in front of the agent.
+
+    At most 'max_in_flight' requests run at once and at most 'max_queue' wait for a slot, in FIFO order,
+    for up to 'queue_timeout_seconds'. Each user can have at most 'max_per_user' requests running or
+    queued. Anything beyond those limits is rejected right away with AdmissionRejected, so admitted
+    requests keep a stable latency instead of all of them slowing down together.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 32,
+        max_queue: int = 64,
+        max_per_user: int = 2,
+        queue_timeout_seconds: float = 10
+    ):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.queue_timeout_seconds = queue_timeout_seconds
+
+        self.in_flight = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+        # Requests running or queued per user; users are removed at 0 so the dict only holds active users
+        self._per_user: Dict[str, int] = {}
+
+        self.admitted = 0
+        self.rejected: Dict[str, int] = defaultdict(int)
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        # Exponentially weighted average of how long an admitted request holds its slot
+        self.avg_service_seconds = 5.0
+
+    def _retry_after(self) -> int:
+        """Rough estimate of how long until a slot frees up for a new request."""
+        waiting_rounds = (len(self._waiters) + 1) / self.max_in_flight
+        return max(1, math.ceil(self.avg_service_seconds * waiting_rounds))
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        return AdmissionRejected(reason, self._retry_after())
+
+    async def acquire(self, user_id: str) -> float:
+        """
+        Wait for a slot for 'user_id', or raise AdmissionRejected.
+        Returns the admission time, which must be passed back to release().
+        """
+        if self._per_user.get(user_id, 0) >= self.max_per_user:
+            raise self._reject("user_limit")
+
+        wait_start = time.monotonic()
+        if self.in_flight >= self.max_in_flight or self._waiters:
+            if len(self._waiters) >= self.max_queue:
+                raise self._reject("queue_full")
+
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            self._add_user_request(user_id)
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter), timeout=self.queue_timeout_seconds)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                self._remove_user_request(user_id)
+                if waiter.done() and not waiter.cancelled():
+                    # The slot was handed over just as we gave up on it, pass it on
+                    self._release_slot()
+                else:
+                    waiter.cancel()
+                    self._waiters.remove(waiter)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                raise self._reject("queue_timeout")
+        else:
+            self.in_flight += 1
+            self._add_user_request(user_id)
+
+        waited = time.monotonic() - wait_start
+        self.admitted += 1
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        return time.monotonic()
+
+    def release(self, user_id: str, admitted_at: float) -> None:
+        """Free the slot held by 'user_id' and hand it to the next queued request, if any."""
+        self.avg_service_seconds = 0.9 * self.avg_service_seconds + 0.1 * (time.monotonic() - admitted_at)
+
+        self._remove_user_request(user_id)
+        self._release_slot()
+
+    def _add_user_request(self, user_id: str) -> None:
+        self._per_user[user_id] = self._per_user.get(user_id, 0) + 1
+
+    def _remove_user_request(self, user_id: str) -> None:
+        remaining = self._per_user.get(user_id, 0) - 1
+        if remaining > 0:
+            self._per_user[user_id] = remaining
+        else:
+            self._per_user.pop(user_id, None)
+
+    def _release_slot(self) -> None:
+        # The slot is transferred directly to the next waiter, so in_flight only drops when nobody is queued
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def admit(self, user_id: str) -> AsyncIterator[None]:
+        """Hold an admission slot for the duration of the block."""
+        admitted_at = await self.acquire(user_id)
+        try:
+            yield
+        finally:
+            self.release(user_id, admitted_at)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+            "avg_wait_seconds": self.total_wait_seconds / self.admitted if self.admitted else 0.0,
+            "max_wait_seconds": self.max_wait_seconds,
+            "avg_service_seconds": self.avg_service_seconds
+        }
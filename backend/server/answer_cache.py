@@ -0,0 +1,175 @@
+from collections import OrderedDict
+from typing import Any, Callable, List, Optional
+from langchain_core.messages import BaseMessage
+import asyncio
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+
+def normalize_query(query: str) -> str:
+    """Lowercase, strip accents, punctuation and repeated whitespace, so trivially different phrasings share an entry."""
+    query = unicodedata.normalize("NFKD", query.lower())
+    query = "".join(char for char in query if not unicodedata.combining(char))
+    query = re.sub(r"[^\w\s]", " ", query)
+    return re.sub(r"\s+", " ", query).strip()
+
+class SQLiteAnswerBackend:
+    """Persistent tier for AnswerCache."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    key TEXT PRIMARY KEY,
+                    corpus_version TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+
+    def get(self, key: str, corpus_version: str, ttl_seconds: float) -> Optional[Any]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM answers WHERE key = ? AND corpus_version = ? AND created_at >= ?",
+                (key, corpus_version, time.time() - ttl_seconds)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, corpus_version: str, value: Any) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?)",
+                (key, corpus_version, json.dumps(value, ensure_ascii=False), time.time())
+            )
+
+    def delete_stale(self, corpus_version: str, ttl_seconds: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM answers WHERE corpus_version != ? OR created_at < ?",
+                (corpus_version, time.time() - ttl_seconds)
+            )
+
+class AnswerCache:
+    """
+    Cache of full agent answers for repeated questions.
+
+    Keys combine the normalized query with a fingerprint of the last 'history_messages' messages of
+    the conversation. Entries are evicted LRU beyond 'max_entries', expire after 'ttl_seconds', and
+    are all dropped when the indexed corpus version changes. While no corpus version is available
+    (corpus_version() returns None) the cache is disabled: nothing is stored or returned. An optional
+    SQLite backend keeps them across restarts and shares them between workers; the async methods
+    (aget, aput) run its queries, and the corpus version check, in a worker thread, off the event loop.
+    """
+
+    def __init__(
+        self,
+        corpus_version: Callable[[], Optional[str]],
+        max_entries: int = 1000,
+        ttl_seconds: float = 86400,
+        history_messages: int = 6,
+        backend: Optional[SQLiteAnswerBackend] = None
+    ):
+        self.corpus_version = corpus_version
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.history_messages = history_messages
+        self.backend = backend
+        self._entries: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self._version = corpus_version()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        if self._version is None:
+            _warn_disabled()
+
+    def key(self, query: str, history: List[BaseMessage]) -> str:
+        digest = hashlib.sha256(normalize_query(query).encode("utf-8"))
+        relevant_history = history[-self.history_messages:] if self.history_messages else []
+        for message in relevant_history:
+            digest.update(b"\0" + message.type.encode("utf-8") + b"\0")
+            digest.update(" ".join(message.content.split()).encode("utf-8"))
+        return digest.hexdigest()
+
+    def _check_version(self) -> Optional[str]:
+        version = self.corpus_version()
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+            self.invalidations += 1
+            if version is None:
+                _warn_disabled()
+            elif self.backend:
+                self.backend.delete_stale(version, self.ttl_seconds)
+        return version
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            version = self._check_version()
+            if version is None:
+                return None
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self._entries.pop(key, None)
+
+        value = self.backend.get(key, version, self.ttl_seconds) if self.backend else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._put(key, value)
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        """Store a JSON-serializable answer under the current corpus version."""
+        with self._lock:
+            version = self._check_version()
+            if version is None:
+                return
+            self._put(key, value)
+        if self.backend:
+            self.backend.put(key, version, value)
+
+    async def aget(self, key: str) -> Optional[Any]:
+        return await self._run(self.get, key)
+
+    async def aput(self, key: str, value: Any) -> None:
+        await self._run(self.put, key, value)
+
+    async def _run(self, method, *args):
+        # Only the SQLite tier blocks; the in-memory cache is served inline
+        if self.backend:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def _put(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "invalidations": self.invalidations,
+                "enabled": self._version is not None
+            }
+
+def _warn_disabled() -> None:
+    print("Caché de respuestas desactivada: no hay versión del corpus (CORPUS_VERSION o data/corpus_version.json, que escribe load_data)")
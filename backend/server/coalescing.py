@@ -0,0 +1,83 @@
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import hashlib
+import json
+import time
+
+def request_fingerprint(*parts: Any) -> str:
+    """Stable hash of JSON-serializable request parts, used as the coalescing key."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls into a single execution.
+
+    While a call for a given key is running, further calls with the same key wait for it and receive
+    the same result (or exception). Results can also be remembered for a short time under an
+    idempotency key, so a retry that arrives after the first call finished is answered without
+    running the pipeline again.
+    """
+
+    def __init__(self, result_ttl_seconds: float = 300, max_results: int = 1000):
+        self.result_ttl_seconds = result_ttl_seconds
+        self.max_results = max_results
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._results: "OrderedDict[str, tuple[float, Any]]" = OrderedDict()
+        self.executions = 0
+        self.coalesced = 0
+        self.replayed = 0
+
+    def _get_result(self, idempotency_key: str) -> tuple[bool, Any]:
+        entry = self._results.get(idempotency_key)
+        if entry is None:
+            return False, None
+        stored_at, result = entry
+        if time.monotonic() - stored_at > self.result_ttl_seconds:
+            del self._results[idempotency_key]
+            return False, None
+        return True, result
+
+    def _store_result(self, idempotency_key: str, result: Any) -> None:
+        self._results[idempotency_key] = (time.monotonic(), result)
+        self._results.move_to_end(idempotency_key)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+
+    async def run(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        idempotency_key: Optional[str] = None
+    ) -> Any:
+        """Run 'fn' once per key among concurrent callers, replaying finished results by idempotency key."""
+        if idempotency_key is not None:
+            found, result = self._get_result(idempotency_key)
+            if found:
+                self.replayed += 1
+                return result
+
+        task = self._in_flight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.executions += 1
+            # The shared execution runs as its own task so that a caller disconnecting does not cancel it for the rest
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+
+        result = await asyncio.shield(task)
+        if idempotency_key is not None:
+            self._store_result(idempotency_key, result)
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._in_flight),
+            "stored_results": len(self._results),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "replayed": self.replayed
+        }
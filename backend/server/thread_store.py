@@ -0,0 +1,187 @@
+from collections import OrderedDict
+from typing import List, Optional
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+import asyncio
+import sqlite3
+import threading
+import time
+
+class SQLiteThreadBackend:
+    """Persistent tier for ThreadStore, one row per message."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS thread_messages (
+                    thread_key TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (thread_key, position)
+                )
+            """)
+
+    def load(self, thread_key: str, ttl_seconds: float) -> Optional[List[BaseMessage]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content, updated_at FROM thread_messages WHERE thread_key = ? ORDER BY position",
+                (thread_key,)
+            ).fetchall()
+        if not rows or time.time() - max(row[2] for row in rows) > ttl_seconds:
+            return None
+        return [HumanMessage(content=content) if role == "user" else AIMessage(content=content) for role, content, _ in rows]
+
+    def replace(self, thread_key: str, messages: List[BaseMessage]) -> None:
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM thread_messages WHERE thread_key = ?", (thread_key,))
+            self._conn.executemany(
+                "INSERT INTO thread_messages VALUES (?, ?, ?, ?, ?)",
+                [(thread_key, i, _role(msg), msg.content, now) for i, msg in enumerate(messages)]
+            )
+
+    def append(self, thread_key: str, messages: List[BaseMessage]) -> None:
+        now = time.time()
+        # Positions are taken from the table inside the transaction, never from a possibly stale in-memory length,
+        # so appends from other workers sharing the file do not overwrite each other
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT INTO thread_messages "
+                "SELECT ?, COALESCE((SELECT MAX(position) FROM thread_messages WHERE thread_key = ?), -1) + 1, ?, ?, ?",
+                [(thread_key, thread_key, _role(msg), msg.content, now) for msg in messages]
+            )
+
+    def delete_expired(self, ttl_seconds: float) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM thread_messages WHERE thread_key IN "
+                "(SELECT thread_key FROM thread_messages GROUP BY thread_key HAVING MAX(updated_at) < ?)",
+                (time.time() - ttl_seconds,)
+            )
+
+def _role(message: BaseMessage) -> str:
+    return "user" if isinstance(message, HumanMessage) else "assistant"
+
+def _same_messages(a: List[BaseMessage], b: List[BaseMessage]) -> bool:
+    return len(a) == len(b) and all(_role(x) == _role(y) and x.content == y.content for x, y in zip(a, b))
+
+class ThreadStore:
+    """
+    Server-side conversation history keyed by thread.
+
+    Threads are kept in memory as ready-made HumanMessage/AIMessage lists, so they are built once and
+    reused on every turn, with LRU eviction beyond 'max_threads' and expiry after 'ttl_seconds'
+    without activity. An optional SQLite backend keeps threads across restarts and evictions; the
+    async methods (aget, areplace, aappend) run its queries in a worker thread, off the event loop.
+    """
+
+    def __init__(self, max_threads: int = 10000, ttl_seconds: float = 86400, backend: Optional[SQLiteThreadBackend] = None):
+        self.max_threads = max_threads
+        self.ttl_seconds = ttl_seconds
+        self.backend = backend
+        self._threads: "OrderedDict[str, tuple[float, List[BaseMessage]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Striped per-thread locks: a read-modify-write of one thread (append, replace) runs whole, while
+        # different threads still proceed in parallel. A fixed pool needs no cleanup as threads come and go
+        self._thread_locks = [threading.Lock() for _ in range(64)]
+        self._last_cleanup = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, thread_key: str) -> List[BaseMessage]:
+        """Return a snapshot of the thread's messages (empty for unknown or expired threads)."""
+        with self._lock:
+            entry = self._threads.get(thread_key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds:
+                self._threads.move_to_end(thread_key)
+                self.hits += 1
+                return list(entry[1])
+            self._threads.pop(thread_key, None)
+
+        messages = self.backend.load(thread_key, self.ttl_seconds) if self.backend else None
+        with self._lock:
+            if messages is None:
+                self.misses += 1
+                return []
+            self.hits += 1
+            self._put(thread_key, messages)
+            return list(messages)
+
+    def replace(self, thread_key: str, messages: List[BaseMessage]) -> None:
+        """Overwrite the thread, used when a client sends its full history. A history equal to the stored one is not rewritten."""
+        with self._thread_lock(thread_key):
+            stored = self._stored(thread_key)
+            if stored is not None and _same_messages(stored, messages):
+                # Usual case: the client sends back the thread as it was stored after the previous turn
+                with self._lock:
+                    self._put(thread_key, stored)
+                return
+            with self._lock:
+                self._put(thread_key, list(messages))
+            if self.backend:
+                self.backend.replace(thread_key, messages)
+
+    def append(self, thread_key: str, *messages: BaseMessage) -> None:
+        """Append messages (usually the user's message and the assistant's reply) to the thread."""
+        with self._thread_lock(thread_key):
+            # Evicted from memory: continue from the persisted thread instead of starting over
+            stored = self._stored(thread_key) or []
+            with self._lock:
+                self._put(thread_key, stored + list(messages))
+            if self.backend:
+                self.backend.append(thread_key, list(messages))
+        if self.backend:
+            self._maybe_cleanup()
+
+    def _thread_lock(self, thread_key: str) -> threading.Lock:
+        return self._thread_locks[hash(thread_key) % len(self._thread_locks)]
+
+    def _stored(self, thread_key: str) -> Optional[List[BaseMessage]]:
+        """The thread from memory, or from the persistent tier if it was evicted (None if unknown)."""
+        with self._lock:
+            entry = self._threads.get(thread_key)
+        if entry is not None:
+            return entry[1]
+        return self.backend.load(thread_key, self.ttl_seconds) if self.backend else None
+
+    async def aget(self, thread_key: str) -> List[BaseMessage]:
+        return await self._run(self.get, thread_key)
+
+    async def areplace(self, thread_key: str, messages: List[BaseMessage]) -> None:
+        await self._run(self.replace, thread_key, messages)
+
+    async def aappend(self, thread_key: str, *messages: BaseMessage) -> None:
+        await self._run(self.append, thread_key, *messages)
+
+    async def _run(self, method, *args):
+        # Only the SQLite tier blocks; the in-memory store is served inline
+        if self.backend:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def _put(self, thread_key: str, messages: List[BaseMessage]) -> None:
+        self._threads[thread_key] = (time.monotonic(), messages)
+        self._threads.move_to_end(thread_key)
+        while len(self._threads) > self.max_threads:
+            self._threads.popitem(last=False)
+
+    def _maybe_cleanup(self) -> None:
+        # Expired rows are purged from the persistent tier at most once per TTL window
+        if time.monotonic() - self._last_cleanup > min(self.ttl_seconds, 3600):
+            self._last_cleanup = time.monotonic()
+            self.backend.delete_expired(self.ttl_seconds)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "threads": len(self._threads),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "persistent": self.backend is not None
+            }
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from typing import Optional
+import hashlib
+import threading
+import time
+
+class TokenCache:
+    """
+    Bounded in-process cache of decoded Firebase ID tokens.
+
+    Entries are keyed by a SHA-256 of the raw token (the token itself is never stored) and are
+    dropped once the token's 'exp' claim has passed, so a cached token is never accepted for longer
+    than Firebase itself would accept it.
+    """
+
+    def __init__(self, max_size: int = 10000, expiry_margin_seconds: int = 5):
+        self.max_size = max_size
+        self.expiry_margin_seconds = expiry_margin_seconds
+        self._entries: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[dict]:
+        """Return the decoded token if it is cached and not expired, otherwise None."""
+        key = self._key(token)
+        with self._lock:
+            decoded = self._entries.get(key)
+            if decoded is None:
+                self.misses += 1
+                return None
+            if decoded.get("exp", 0) - self.expiry_margin_seconds <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return decoded
+
+    def put(self, token: str, decoded: dict) -> None:
+        """Cache a decoded token, evicting the least recently used entries beyond max_size."""
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = decoded
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+def start_certificate_refresh(firebase_app, interval_seconds: int = 1800) -> threading.Thread:
+    """
+    Prefetch the Google public certificates used to verify ID tokens and keep them warm in a daemon thread.
+
+    firebase_admin caches the certificates in the HTTP session of its token verifier, honouring the
+    Cache-Control headers, so fetching them ahead of time means token verification on the request path
+    never has to wait on the certificate download.
+    """
+    from firebase_admin import auth, _token_gen
+
+    def refresh():
+        while True:
+            try:
+                # There is no public API for this; the verifier's request object owns the certificate cache
+                request = auth._get_client(firebase_app)._token_verifier.request
+                request(url=_token_gen.ID_TOKEN_CERT_URI, method="GET")
+            except Exception as e:
+                print(f"Error al actualizar los certificados de Firebase: {e}")
+            time.sleep(interval_seconds)
+
+    thread = threading.Thread(target=refresh, name="firebase-cert-refresh", daemon=True)
+    thread.start()
+    return thread
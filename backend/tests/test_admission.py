@@ -0,0 +1,66 @@
+import asyncio
+import unittest
+from server.admission import AdmissionController, AdmissionRejected
+
+class TestAdmissionController(unittest.TestCase):
+    def test_queued_requests_run_in_order_once_a_slot_frees(self):
+        """Requests beyond the in-flight limit wait and are admitted FIFO"""
+        admission = AdmissionController(max_in_flight=1, max_queue=5, max_per_user=5)
+        order = []
+
+        async def request(name):
+            async with admission.admit("user"):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        async def scenario():
+            await asyncio.gather(*(request(i) for i in range(3)))
+
+        asyncio.run(scenario())
+        self.assertEqual(order, [0, 1, 2])
+        self.assertEqual(admission.stats()["in_flight"], 0)
+        self.assertEqual(admission.stats()["admitted"], 3)
+
+    def test_per_user_limit(self):
+        """A user over its limit is rejected while other users are admitted"""
+        admission = AdmissionController(max_in_flight=10, max_queue=10, max_per_user=1)
+
+        async def scenario():
+            admitted_at = await admission.acquire("a")
+            with self.assertRaises(AdmissionRejected) as ctx:
+                await admission.acquire("a")
+            self.assertEqual(ctx.exception.reason, "user_limit")
+            self.assertGreaterEqual(ctx.exception.retry_after, 1)
+            other = await admission.acquire("b")
+            admission.release("a", admitted_at)
+            admission.release("b", other)
+
+        asyncio.run(scenario())
+        self.assertEqual(admission.stats()["in_flight"], 0)
+        # Checking a user's count does not create an entry, and finished users are dropped
+        self.assertEqual(admission._per_user, {})
+
+    def test_queue_full_and_timeout(self):
+        """Overflow is rejected immediately and queued requests give up after the timeout"""
+        admission = AdmissionController(max_in_flight=1, max_queue=1, max_per_user=5, queue_timeout_seconds=0.05)
+
+        async def scenario():
+            admitted_at = await admission.acquire("a")
+            queued = asyncio.ensure_future(admission.acquire("b"))
+            await asyncio.sleep(0)
+            with self.assertRaises(AdmissionRejected) as ctx:
+                await admission.acquire("c")
+            self.assertEqual(ctx.exception.reason, "queue_full")
+            with self.assertRaises(AdmissionRejected) as ctx:
+                await queued
+            self.assertEqual(ctx.exception.reason, "queue_timeout")
+            admission.release("a", admitted_at)
+
+        asyncio.run(scenario())
+        self.assertEqual(admission.stats()["in_flight"], 0)
+        self.assertEqual(admission.stats()["queue_depth"], 0)
+        # Rejected and timed out users do not leave a 0 entry behind
+        self.assertEqual(admission._per_user, {})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import asyncio
+import os
+import tempfile
+import unittest
+import unittest.mock
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.documents import Document
+from server.answer_cache import AnswerCache, SQLiteAnswerBackend, normalize_query
+from data.corpus_version import CorpusVersion, write_corpus_version
+
+class TestAnswerCache(unittest.TestCase):
+    def test_normalized_queries_share_an_entry(self):
+        """Case, accents, punctuation and spacing do not change the key"""
+        cache = AnswerCache(corpus_version=lambda: "v1")
+        self.assertEqual(normalize_query("¿Qué es la IA  generativa?"), "que es la ia generativa")
+        self.assertEqual(cache.key("¿Qué es la IA generativa?", []), cache.key("que es la ia generativa", []))
+        self.assertNotEqual(
+            cache.key("¿Y eso?", [HumanMessage(content="¿Qué es un LLM?"), AIMessage(content="...")]),
+            cache.key("¿Y eso?", [HumanMessage(content="¿Qué es la IA?"), AIMessage(content="...")])
+        )
+
+    def test_corpus_version_change_invalidates(self):
+        """Entries stored under an older corpus version are not returned"""
+        version = {"value": "v1"}
+        cache = AnswerCache(corpus_version=lambda: version["value"])
+        key = cache.key("¿Qué es la IA generativa?", [])
+        cache.put(key, ["respuesta", []])
+        self.assertEqual(cache.get(key), ["respuesta", []])
+        version["value"] = "v2"
+        self.assertIsNone(cache.get(key))
+        self.assertEqual(cache.stats()["invalidations"], 1)
+
+    def test_sqlite_backend(self):
+        """Answers persisted on disk are found by a fresh cache for the same corpus version only"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "answers.db")
+            cache = AnswerCache(corpus_version=lambda: "v1", backend=SQLiteAnswerBackend(path))
+            key = cache.key("hola", [])
+            cache.put(key, ["¡Hola!", []])
+
+            restarted = AnswerCache(corpus_version=lambda: "v1", backend=SQLiteAnswerBackend(path))
+            self.assertEqual(restarted.get(key), ["¡Hola!", []])
+            reindexed = AnswerCache(corpus_version=lambda: "v2", backend=SQLiteAnswerBackend(path))
+            self.assertIsNone(reindexed.get(key))
+
+    def test_async_methods_with_sqlite_backend(self):
+        """aput / aget run the SQLite queries in a worker thread and behave like the sync methods"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "answers.db")
+            cache = AnswerCache(corpus_version=lambda: "v1", backend=SQLiteAnswerBackend(path))
+            key = cache.key("hola", [])
+
+            async def scenario():
+                await cache.aput(key, ["¡Hola!", []])
+                restarted = AnswerCache(corpus_version=lambda: "v1", backend=SQLiteAnswerBackend(path))
+                return await restarted.aget(key), await restarted.aget(cache.key("chau", []))
+
+            self.assertEqual(asyncio.run(scenario()), (["¡Hola!", []], None))
+
+    def test_no_corpus_version_disables_the_cache(self):
+        """Without a corpus version nothing is cached, since a reindexing could not be detected"""
+        version = {"value": None}
+        cache = AnswerCache(corpus_version=lambda: version["value"])
+        key = cache.key("hola", [])
+        cache.put(key, ["¡Hola!", []])
+        self.assertIsNone(cache.get(key))
+        self.assertFalse(cache.stats()["enabled"])
+        version["value"] = "v1"
+        cache.put(key, ["¡Hola!", []])
+        self.assertEqual(cache.get(key), ["¡Hola!", []])
+        self.assertTrue(cache.stats()["enabled"])
+
+    def test_corpus_version_file(self):
+        """CorpusVersion reads the file written by load_data and is None without it"""
+        with tempfile.TemporaryDirectory() as tmp, unittest.mock.patch.dict(os.environ, {"CORPUS_VERSION": ""}):
+            path = os.path.join(tmp, "corpus_version.json")
+            self.assertIsNone(CorpusVersion(path)())
+            written = write_corpus_version([Document(page_content="texto", metadata={"source": "a.pdf"})], path)
+            self.assertEqual(CorpusVersion(path)(), written)
+
+if __name__ == "__main__":
+    unittest.main()
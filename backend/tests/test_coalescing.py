@@ -0,0 +1,64 @@
+import asyncio
+import unittest
+from server.coalescing import SingleFlight, request_fingerprint
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_identical_calls_share_one_execution(self):
+        """Callers with the same key while a call is running all receive its result"""
+        single_flight = SingleFlight()
+        calls = []
+
+        async def pipeline():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "respuesta"
+
+        async def scenario():
+            key = request_fingerprint("uid", "thread", "hola", [])
+            return await asyncio.gather(*(single_flight.run(key, pipeline) for _ in range(5)))
+
+        results = asyncio.run(scenario())
+        self.assertEqual(results, ["respuesta"] * 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(single_flight.stats()["coalesced"], 4)
+
+    def test_retry_after_completion_is_replayed(self):
+        """A finished result is replayed for the same idempotency key"""
+        single_flight = SingleFlight()
+        calls = []
+
+        async def pipeline():
+            calls.append(1)
+            return len(calls)
+
+        async def scenario():
+            first = await single_flight.run("key", pipeline, idempotency_key="uid:msg-1")
+            retry = await single_flight.run("key", pipeline, idempotency_key="uid:msg-1")
+            other = await single_flight.run("key", pipeline, idempotency_key="uid:msg-2")
+            return first, retry, other
+
+        self.assertEqual(asyncio.run(scenario()), (1, 1, 2))
+        self.assertEqual(single_flight.stats()["replayed"], 1)
+
+    def test_exceptions_are_shared_and_not_stored(self):
+        """A failed execution raises for every waiter and is not replayed"""
+        single_flight = SingleFlight()
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        async def scenario():
+            results = await asyncio.gather(
+                single_flight.run("key", failing, idempotency_key="uid:msg"),
+                single_flight.run("key", failing, idempotency_key="uid:msg"),
+                return_exceptions=True
+            )
+            return results
+
+        results = asyncio.run(scenario())
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertEqual(single_flight.stats()["stored_results"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
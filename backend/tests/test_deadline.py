@@ -0,0 +1,139 @@
+import asyncio
+import unittest
+import unittest.mock
+from langchain_core.documents import Document
+from agent.deadline import Deadline
+from agent.rag import RAG, TIMEOUT_ANSWER
+from agent.router import Router
+from agent.llms.rag_query_analyzer import QueryAnalysis
+from agent.llms.rag_response_generator import ContextResponse
+from agent.llms.no_information_response_generator import NoInformationResponseGenerator, TIMEOUT_RESPONSE
+
+class SlowAnalyzer:
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def aanalyze(self, question, history):
+        await asyncio.sleep(self.delay)
+        return QueryAnalysis(updated_query="analizada", queries=["a", "b"])
+
+class SlowGenerator:
+    def __init__(self, delay):
+        self.delay = delay
+
+    async def agenerate_response(self, query, search_results):
+        await asyncio.sleep(self.delay)
+        return ContextResponse(answer="respuesta", context=[])
+
+def make_rag(analysis_delay=0.0, retrieval_delay=0.0, retry_delay=0.0, generation_delay=0.0):
+    """RAG with a fake analyzer, retrieval and generator, no vector store connection."""
+    rag = RAG.__new__(RAG)
+    rag.rag_query_analyzer = SlowAnalyzer(analysis_delay)
+    rag.rag_response_generator = SlowGenerator(generation_delay)
+    rag.relevance_threshold = 0
+    rag.retrieved_with_k = []
+
+    async def aretrieve_many(queries, k=None):
+        rag.retrieved_with_k.append(k)
+        await asyncio.sleep(retrieval_delay if k is None else retry_delay)
+        return [[Document(page_content=f"sobre {query}", metadata={"pk": query})] for query in queries]
+
+    rag.aretrieve_many = aretrieve_many
+    return rag
+
+class TestDeadline(unittest.TestCase):
+    def test_no_deadline(self):
+        deadline = Deadline(0)
+        self.assertIsNone(deadline.remaining())
+        self.assertIsNone(deadline.budget("routing"))
+
+    def test_stage_budget_is_a_share_of_the_deadline(self):
+        deadline = Deadline(10, budgets={"routing": 0.2})
+        self.assertAlmostEqual(deadline.budget("routing"), 2, places=1)
+        # Stages without a share get everything that is left
+        self.assertAlmostEqual(deadline.budget("final_generation"), 10, places=1)
+
+    def test_degradations_are_recorded(self):
+        deadline = Deadline(10)
+        deadline.degrade("raw_query")
+        self.assertEqual(deadline.degradations, ["raw_query"])
+
+class TestRAGDegradations(unittest.TestCase):
+    def test_slow_analysis_falls_back_to_raw_query(self):
+        rag = make_rag(analysis_delay=1)
+        deadline = Deadline(1, budgets={"query_analysis": 0.05})
+        analysis = asyncio.run(rag.aanalyze_query("¿Qué es un LLM?", [], deadline))
+        self.assertEqual(analysis.queries, ["¿Qué es un LLM?"])
+        self.assertEqual(deadline.degradations, ["raw_query"])
+
+    def test_fast_analysis_is_not_degraded(self):
+        rag = make_rag()
+        deadline = Deadline(1, budgets={"query_analysis": 0.5})
+        analysis = asyncio.run(rag.aanalyze_query("¿Qué es un LLM?", [], deadline))
+        self.assertEqual(analysis.updated_query, "analizada")
+        self.assertEqual(deadline.degradations, [])
+
+    def test_slow_retrieval_is_retried_with_smaller_k(self):
+        rag = make_rag(retrieval_delay=1)
+        deadline = Deadline(1, budgets={"retrieval": 0.05})
+        context = asyncio.run(rag.aretrieve_context(QueryAnalysis(updated_query="q", queries=["a", "b"]), deadline))
+        self.assertIn("sobre a", context)
+        self.assertEqual(rag.retrieved_with_k, [None, 2])
+        self.assertEqual(deadline.degradations, ["reduced_k"])
+
+    def test_slow_retry_continues_without_context(self):
+        rag = make_rag(retrieval_delay=1, retry_delay=1)
+        deadline = Deadline(1, budgets={"retrieval": 0.05})
+        context = asyncio.run(rag.aretrieve_context(QueryAnalysis(updated_query="q", queries=["a", "b"]), deadline))
+        self.assertEqual(context, "")
+        self.assertEqual(deadline.degradations, ["reduced_k", "no_context"])
+
+    def test_slow_generation_returns_timeout_answer(self):
+        rag = make_rag(generation_delay=1)
+        deadline = Deadline(0.1)
+        response = asyncio.run(rag.agenerate_answer("¿Qué es un LLM?", [], QueryAnalysis(updated_query="q", queries=["a"]), "contexto", deadline))
+        self.assertEqual(response.answer, TIMEOUT_ANSWER)
+        self.assertEqual(response.context, [])
+        self.assertEqual(deadline.degradations, ["timeout_answer"])
+
+class FakeHistoryManager:
+    async def awindow(self, history, thread_id):
+        return history
+
+def make_router(rag):
+    """Router on the 'retrieve' path in two-pass mode, without LLM clients."""
+    router = Router.__new__(Router)
+    router.rag = rag
+    router.history_manager = FakeHistoryManager()
+    router.speculative_mode = "off"
+    router.fused_router_analyzer = None
+    router.grounded_response_llm = None
+    router.no_information_response = NoInformationResponseGenerator()
+    router.timeout_response = NoInformationResponseGenerator(TIMEOUT_RESPONSE)
+
+    async def aget_decision_path(query, history):
+        return "retrieve", ""
+
+    router.aget_decision_path = aget_decision_path
+    return router
+
+class TestRouterDegradations(unittest.TestCase):
+    def test_slow_retrieval_retry_returns_timeout_response(self):
+        router = make_router(make_rag(retrieval_delay=1, retry_delay=1))
+        deadline = Deadline(1, budgets={"retrieval": 0.05})
+        generator, generator_kwargs, citations = asyncio.run(router._aprepare_generation("retrieve", "q", [], deadline=deadline))
+        # A timed out retrieval is not reported as "no information on the topic"
+        self.assertIs(generator, router.timeout_response)
+        self.assertNotIn("context", generator_kwargs)
+        self.assertEqual(deadline.degradations, ["reduced_k", "no_context"])
+
+    def test_slow_rag_generation_returns_timeout_response(self):
+        router = make_router(make_rag(generation_delay=1))
+        with unittest.mock.patch("agent.router.Deadline", lambda: Deadline(0.1)):
+            response, citations, degradations = asyncio.run(router.aprocess_query("¿Qué es un LLM?", []))
+        self.assertEqual(response, TIMEOUT_RESPONSE)
+        self.assertEqual(citations, [])
+        self.assertEqual(degradations, ["timeout_answer"])
+
+if __name__ == "__main__":
+    unittest.main()
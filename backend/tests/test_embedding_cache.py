@@ -0,0 +1,77 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from langchain_core.embeddings import Embeddings
+from agent.embedding_cache import CachedEmbeddings, SQLiteEmbeddingBackend, normalize_text
+
+class CountingEmbeddings(Embeddings):
+    model = "fake-embedding"
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+class TestEmbeddingCache(unittest.TestCase):
+    def test_normalized_texts_share_an_entry(self):
+        base = CountingEmbeddings()
+        cache = CachedEmbeddings(base)
+        self.assertEqual(normalize_text("  Ethical implications\nof LLMs "), "Ethical implications of LLMs")
+        first = cache.embed_query("Ethical implications of LLMs")
+        self.assertEqual(cache.embed_query("Ethical  implications\tof LLMs "), first)
+        self.assertEqual(len(base.calls), 1)
+        self.assertEqual(cache.stats()["hit_rate"], 0.5)
+
+    def test_case_is_not_normalized(self):
+        base = CountingEmbeddings()
+        cache = CachedEmbeddings(base)
+        cache.embed_query("LLM")
+        cache.embed_query("llm")
+        self.assertEqual(len(base.calls), 2)
+        self.assertNotEqual(cache.key("LLM"), cache.key("llm"))
+
+    def test_only_misses_are_embedded_in_one_call(self):
+        base = CountingEmbeddings()
+        cache = CachedEmbeddings(base)
+        cache.embed_query("a")
+        vectors = asyncio.run(cache.aembed_documents(["a", "bb", "ccc"]))
+        self.assertEqual(vectors, [[1.0, 0.5], [2.0, 0.5], [3.0, 0.5]])
+        self.assertEqual(base.calls[-1], ["bb", "ccc"])
+
+    def test_lru_eviction(self):
+        base = CountingEmbeddings()
+        cache = CachedEmbeddings(base, max_entries=2)
+        for text in ["a", "b", "c"]:
+            cache.embed_query(text)
+        cache.embed_query("a")
+        self.assertEqual(len(base.calls), 4)
+        self.assertEqual(cache.stats()["entries"], 2)
+
+    def test_sqlite_backend_survives_restart(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "embeddings.db")
+            CachedEmbeddings(CountingEmbeddings(), backend=SQLiteEmbeddingBackend(path)).embed_query("hola")
+
+            base = CountingEmbeddings()
+            restarted = CachedEmbeddings(base, backend=SQLiteEmbeddingBackend(path))
+            self.assertEqual(restarted.embed_query("hola"), [4.0, 0.5])
+            self.assertEqual(base.calls, [])
+            self.assertEqual(restarted.stats()["backend_hits"], 1)
+
+    def test_model_is_part_of_the_key(self):
+        base = CountingEmbeddings()
+        other = CountingEmbeddings()
+        other.model = "other-embedding"
+        self.assertNotEqual(CachedEmbeddings(base).key("hola"), CachedEmbeddings(other).key("hola"))
+
+if __name__ == "__main__":
+    unittest.main()
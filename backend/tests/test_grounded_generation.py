@@ -0,0 +1,109 @@
+import asyncio
+import json
+import unittest
+from langchain_core.messages import AIMessageChunk
+from langchain_core.prompts import ChatPromptTemplate
+from agent.llms.grounded_conversational_generator import GroundedConversationalGenerator
+from agent.llms.rag_response_generator import ContextResponse
+from agent.router import Router
+
+RESPONSE = {
+    "answer": "Los LLM son modelos de lenguaje.",
+    "context": [{"content": "Los LLM...", "source": "llm.pdf", "title": "Modelos de lenguaje", "author": "Pérez, J.", "year": "2023"}]
+}
+
+class FakeStreamingModel:
+    """Streams a forced tool call whose JSON arguments arrive in small pieces, or plain text content."""
+
+    def __init__(self, arguments: str = None, content: str = None, piece: int = 7):
+        self.arguments = arguments
+        self.content = content
+        self.piece = piece
+
+    async def astream(self, prompt):
+        if self.content is not None:
+            for start in range(0, len(self.content), self.piece):
+                yield AIMessageChunk(content=self.content[start:start + self.piece])
+            return
+        for start in range(0, len(self.arguments), self.piece):
+            args = self.arguments[start:start + self.piece]
+            yield AIMessageChunk(content="", tool_call_chunks=[{"name": None, "args": args, "id": None, "index": 0}])
+
+class FakeStructuredModel:
+    async def ainvoke(self, prompt):
+        return ContextResponse.model_validate(RESPONSE)
+
+def make_generator(streaming_llm) -> GroundedConversationalGenerator:
+    generator = GroundedConversationalGenerator.__new__(GroundedConversationalGenerator)
+    generator.streaming_llm = streaming_llm
+    generator.structured_llm = FakeStructuredModel()
+    generator.prompt = ChatPromptTemplate.from_messages([("system", "{search_results}"), ("human", "{query}")])
+    return generator
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+class FakeHistoryManager:
+    async def awindow(self, history, thread_id):
+        return history
+
+class FakeRAG:
+    async def aprepare_context(self, question, history, query_analysis, context, deadline):
+        return None, "Los LLM..."
+
+def make_router(generator) -> Router:
+    """Router on the 'retrieve' path in single-pass mode, without LLM clients."""
+    router = Router.__new__(Router)
+    router.rag = FakeRAG()
+    router.history_manager = FakeHistoryManager()
+    router.speculative_mode = "off"
+    router.fused_router_analyzer = None
+    router.grounded_response_llm = generator
+
+    async def aget_decision_path(query, history):
+        return "retrieve", ""
+
+    router.aget_decision_path = aget_decision_path
+    return router
+
+class TestGroundedStreaming(unittest.TestCase):
+    def test_answer_is_streamed_from_partial_tool_arguments(self):
+        generator = make_generator(FakeStreamingModel(json.dumps(RESPONSE, ensure_ascii=False)))
+        items = asyncio.run(collect(generator.astream_response("¿Qué es un LLM?", "Los LLM...")))
+        tokens, response = items[:-1], items[-1]
+        self.assertGreater(len(tokens), 1)
+        self.assertTrue(all(isinstance(token, str) and token for token in tokens))
+        self.assertEqual("".join(tokens), RESPONSE["answer"])
+        self.assertEqual(response, ContextResponse.model_validate(RESPONSE))
+
+    def test_plain_text_reply_falls_back_to_answer_without_context(self):
+        generator = make_generator(FakeStreamingModel(content="Lo siento, no puedo ayudar con eso."))
+        items = asyncio.run(collect(generator.astream_response("¿Qué es un LLM?", "Los LLM...")))
+        self.assertEqual("".join(items[:-1]), "Lo siento, no puedo ayudar con eso.")
+        self.assertEqual(items[-1], ContextResponse(answer="Lo siento, no puedo ayudar con eso.", context=[]))
+
+class TestSinglePassRouter(unittest.TestCase):
+    def test_process_query_builds_citations_from_the_response(self):
+        router = make_router(make_generator(None))
+        response, citations, degradations = asyncio.run(router.aprocess_query("¿Qué es un LLM?", []))
+        self.assertEqual(response, RESPONSE["answer"])
+        self.assertEqual([citation["source"] for citation in citations], ["llm.pdf"])
+        self.assertEqual(degradations, [])
+
+    def test_stream_query_emits_tokens_and_citations(self):
+        router = make_router(make_generator(FakeStreamingModel(json.dumps(RESPONSE, ensure_ascii=False))))
+        events = asyncio.run(collect(router.astream_query("¿Qué es un LLM?", [])))
+        self.assertEqual([event for event, _ in events if event != "token"], ["routed", "retrieved", "generating", "citations", "done"])
+        self.assertEqual("".join(data["text"] for event, data in events if event == "token"), RESPONSE["answer"])
+        citations = dict(events)["citations"]["citations"]
+        self.assertEqual(citations, router._format_citations(ContextResponse.model_validate(RESPONSE)))
+        self.assertEqual(dict(events)["done"]["response"], RESPONSE["answer"])
+
+    def test_stream_query_without_tool_call_has_empty_citations(self):
+        router = make_router(make_generator(FakeStreamingModel(content="Lo siento.")))
+        events = dict(asyncio.run(collect(router.astream_query("¿Qué es un LLM?", []))))
+        self.assertEqual(events["citations"]["citations"], [])
+        self.assertEqual(events["done"]["response"], "Lo siento.")
+
+if __name__ == "__main__":
+    unittest.main()
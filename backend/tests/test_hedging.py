@@ -0,0 +1,111 @@
+import asyncio
+import time
+import unittest
+from langchain_core.runnables import RunnableLambda
+from agent.hedging import HedgedRunnable, LatencyTracker
+
+def make_model(name, delay, fail=False, calls=None):
+    """Fake structured model that answers 'name' after 'delay' seconds."""
+    calls = calls if calls is not None else []
+
+    def invoke(input):
+        calls.append(name)
+        time.sleep(delay)
+        if fail:
+            raise RuntimeError(f"{name} failed")
+        return name
+
+    async def ainvoke(input):
+        calls.append(name)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            calls.append(f"{name} cancelled")
+            raise
+        if fail:
+            raise RuntimeError(f"{name} failed")
+        return name
+
+    return RunnableLambda(invoke, afunc=ainvoke)
+
+def fixed_tracker(delay):
+    return LatencyTracker(initial_delay=delay, min_samples=1000)
+
+class TestLatencyTracker(unittest.TestCase):
+    def test_initial_delay_until_enough_samples(self):
+        tracker = LatencyTracker(percentile=90, initial_delay=2, min_delay=0, min_samples=3)
+        tracker.record(0.1)
+        tracker.record(0.2)
+        self.assertEqual(tracker.delay(), 2)
+
+    def test_percentile_of_window(self):
+        tracker = LatencyTracker(percentile=90, initial_delay=2, min_delay=0, min_samples=3)
+        for latency in range(1, 11):
+            tracker.record(latency / 10)
+        self.assertAlmostEqual(tracker.delay(), 1.0)
+
+    def test_min_delay(self):
+        tracker = LatencyTracker(percentile=50, initial_delay=2, min_delay=0.5, min_samples=1)
+        tracker.record(0.01)
+        self.assertEqual(tracker.delay(), 0.5)
+
+class TestHedgedRunnable(unittest.TestCase):
+    def test_fast_primary_is_not_hedged(self):
+        calls = []
+        hedged = HedgedRunnable("test_fast", make_model("primary", 0.01, calls=calls), make_model("hedge", 0.01, calls=calls), fixed_tracker(0.2))
+        self.assertEqual(asyncio.run(hedged.ainvoke("q")), "primary")
+        self.assertEqual(calls, ["primary"])
+        self.assertEqual(hedged.stats()["hedged"], 0)
+
+    def test_slow_primary_loses_and_is_cancelled(self):
+        calls = []
+        hedged = HedgedRunnable("test_slow", make_model("primary", 1, calls=calls), make_model("hedge", 0.01, calls=calls), fixed_tracker(0.05))
+        start = time.perf_counter()
+        self.assertEqual(asyncio.run(hedged.ainvoke("q")), "hedge")
+        self.assertLess(time.perf_counter() - start, 0.5)
+        self.assertIn("primary cancelled", calls)
+        self.assertEqual(hedged.stats()["hedge_wins"], 1)
+
+    def test_primary_can_still_win_after_hedging(self):
+        tracker = fixed_tracker(0.05)
+        hedged = HedgedRunnable("test_race", make_model("primary", 0.1), make_model("hedge", 1), tracker)
+        self.assertEqual(asyncio.run(hedged.ainvoke("q")), "primary")
+        stats = hedged.stats()
+        self.assertEqual((stats["hedged"], stats["hedge_wins"]), (1, 0))
+        # The primary's completion latency is recorded even though the hedge had fired
+        self.assertEqual(len(tracker._latencies), 1)
+        self.assertGreaterEqual(tracker._latencies[0], 0.1)
+
+    def test_failed_primary_latency_is_not_recorded(self):
+        tracker = fixed_tracker(1)
+        hedged = HedgedRunnable("test_fail_latency", make_model("primary", 0, fail=True), make_model("hedge", 0.01), tracker)
+        asyncio.run(hedged.ainvoke("q"))
+        self.assertEqual(len(tracker._latencies), 0)
+
+    def test_failed_primary_is_hedged_immediately(self):
+        hedged = HedgedRunnable("test_fail", make_model("primary", 0, fail=True), make_model("hedge", 0.01), fixed_tracker(1))
+        start = time.perf_counter()
+        self.assertEqual(asyncio.run(hedged.ainvoke("q")), "hedge")
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_both_failing_raises_primary_error(self):
+        hedged = HedgedRunnable("test_both", make_model("primary", 0, fail=True), make_model("hedge", 0, fail=True), fixed_tracker(1))
+        with self.assertRaisesRegex(RuntimeError, "primary failed"):
+            asyncio.run(hedged.ainvoke("q"))
+        self.assertEqual(hedged.stats()["failed"], 1)
+
+    def test_sync_invoke_returns_first_result(self):
+        hedged = HedgedRunnable("test_sync", make_model("primary", 0.5), make_model("hedge", 0.01), fixed_tracker(0.05))
+        start = time.perf_counter()
+        self.assertEqual(hedged.invoke("q"), "hedge")
+        self.assertLess(time.perf_counter() - start, 0.4)
+
+    def test_sync_primary_winning_after_hedging_is_recorded(self):
+        tracker = fixed_tracker(0.05)
+        hedged = HedgedRunnable("test_sync_race", make_model("primary", 0.1), make_model("hedge", 1), tracker)
+        self.assertEqual(hedged.invoke("q"), "primary")
+        self.assertEqual(len(tracker._latencies), 1)
+        self.assertGreaterEqual(tracker._latencies[0], 0.1)
+
+if __name__ == "__main__":
+    unittest.main()
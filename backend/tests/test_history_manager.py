@@ -0,0 +1,50 @@
+import asyncio
+import unittest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from agent.history_manager import HistoryManager, count_message_tokens
+
+class FakeSummarizer:
+    def __init__(self):
+        self.calls = []
+
+    async def agenerate_summary(self, summary, messages):
+        self.calls.append([m.content for m in messages])
+        return (summary + " " if summary else "") + "|".join(m.content for m in messages)
+
+def _conversation(turns):
+    history = []
+    for i in range(turns):
+        history.append(HumanMessage(content=f"pregunta {i} " + "palabra " * 20))
+        history.append(AIMessage(content=f"respuesta {i} " + "palabra " * 20))
+    return history
+
+class TestHistoryManager(unittest.TestCase):
+    def test_short_history_is_untouched(self):
+        """Histories within the budget are passed through without summarizing"""
+        summarizer = FakeSummarizer()
+        manager = HistoryManager(summarizer, max_tokens=10000)
+        history = _conversation(2)
+        self.assertIs(asyncio.run(manager.awindow(history, "thread")), history)
+        self.assertEqual(summarizer.calls, [])
+
+    def test_window_fits_budget_and_summary_is_incremental(self):
+        """Older turns are summarized once, and later turns only summarize the new overflow"""
+        summarizer = FakeSummarizer()
+        budget = 4 * count_message_tokens(_conversation(1)[0])
+        manager = HistoryManager(summarizer, max_tokens=budget)
+
+        history = _conversation(4)
+        window = asyncio.run(manager.awindow(history, "thread"))
+        self.assertIsInstance(window[0], SystemMessage)
+        self.assertIsInstance(window[1], HumanMessage)
+        self.assertLessEqual(sum(count_message_tokens(m) for m in window[1:]), budget)
+        self.assertEqual(len(summarizer.calls), 1)
+        summarized = len(summarizer.calls[0])
+
+        history = history + _conversation(5)[8:]
+        asyncio.run(manager.awindow(history, "thread"))
+        self.assertEqual(len(summarizer.calls), 2)
+        self.assertEqual(summarizer.calls[1][0], history[summarized].content)
+
+if __name__ == "__main__":
+    unittest.main()
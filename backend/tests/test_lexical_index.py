@@ -0,0 +1,73 @@
+import tempfile
+import unittest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from agent.lexical_index import BM25Index, tokenize
+from agent.numpy_vector_store import NumpyVectorStore
+from agent.rag import RAG, reciprocal_rank_fusion
+
+class TopicEmbeddings(Embeddings):
+    """Education on one axis, ethics on the other: dense search does not know what "UNESCO" is."""
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [float("educación" in text or "evaluación" in text), float("ética" in text)]
+
+TEXTS = [
+    "La inteligencia artificial generativa en la educación",
+    "Recomendación de la UNESCO sobre la ética de la IA",
+    "Los modelos de lenguaje (LLM) y la evaluación de estudiantes",
+]
+IDS = ["a", "b", "c"]
+
+class TestBM25Index(unittest.TestCase):
+    def test_tokenize(self):
+        self.assertEqual(tokenize("¿Qué dice la UNESCO sobre la Ética?"), ["dice", "unesco", "etica"])
+
+    def test_acronym_query_ranks_its_chunk_first(self):
+        index = BM25Index(path=None)
+        index.add(TEXTS, IDS)
+        self.assertEqual(index.search("¿Qué opina la UNESCO?", 2)[0][0], "b")
+        self.assertEqual({pk for pk, _ in index.search("LLM educación", 3)}, {"a", "c"})
+        self.assertEqual(index.search("cocina", 3), [])
+
+    def test_persistence_and_delete(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            BM25Index(path=tmp).add(TEXTS, IDS)
+            index = BM25Index(path=tmp)
+            self.assertEqual(len(index), 3)
+            index.delete(["a"])
+            reloaded = BM25Index(path=tmp)
+            self.assertEqual([pk for pk, _ in reloaded.search("LLM estudiantes", 3)], ["c"])
+            self.assertEqual(reloaded.search("generativa", 3), [])
+
+    def test_reciprocal_rank_fusion(self):
+        def docs(*pks):
+            return [Document(page_content=pk, metadata={"pk": pk}) for pk in pks]
+        fused = reciprocal_rank_fusion([docs("a", "b", "c"), docs("c", "d")], k=3)
+        self.assertEqual([doc.metadata["pk"] for doc in fused], ["c", "a", "b"])
+
+class TestHybridSearch(unittest.TestCase):
+    def test_lexical_match_is_fused_into_the_dense_results(self):
+        rag = RAG.__new__(RAG)
+        rag.vector_store = NumpyVectorStore(TopicEmbeddings(), path=None)
+        rag.vector_store.add_documents([Document(page_content=text, metadata={"source": f"{pk}.pdf"}) for text, pk in zip(TEXTS, IDS)], IDS)
+        rag.lexical_index = BM25Index(path=None)
+        rag.lexical_index.add(TEXTS, IDS)
+        rag.k, rag.fetch_k, rag.lambda_mult, rag.rrf_k = 2, 3, 1.0, 60
+        query, vectors = "¿Qué recomienda la UNESCO?", [[1.0, 0.0]]
+
+        rag.hybrid = False
+        self.assertEqual([doc.metadata["pk"] for doc in rag.search([query], vectors)[0]], ["a", "c"])
+
+        rag.hybrid = True
+        timings = {}
+        documents = rag.search([query], vectors, timings=timings)[0]
+        self.assertEqual([doc.metadata["pk"] for doc in documents], ["a", "b"])
+        self.assertAlmostEqual(documents[1].metadata["relevance"], 0.0)
+        self.assertEqual(set(timings), {"dense", "lexical"})
+
+if __name__ == "__main__":
+    unittest.main()
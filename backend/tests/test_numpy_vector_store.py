@@ -0,0 +1,89 @@
+import tempfile
+import unittest
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from agent.numpy_vector_store import NumpyVectorStore
+from agent.rag import RAG
+
+class KeywordEmbeddings(Embeddings):
+    """One dimension per keyword: texts sharing keywords are similar."""
+    keywords = ["llm", "educación", "ética", "cocina"]
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_query(self, text):
+        return [float(keyword in text.lower()) + 0.01 for keyword in self.keywords]
+
+DOCUMENTS = [
+    Document(page_content="Los LLM en la educación", metadata={"source": "a.pdf", "title": "LLM y educación"}),
+    Document(page_content="Ética de los LLM", metadata={"source": "b.pdf", "title": "Ética"}),
+    Document(page_content="Recetas de cocina", metadata={"source": "c.pdf", "title": "Cocina"}),
+]
+
+class TestNumpyVectorStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = NumpyVectorStore(KeywordEmbeddings(), path=self.tmp.name)
+        self.ids = self.store.add_documents(DOCUMENTS, ids=["a", "b", "c"])
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_exact_top_k(self):
+        query = np.array(KeywordEmbeddings().embed_query("ética"))
+        results = self.store.search_with_vectors([query], 2)[0]
+        self.assertEqual([doc.metadata["pk"] for doc, _, _ in results], ["b", "a"])
+        # Puntaje = similitud coseno con el vector guardado (normalizado)
+        self.assertAlmostEqual(results[0][1], float(query @ results[0][2] / np.linalg.norm(query)), places=5)
+        self.assertEqual(results[0][0].page_content, "Ética de los LLM")
+
+    def test_metadata_filter(self):
+        documents = self.store.similarity_search("llm", k=3, filter={"source": ["b.pdf", "c.pdf"]})
+        self.assertEqual([doc.metadata["source"] for doc in documents], ["b.pdf", "c.pdf"])
+        self.assertEqual(self.store.similarity_search("llm", filter={"source": "z.pdf"}), [])
+
+    def test_reload_is_memory_mapped(self):
+        reloaded = NumpyVectorStore(KeywordEmbeddings(), path=self.tmp.name)
+        self.assertIsInstance(reloaded.vectors.base, np.memmap)
+        self.assertEqual(len(reloaded), 3)
+        self.assertEqual(reloaded.similarity_search("cocina", k=1)[0].metadata["title"], "Cocina")
+
+    def test_delete(self):
+        self.store.delete(["a"])
+        reloaded = NumpyVectorStore(KeywordEmbeddings(), path=self.tmp.name)
+        self.assertEqual([reloaded.document(row).page_content for row in range(len(reloaded))], ["Ética de los LLM", "Recetas de cocina"])
+
+    def test_float16_storage(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = NumpyVectorStore(KeywordEmbeddings(), path=tmp, dtype="float16")
+            store.add_documents(DOCUMENTS)
+            self.assertEqual(NumpyVectorStore(KeywordEmbeddings(), path=tmp).vectors.dtype, np.float16)
+            self.assertEqual(store.similarity_search("cocina", k=1)[0].page_content, "Recetas de cocina")
+
+    def test_batched_ingestion_saves_once(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            store = NumpyVectorStore(KeywordEmbeddings(), path=tmp)
+            for pk, document in zip(["a", "b", "c"], DOCUMENTS):
+                store.add_documents([document], ids=[pk], save=False)
+            self.assertEqual(len(NumpyVectorStore(KeywordEmbeddings(), path=tmp)), 0)
+            store.save()
+            self.assertEqual(len(NumpyVectorStore(KeywordEmbeddings(), path=tmp)), 3)
+
+    def test_metadata_values_are_strings(self):
+        self.store.add_documents([Document(page_content="LLM", metadata={"page": 3})], ids=["d"])
+        document = self.store.get_by_ids(["d"])["d"][0]
+        self.assertEqual(document.metadata["page"], "3")
+        self.assertEqual(self.store.similarity_search("llm", k=1, filter={"page": 3})[0].metadata["pk"], "d")
+
+    def test_rag_mmr_over_numpy_store(self):
+        rag = RAG.__new__(RAG)
+        rag.vector_store = self.store
+        rag.k, rag.fetch_k, rag.lambda_mult = 2, 3, 0.5
+        documents = rag.search_by_vectors([KeywordEmbeddings().embed_query("llm")])[0]
+        self.assertEqual(len(documents), 2)
+        self.assertGreater(documents[0].metadata["relevance"], 0.5)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from langchain_core.embeddings import Embeddings
+from langchain_core.messages import AIMessage, HumanMessage
+from agent.pre_router import PreRouter
+
+# Fixed vectors per topic, so similarities are known: greetings, off-topic and AI questions
+VECTORS = {
+    "hola": [1.0, 0.0, 0.0],
+    "buenas": [0.95, 0.05, 0.0],
+    "hola, ¿qué tal?": [0.9, 0.1, 0.0],
+    "receta de pizza": [0.0, 1.0, 0.0],
+    "mejor equipo de fútbol": [0.05, 0.95, 0.0],
+    "¿qué es un LLM?": [0.0, 0.0, 1.0],
+    "¿cómo uso IA en clase?": [0.0, 0.1, 0.95],
+    "algo ambiguo": [0.6, 0.0, 0.6],
+}
+
+class FakeEmbeddings(Embeddings):
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [VECTORS[text] for text in texts]
+
+    def embed_query(self, text):
+        return VECTORS[text]
+
+EXAMPLES = [
+    {"query": "hola", "expected_paths": ["no-retrieval reply"]},
+    {"query": "buenas", "expected_paths": ["no-retrieval reply"]},
+    {"query": "receta de pizza", "expected_paths": ["deny"]},
+    {"query": "mejor equipo de fútbol", "expected_paths": ["deny"]},
+    {"query": "¿qué es un LLM?", "expected_paths": ["retrieve", "cross-question"]},
+    {"query": "¿cómo uso IA en clase?", "expected_paths": ["retrieve"]},
+]
+
+class TestPreRouter(unittest.TestCase):
+    def make_pre_router(self, **kwargs):
+        return PreRouter(FakeEmbeddings(), EXAMPLES, k=2, min_confidence=0.8, min_similarity=0.5, cache_path=None, **kwargs)
+
+    def test_confident_local_decision(self):
+        """A query close to greeting examples is routed locally"""
+        pre_router = self.make_pre_router()
+        path, _ = pre_router.route("hola, ¿qué tal?")
+        self.assertEqual(path, "no-retrieval reply")
+        self.assertEqual(pre_router.stats()["local_decisions"], 1)
+
+    def test_defers_to_llm(self):
+        """Ambiguous queries and paths that depend on the conversation go to the LLM router"""
+        pre_router = self.make_pre_router()
+        self.assertIsNone(pre_router.route("algo ambiguo"))
+        self.assertIsNone(pre_router.route("¿qué es un LLM?"))
+        self.assertEqual(pre_router.stats()["llm_fallbacks"], 2)
+
+    def test_defers_queries_with_history(self):
+        """A follow-up is never decided locally, however close it is to the seed examples"""
+        pre_router = self.make_pre_router()
+        history = [HumanMessage(content="¿qué es un LLM?"), AIMessage(content="Un modelo de lenguaje...")]
+        self.assertIsNone(pre_router.route("receta de pizza", history))
+        self.assertIsNone(asyncio.run(pre_router.aroute("hola, ¿qué tal?", history)))
+        self.assertEqual(pre_router.stats()["llm_fallbacks"], 2)
+        self.assertEqual(pre_router.stats()["local_decisions"], 0)
+
+    def test_leave_one_out(self):
+        """Excluding a seed example stops it from voting for itself"""
+        pre_router = self.make_pre_router()
+        path, confidence, similarity = pre_router.classify(VECTORS["receta de pizza"], exclude=2)
+        self.assertEqual(path, "deny")
+        self.assertLess(similarity, 1.0)
+
+    def test_example_embeddings_cached_on_disk(self):
+        """A second pre-router reuses the example embeddings stored by the first"""
+        with tempfile.TemporaryDirectory() as directory:
+            cache_path = os.path.join(directory, "pre_router.json")
+            PreRouter(FakeEmbeddings(), EXAMPLES, cache_path=cache_path)
+            embeddings = FakeEmbeddings()
+            PreRouter(embeddings, EXAMPLES, cache_path=cache_path)
+            self.assertEqual(embeddings.embedded, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import asyncio
+import unittest
+import numpy as np
+from types import SimpleNamespace
+from langchain_core.documents import Document
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+from agent.rag import RAG, cosine_similarity_from_score, mmr_select, NO_INFORMATION_ANSWER
+from agent.llms.rag_query_analyzer import QueryAnalysis
+
+class FakeEntity(dict):
+    @property
+    def fields(self):
+        return list(self.keys())
+
+class FakeCollection:
+    """pymilvus Collection stand-in: every query vector gets the same (pk, squared L2 distance, vector) results."""
+
+    def __init__(self, results):
+        self.results = results
+        self.searches = []
+
+    def search(self, data, anns_field, param, limit, output_fields, timeout=None):
+        self.searches.append((len(data), output_fields))
+        return [
+            [SimpleNamespace(entity=FakeEntity(pk=pk, text=f"doc {pk}", vector=vector), score=distance) for pk, distance, vector in self.results[:limit]]
+            for _ in data
+        ]
+
+class FakeVectorStore:
+    """Milvus stand-in with the attributes RAG.search_by_vectors reads."""
+    _primary_field = "pk"
+    _vector_field = "vector"
+    fields = ["pk", "text", "vector"]
+    enable_dynamic_field = False
+    timeout = None
+    search_params = {"metric_type": "L2", "params": {"ef": 40}}
+    index_params = {"metric_type": "L2", "index_type": "HNSW"}
+
+    def __init__(self, results):
+        self.col = FakeCollection(results)
+
+    def _parse_document(self, data):
+        data.pop("vector", None)
+        return Document(page_content=data.pop("text"), metadata=data)
+
+class FailingGenerator:
+    async def agenerate_response(self, **kwargs):
+        raise AssertionError("The response generator should not be called")
+
+def make_rag(results, threshold):
+    rag = RAG.__new__(RAG)
+    rag.vector_store = FakeVectorStore(results)
+    rag.k, rag.fetch_k, rag.lambda_mult = 2, 20, 0.5
+    rag.relevance_threshold = threshold
+    rag.rag_response_generator = FailingGenerator()
+
+    async def aretrieve_many(queries, k=None):
+        return rag.search_by_vectors([[1.0, 0.0] for _ in queries], k)
+
+    rag.aretrieve_many = aretrieve_many
+    return rag
+
+RESULTS = [("a", 0.4, [0.8, 0.6]), ("b", 0.5, [0.75, 0.66]), ("c", 1.2, [0.4, 0.92])]
+
+class TestRelevance(unittest.TestCase):
+    def test_cosine_from_l2(self):
+        self.assertAlmostEqual(cosine_similarity_from_score(0.0, "L2"), 1.0)
+        self.assertAlmostEqual(cosine_similarity_from_score(2.0, "L2"), 0.0)
+        self.assertAlmostEqual(cosine_similarity_from_score(0.7, "COSINE"), 0.7)
+
+    def test_mmr_matches_langchain(self):
+        rng = np.random.default_rng(0)
+        query, candidates = rng.standard_normal(16), rng.standard_normal((30, 16))
+        for lambda_mult in (0.0, 0.5, 0.8, 1.0):
+            self.assertEqual(
+                mmr_select(query, candidates, 6, lambda_mult),
+                maximal_marginal_relevance(query, list(candidates), lambda_mult=lambda_mult, k=6)
+            )
+        self.assertEqual(mmr_select(query, [], 4), [])
+
+    def test_search_keeps_relevance(self):
+        documents = make_rag(RESULTS, 0).search_by_vector([1.0, 0.0])
+        self.assertEqual(len(documents), 2)
+        self.assertEqual(documents[0].metadata["pk"], "a")
+        self.assertAlmostEqual(documents[0].metadata["relevance"], 0.8)
+
+    def test_queries_are_searched_in_one_batch(self):
+        rag = make_rag(RESULTS, 0)
+        selections = rag.search_by_vectors([[1.0, 0.0], [0.8, 0.6], [0.0, 1.0]])
+        self.assertEqual(len(selections), 3)
+        # Una sola búsqueda, que ya devuelve los vectores guardados para MMR
+        self.assertEqual(rag.vector_store.col.searches, [(3, ["pk", "text", "vector"])])
+
+    def test_relevant_context_is_kept(self):
+        rag = make_rag(RESULTS, 0.5)
+        context = asyncio.run(rag.aretrieve_context(QueryAnalysis(updated_query="q", queries=["q"])))
+        self.assertIn("doc a", context)
+
+    def test_nothing_relevant_returns_empty_context(self):
+        rag = make_rag(RESULTS, 0.9)
+        context = asyncio.run(rag.aretrieve_context(QueryAnalysis(updated_query="q", queries=["q"])))
+        self.assertEqual(context, "")
+
+    def test_answer_skips_generation_without_context(self):
+        rag = make_rag(RESULTS, 0.9)
+        response = asyncio.run(rag.agenerate_answer("q", [], query_analysis=QueryAnalysis(updated_query="q", queries=["q"])))
+        self.assertEqual(response.answer, NO_INFORMATION_ANSWER)
+        self.assertEqual(response.context, [])
+
+if __name__ == "__main__":
+    unittest.main()
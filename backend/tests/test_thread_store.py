@@ -0,0 +1,91 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from langchain_core.messages import AIMessage, HumanMessage
+from server.thread_store import ThreadStore, SQLiteThreadBackend
+
+class TestThreadStore(unittest.TestCase):
+    def test_append_reuses_built_messages(self):
+        """Appended turns are returned as the same message objects on the next turn"""
+        store = ThreadStore()
+        question, answer = HumanMessage(content="Hola"), AIMessage(content="¡Hola! ¿En qué te ayudo?")
+        store.append("uid:thread", question, answer)
+        history = store.get("uid:thread")
+        self.assertEqual(history, [question, answer])
+        self.assertIs(history[0], question)
+        self.assertEqual(store.get("uid:other"), [])
+
+    def test_lru_eviction(self):
+        """Threads beyond max_threads are evicted least recently used first"""
+        store = ThreadStore(max_threads=1)
+        store.append("a", HumanMessage(content="1"))
+        store.append("b", HumanMessage(content="2"))
+        self.assertEqual(store.get("a"), [])
+        self.assertEqual(len(store.get("b")), 1)
+
+    def test_sqlite_backend_survives_restart(self):
+        """Threads persisted in SQLite are loaded by a fresh store"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "threads.db")
+            store = ThreadStore(backend=SQLiteThreadBackend(path))
+            store.replace("uid:thread", [HumanMessage(content="¿Qué es un LLM?"), AIMessage(content="Un modelo de lenguaje.")])
+            store.append("uid:thread", HumanMessage(content="¿Y la IA generativa?"), AIMessage(content="..."))
+
+            restarted = ThreadStore(backend=SQLiteThreadBackend(path))
+            history = restarted.get("uid:thread")
+            self.assertEqual([m.content for m in history], ["¿Qué es un LLM?", "Un modelo de lenguaje.", "¿Y la IA generativa?", "..."])
+            self.assertIsInstance(history[0], HumanMessage)
+            self.assertIsInstance(history[1], AIMessage)
+
+    def test_unchanged_history_is_not_rewritten(self):
+        """A client history equal to the stored thread skips the DELETE + INSERT, a different one replaces it"""
+        with tempfile.TemporaryDirectory() as tmp:
+            backend = SQLiteThreadBackend(os.path.join(tmp, "threads.db"))
+            replaced = []
+            backend_replace = backend.replace
+            backend.replace = lambda key, messages: replaced.append(key) or backend_replace(key, messages)
+            store = ThreadStore(backend=backend)
+            store.append("uid:thread", HumanMessage(content="Hola"), AIMessage(content="¡Hola!"))
+
+            store.replace("uid:thread", [HumanMessage(content="Hola"), AIMessage(content="¡Hola!")])
+            self.assertEqual(replaced, [])
+            store.replace("uid:thread", [HumanMessage(content="Hola")])
+            self.assertEqual(replaced, ["uid:thread"])
+            self.assertEqual([m.content for m in ThreadStore(backend=backend).get("uid:thread")], ["Hola"])
+
+    def test_async_methods_with_sqlite_backend(self):
+        """aappend / aget run the SQLite queries in a worker thread and behave like the sync methods"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "threads.db")
+            store = ThreadStore(backend=SQLiteThreadBackend(path))
+
+            async def scenario():
+                await store.areplace("uid:thread", [HumanMessage(content="¿Qué es un LLM?")])
+                await store.aappend("uid:thread", AIMessage(content="Un modelo de lenguaje."))
+                return await ThreadStore(backend=SQLiteThreadBackend(path)).aget("uid:thread")
+
+            history = asyncio.run(scenario())
+            self.assertEqual([m.content for m in history], ["¿Qué es un LLM?", "Un modelo de lenguaje."])
+
+    def test_concurrent_appends_keep_every_turn(self):
+        """Appends racing on one thread, also from two stores sharing the file (two workers), lose no turn"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "threads.db")
+            stores = [ThreadStore(backend=SQLiteThreadBackend(path)), ThreadStore(backend=SQLiteThreadBackend(path))]
+
+            async def scenario():
+                await asyncio.gather(*(
+                    stores[i % 2].aappend("uid:thread", HumanMessage(content=f"q{i}"), AIMessage(content=f"a{i}"))
+                    for i in range(20)
+                ))
+
+            asyncio.run(scenario())
+            history = ThreadStore(backend=SQLiteThreadBackend(path)).get("uid:thread")
+            self.assertEqual(len(history), 40)
+            self.assertEqual({m.content for m in history}, {f"{kind}{i}" for i in range(20) for kind in "qa"})
+            # Within one store, every turn is kept in memory too
+            self.assertEqual(len(stores[0].get("uid:thread")), 20)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import time
+import unittest
+from server.token_cache import TokenCache
+
+class TestTokenCache(unittest.TestCase):
+    def test_hit_and_miss(self):
+        """Cached tokens are returned until evicted, and lookups are counted"""
+        cache = TokenCache(max_size=10)
+        self.assertIsNone(cache.get("token-a"))
+        cache.put("token-a", {"uid": "a", "exp": time.time() + 3600})
+        self.assertEqual(cache.get("token-a")["uid"], "a")
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_expired_token_is_not_returned(self):
+        """A token past its 'exp' claim is treated as a miss and dropped"""
+        cache = TokenCache(max_size=10)
+        cache.put("token-a", {"uid": "a", "exp": time.time() - 1})
+        self.assertIsNone(cache.get("token-a"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_lru_eviction(self):
+        """The least recently used token is evicted once the cache is full"""
+        cache = TokenCache(max_size=2)
+        exp = time.time() + 3600
+        cache.put("token-a", {"uid": "a", "exp": exp})
+        cache.put("token-b", {"uid": "b", "exp": exp})
+        cache.get("token-a")
+        cache.put("token-c", {"uid": "c", "exp": exp})
+        self.assertIsNotNone(cache.get("token-a"))
+        self.assertIsNone(cache.get("token-b"))
+        self.assertIsNotNone(cache.get("token-c"))
+
+if __name__ == "__main__":
+    unittest.main()